@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from print_color import print
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ex06"))
+from common import aer_profiles
+import research_algo
+
+from qiskit import QuantumCircuit
+
+
+# * The options tried for each profile, on top of its default ones
+CANDIDATES = {
+    "small_batch": {"max_parallel_experiments": [0, 1], "fusion_enable": [False, True]},
+    "shots": {"max_parallel_shots": [0, 1], "fusion_enable": [False, True]},
+    "wide": {
+        "max_parallel_threads": sorted({0, max(1, (os.cpu_count() or 1) // 2)}),
+        "fusion_max_qubit": [3, 5],
+        "statevector_parallel_threshold": [10, 14],
+    },
+}
+
+
+def workloads(args):
+    """ One workload per profile, like the ones of the exercices
+
+    * small_batch: many small random circuits, like a batch of DJ oracles
+    * shots: one small circuit with resets, Aer cannot sample its measurements once and must simulate every shot
+    * wide: a Grover search on many qubits, a few iterations
+
+    Return
+    -----
+        (dict): the circuits and the shots of each profile
+    """
+
+    import numpy as np
+    from qiskit.circuit.library import GroverOperator
+    from qiskit.circuit.random import random_circuit
+
+    small = [random_circuit(6, 6, measure=True, seed=seed) for seed in range(args.batch)]
+    with_resets = random_circuit(12, 8, measure=True, reset=True, seed=args.seed)
+
+    n = args.wide_qubits
+    marked = format(int(np.random.default_rng(args.seed).integers(2 ** n)), f"0{n}b")
+    grover = QuantumCircuit(n)
+    grover.h(range(n))
+    grover.compose(GroverOperator(research_algo.oracle_marked_state(n, marked)).power(args.iterations), inplace=True)
+    grover.measure_all()
+
+    return {
+        "small_batch": (small, 500),
+        "shots": ([with_resets], args.shots),
+        "wide": ([grover], 100),
+    }
+
+
+def candidates(profile):
+    """ Every combination of the candidate options of a profile, the Aer defaults first """
+
+    names = list(CANDIDATES[profile])
+
+    yield None
+
+    for values in itertools.product(*(CANDIDATES[profile][name] for name in names)):
+        yield dict(aer_profiles.PROFILES[profile], **dict(zip(names, values)))
+
+
+def timed_run(options, circuits, shots, repeat):
+    """ Best duration in ms of a run of the circuits with an AerSimulator built with these options """
+
+    from qiskit_aer import AerSimulator
+
+    sim = AerSimulator(**(options or {}))
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sim.run(circuits, shots=shots).result()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+
+    return round(best, 2)
+
+
+def main():
+    """ Find the best AerSimulator options of each execution profile on this host
+
+    * Build one workload per profile, transpile it once
+    * Time the Aer defaults and every candidate options, keep the fastest candidate
+    * Save the results as JSON and, unless --no-save, the best options in the cache for the exercices
+    """
+
+    from qiskit import transpile
+    from qiskit_aer import AerSimulator
+
+    parser = argparse.ArgumentParser(description="Tune the AerSimulator execution profiles on this host")
+    parser.add_argument("--profiles", nargs="+", default=list(CANDIDATES), choices=list(CANDIDATES), help="profiles to tune")
+    parser.add_argument("--batch", type=int, default=200, help="circuits of the small_batch workload")
+    parser.add_argument("--shots", type=int, default=2000, help="shots of the shots workload")
+    parser.add_argument("--wide-qubits", type=int, default=20, help="qubits of the wide workload")
+    parser.add_argument("--iterations", type=int, default=3, help="Grover iterations of the wide workload")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per candidate, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the random circuits")
+    parser.add_argument("--output", default="aer_tuning.json", help="where to save the results")
+    parser.add_argument("--no-save", action="store_true", help="do not save the best options for the exercices")
+    args = parser.parse_args()
+
+    all_workloads = workloads(args)
+    reference = AerSimulator()
+    results = {}
+    best_options = {}
+
+    print(f"{os.cpu_count()} cores", color='blue')
+
+    for profile in args.profiles:
+        circuits, shots = all_workloads[profile]
+        circuits = transpile(circuits, reference)
+
+        rows = []
+        for options in candidates(profile):
+            rows.append({"options": options, "ms": timed_run(options, circuits, shots, args.repeat)})
+
+        default_ms = rows[0]["ms"]
+        best = min(rows[1:], key=lambda row: row["ms"])
+        best_options[profile] = best["options"]
+        results[profile] = {"aer_defaults_ms": default_ms, "best": best, "candidates": rows[1:]}
+
+        print(f"\n{profile}: Aer defaults {default_ms:.1f}ms", color='blue')
+        for row in rows[1:]:
+            changed = {name: value for name, value in row["options"].items() if name in CANDIDATES[profile]}
+            print(f"\t{row['ms']:>10.1f}ms  {changed}", color='green' if row is best else 'white')
+        print(f"\tspeedup over the Aer defaults: {default_ms / best['ms']:.2f}x", color='cyan')
+
+    with open(args.output, "w") as fd:
+        json.dump({"cores": os.cpu_count(), "unit": "ms", "results": results}, fd, indent=4)
+
+    if not args.no_save:
+        aer_profiles.save_tuned(best_options)
+        print(f"\nBest options saved in {aer_profiles.tuned_path()}", tag='success', tag_color='green', color='white')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import argparse
+from print_color import print
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ex05"))
+import deutsch_jozsa
+
+
+SIZES = [3, 5, 10, 20, 24, 50, 100, 200, 500, 1000]
+
+
+def timed(function, *args, **kwargs):
+    """ Run the function, return its result and its duration in ms """
+
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+
+def run_method(circuit, method, shots):
+    """ Run the DJ circuit with an AerSimulator method and classify the result """
+
+    from qiskit_aer import AerSimulator
+
+    result = AerSimulator(method=method).run(circuit, shots=shots).result()
+
+    return deutsch_jozsa.classify_counts(result.get_counts(), shots)[0]
+
+
+def run_tableau(circuit):
+    """ Run the DJ circuit with the Clifford tableau of qiskit.quantum_info, one shot """
+
+    from qiskit.quantum_info import StabilizerState
+
+    n = circuit.num_clbits
+    outcome, _ = StabilizerState(circuit.remove_final_measurements(inplace=False)).measure(range(n))
+
+    return "constant" if outcome == "0" * n else "balanced"
+
+
+def benchmark(n, args):
+    """ Build, compile and run a constant and a balanced oracle with n input qubits
+
+    * The stabilizer method is used for every size
+    * The statevector method and the qiskit.quantum_info tableau only up to their limit
+    * Each classification is checked against the type of the generated oracle
+
+    Return
+    -----
+        (dict): the durations in ms of each step, None when the method was not run
+    """
+
+    row = {"n": n, "build_ms": 0, "stabilizer_ms": 0, "statevector_ms": None, "tableau_ms": None, "correct": True}
+
+    for expected in ("constant", "balanced"):
+        if expected == "constant":
+            oracle, build_ms = timed(deutsch_jozsa.generate_constant_oracle, n)
+        else:
+            oracle, build_ms = timed(deutsch_jozsa.generate_balanced_oracle, n, seed=n)
+        circuit, compile_ms = timed(deutsch_jozsa.compile_circuit, oracle, draw=False)
+        row["build_ms"] += build_ms + compile_ms
+
+        oracle_type, ms = timed(run_method, circuit, "stabilizer", args.shots)
+        row["stabilizer_ms"] += ms
+        row["correct"] &= oracle_type == expected
+
+        if n <= args.statevector_max:
+            oracle_type, ms = timed(run_method, circuit, "statevector", args.shots)
+            row["statevector_ms"] = (row["statevector_ms"] or 0) + ms
+            row["correct"] &= oracle_type == expected
+
+        if n <= args.tableau_max:
+            oracle_type, ms = timed(run_tableau, circuit)
+            row["tableau_ms"] = (row["tableau_ms"] or 0) + ms
+            row["correct"] &= oracle_type == expected
+
+    return row
+
+
+def main():
+    """ Scale Deutsch-Jozsa from 3 to 1000 input qubits with the stabilizer method
+
+    * For each size, time a constant and a balanced oracle (summed)
+    * Print the results as a table and save them as JSON
+    """
+
+    parser = argparse.ArgumentParser(description="Deutsch-Jozsa scaling with the stabilizer method")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="numbers of input qubits")
+    parser.add_argument("--shots", type=int, default=1, help="a noiseless run is decided by a single shot")
+    parser.add_argument("--statevector-max", type=int, default=24, help="largest n run with the statevector method")
+    parser.add_argument("--tableau-max", type=int, default=300, help="largest n run with qiskit.quantum_info")
+    parser.add_argument("--output", default="dj_scaling.json", help="where to save the results")
+    args = parser.parse_args()
+
+    rows = []
+
+    print(f"{'n':>6} {'build':>10} {'stabilizer':>12} {'statevector':>12} {'tableau':>10}  correct", color='blue')
+
+    for n in args.sizes:
+        row = benchmark(n, args)
+        rows.append(row)
+
+        columns = [row["build_ms"], row["stabilizer_ms"], row["statevector_ms"], row["tableau_ms"]]
+        cells = [f"{value:.1f}" if value is not None else "-" for value in columns]
+        print(f"{n:>6} {cells[0]:>10} {cells[1]:>12} {cells[2]:>12} {cells[3]:>10}  ", end='')
+        print(row["correct"], color='green' if row["correct"] else 'red')
+
+    with open(args.output, "w") as fd:
+        json.dump({"shots": args.shots, "unit": "ms", "results": rows}, fd, indent=4)
+
+    if not all(row["correct"] for row in rows):
+        sys.exit("Some oracles were not classified correctly")
+
+
+if __name__ == "__main__":
+    main()
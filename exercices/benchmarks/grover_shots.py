@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import argparse
+from print_color import print
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ex06"))
+import research_algo
+
+from qiskit import QuantumCircuit
+
+
+SIZES = [3, 4, 5, 6, 8, 10, 12, 14, 16, 18, 20]
+
+
+def run_search(n, oracle, marked, iterations, shots):
+    """ Simulate the search with a number of iterations
+
+    * Build the circuit without drawing it: superposition, powered Grover operator, measurements
+    * Transpile and run it on the ideal AerSimulator
+
+    Return
+    -----
+        (dict): the theoretical and observed success probabilities, the shots-to-solution and the durations
+    """
+
+    from qiskit.circuit.library import GroverOperator
+    from qiskit_aer import AerSimulator
+
+    start = time.perf_counter()
+
+    qc = QuantumCircuit(n)
+    qc.h(range(n))
+    qc.compose(GroverOperator(oracle).power(iterations), inplace=True)
+    qc.measure_all()
+
+    sim = AerSimulator(method="statevector")
+    counts = sim.run(research_algo.cached_transpile(qc, sim), shots=shots).result().get_counts()
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    theoretical = research_algo.success_probability(n, 1, iterations)
+    hits = counts.get(marked, 0)
+
+    return {
+        "iterations": iterations,
+        "theoretical": round(theoretical, 6),
+        "observed": round(hits / shots, 6),
+        "shots_to_solution_theoretical": round(1 / theoretical, 2),
+        "shots_to_solution_observed": round(shots / hits, 2) if hits else None,
+        "time_ms": round(elapsed_ms, 1),
+    }
+
+
+def main():
+    """ Compare one Grover iteration with the optimal number of iterations from 3 to 20 qubits
+
+    * For each size, mark one random state with oracle_marked_state()
+    * Run the search with 1 iteration (what diffuser() did) and with floor(π/4 · √N) iterations
+    * Print the shots needed on average to find the marked state and save the results as JSON
+    """
+
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Grover shots-to-solution, one iteration against the optimal number")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="numbers of qubits")
+    parser.add_argument("--shots", type=int, default=200, help="shots per run")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the marked states")
+    parser.add_argument("--output", default="grover_shots.json", help="where to save the results")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+
+    print(f"{'n':>3} {'k':>5} {'P(k=1)':>9} {'P(k opt)':>9} {'shots k=1':>10} {'shots k opt':>12} {'time k opt':>11}", color='blue')
+
+    for n in args.sizes:
+        marked = format(int(rng.integers(2 ** n)), f"0{n}b")
+        oracle = research_algo.oracle_marked_state(n, marked)
+
+        single = run_search(n, oracle, marked, 1, args.shots)
+        optimal = run_search(n, oracle, marked, research_algo.optimal_iterations(n, 1), args.shots)
+        rows.append({"n": n, "marked": marked, "single": single, "optimal": optimal})
+
+        observed_single = single["shots_to_solution_observed"] or "∞"
+        print(f"{n:>3} {optimal['iterations']:>5} {single['observed']:>9.3f} {optimal['observed']:>9.3f} "
+              f"{observed_single:>10} {optimal['shots_to_solution_observed'] or '∞':>12} {optimal['time_ms']:>9.0f}ms")
+
+    with open(args.output, "w") as fd:
+        json.dump({"shots": args.shots, "results": rows}, fd, indent=4)
+
+
+if __name__ == "__main__":
+    main()
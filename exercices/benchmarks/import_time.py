@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from print_color import print
+
+
+EXERCICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SCRIPTS = [
+    "ex01/token_ex01.py",
+    "ex02/superposition.py",
+    "ex03/entanglement.py",
+    "ex04/quantum_noise.py",
+    "ex05/deutsch_jozsa.py",
+    "ex06/research_algo.py",
+    "query_specific_job.py",
+]
+
+# * The listing commands, they should start fast since they only print
+LISTING_SCRIPTS = ["ex01/token_ex01.py", "query_specific_job.py"]
+
+# * Load the script as a module that is not __main__, only its top-level code runs
+LOADER = (
+    "import importlib.util, sys;"
+    "spec = importlib.util.spec_from_file_location('startup_bench', sys.argv[1]);"
+    "module = importlib.util.module_from_spec(spec);"
+    "spec.loader.exec_module(module)"
+)
+
+
+def parse_importtime(stderr, ignored=()):
+    """ Parse the output of python -X importtime
+
+    Params
+    -----
+        stderr (str): the output, one line per import: 'import time: self | cumulative | name'
+        ignored (set): the modules imported by the interpreter itself and by the loader
+
+    * The imports made directly by the script are the ones without indentation in the name column
+    * The total is the sum of their cumulative times
+
+    Return
+    -----
+        (float, list): the total import time in ms and the (module, ms) of the direct imports
+    """
+
+    top_level = []
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  ") and name.strip() not in ignored:
+            top_level.append((name.strip(), int(cumulative) / 1000))
+
+    return sum(ms for _, ms in top_level), top_level
+
+
+def interpreter_modules():
+    """ The direct imports of an interpreter that only runs the imports of the loader """
+
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import importlib.util"],
+                             capture_output=True, text=True)
+
+    return {name for name, _ in parse_importtime(process.stderr)[1]}
+
+
+def measure(script, repeat, ignored):
+    """ Measure the startup of a script, keep the fastest of the repetitions
+
+    Params
+    -----
+        script (str): path of the script relative to the exercices directory
+        repeat (int): number of measures, the first ones warm the file system cache
+        ignored (set): the modules imported by the interpreter, not counted for the script
+
+    * Run the loader in the directory of the script with -X importtime
+    * The interpreter startup (site, encodings, ...) is not counted in the import time
+    * Measure the wall time of the whole interpreter as well
+
+    Return
+    -----
+        (dict): import time, wall time and the heaviest direct imports of the script
+    """
+
+    path = os.path.abspath(os.path.join(EXERCICES_DIR, script))
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", LOADER, path],
+                                 cwd=os.path.dirname(path), capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        if process.returncode != 0:
+            raise RuntimeError(f"{script} failed to load:\n{process.stderr.splitlines()[-1]}")
+
+        import_ms, top_level = parse_importtime(process.stderr, ignored)
+        if best is None or import_ms < best["import_ms"]:
+            heaviest = sorted(top_level, key=lambda item: item[1], reverse=True)[:5]
+            best = {"import_ms": round(import_ms, 1), "wall_ms": round(wall_ms, 1),
+                    "heaviest": [[name, round(ms, 1)] for name, ms in heaviest]}
+
+    return best
+
+
+def main():
+    """ Record the startup time of every exercice and check the budget of the listing commands
+
+    * Measure each script, print and save the results as JSON
+    * Exit with an error if a listing command is above the budget
+    """
+
+    parser = argparse.ArgumentParser(description="Startup time (python -X importtime) of the exercices")
+    parser.add_argument("--repeat", type=int, default=3, help="measures per script, the fastest is kept")
+    parser.add_argument("--output", default="import_time.json", help="where to save the results")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="maximum import time of the listing commands (token_ex01.py, query_specific_job.py)")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "scripts": {}}
+    over_budget = []
+    ignored = interpreter_modules()
+
+    for script in SCRIPTS:
+        result = measure(script, args.repeat, ignored)
+        results["scripts"][script] = result
+
+        print(f"{script}: ", end='')
+        print(f"{result['import_ms']} ms", color='purple', end=' ')
+        print(f"(wall {result['wall_ms']} ms) heaviest: {result['heaviest'][:3]}")
+
+        if args.budget_ms is not None and script in LISTING_SCRIPTS and result["import_ms"] > args.budget_ms:
+            over_budget.append(script)
+
+    with open(args.output, "w") as fd:
+        json.dump(results, fd, indent=4)
+
+    if over_budget:
+        sys.exit(f"Startup budget of {args.budget_ms} ms exceeded by: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+from contextlib import redirect_stdout
+from print_color import print
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+for exercice in ("ex02", "ex03", "ex05", "ex06"):
+    sys.path.insert(1, os.path.join(BENCHMARKS_DIR, "..", exercice))
+import superposition
+import entanglement
+import deutsch_jozsa
+import research_algo
+
+from common import bits, grover, plots, registry
+from common.simulation import simulation_method
+from common.transpile_cache import cached_transpile
+
+
+STAGES = ["build", "transpile", "simulate", "postprocess"]
+
+DJ_SIZES = [3, 20, 100]
+GROVER_SIZES = [3, 5, 8, 10]
+
+SHOTS = 500
+
+
+def quiet(function, *args, **kwargs):
+    """ Call a function of an exercice without its prints, the ASCII drawings are not timed as output """
+
+    with redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def build_superposition():
+    return quiet(superposition.circuit_creation)
+
+
+def build_entanglement():
+    return quiet(entanglement.circuit_creation)
+
+
+def build_dj(kind, n=None):
+    """ The DJ circuit of an oracle: the subject one if n is None, else a generated one with n input qubits """
+
+    if n is None:
+        oracle = quiet(deutsch_jozsa.constant_oracle_subject if kind == "constant" else deutsch_jozsa.balanced_oracle_subject, draw=False)
+    elif kind == "constant":
+        oracle = deutsch_jozsa.generate_constant_oracle(n)
+    else:
+        oracle = deutsch_jozsa.generate_balanced_oracle(n, seed=n)
+
+    return deutsch_jozsa.compile_circuit(oracle, draw=False)
+
+
+def build_grover(n):
+    """ The Grover search of the state 1...1 on n qubits, with the optimal number of iterations """
+
+    qc = research_algo.state_initialisation(n)
+    oracle = research_algo.oracle_marked_state(n, "1" * n)
+
+    return research_algo.diffuser(qc, oracle, research_algo.optimal_iterations(n, 1))
+
+
+def postprocess_counts(result, qc):
+    """ ex02 and ex03: the sorted counts and the frequency of each state """
+
+    counts = dict(sorted(result.get_counts().items()))
+
+    return {state: count / SHOTS for state, count in counts.items()}, True
+
+
+def postprocess_dj(kind):
+    """ ex05: pack the shots, count them and classify the oracle, correct if it is the expected type """
+
+    def postprocess(result, qc):
+        shots = bits.from_aer_result(result, qc.num_clbits)
+        bits.counts(shots)
+        oracle_type, _ = bits.classify(shots)
+        return oracle_type, oracle_type == kind
+
+    return postprocess
+
+
+def postprocess_grover(result, qc):
+    """ ex06: the success probability, correct if the marked state is the most frequent """
+
+    counts = result.get_counts()
+    marked = "1" * qc.num_clbits
+
+    return counts.get(marked, 0) / SHOTS, max(counts, key=counts.get) == marked
+
+
+def flows(args):
+    """ The flows of the exercices: (name, build function, post-processing function) """
+
+    items = [
+        ("ex02 superposition", build_superposition, postprocess_counts),
+        ("ex03 entanglement", build_entanglement, postprocess_counts),
+    ]
+
+    for kind in ("constant", "balanced"):
+        items.append((f"ex05 dj {kind}", lambda kind=kind: build_dj(kind), postprocess_dj(kind)))
+        for n in args.dj_sizes:
+            items.append((f"ex05 dj {kind}:{n}", lambda kind=kind, n=n: build_dj(kind, n), postprocess_dj(kind)))
+
+    for n in args.grover_sizes:
+        items.append((f"ex06 grover:{n}", lambda n=n: build_grover(n), postprocess_grover))
+
+    return items
+
+
+def timed(function, *args):
+    """ Run the function, return its result and its duration in ms """
+
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_flow(build, postprocess, fake):
+    """ Run a flow once, each stage timed separately
+
+    * build: the circuit, as the exercice builds it, without drawing
+    * transpile: for the AerSimulator chosen by the exercices (stabilizer if Clifford), or for the FakeBackend with --fake
+        * the Grover operators are decomposed first, like ex06 does
+    * simulate: SHOTS shots, with the memory of each shot for the post-processing of DJ
+    * postprocess: what the exercice does with the result
+
+    Return
+    -----
+        (dict, bool): the duration in ms of each stage, and whether the result was the expected one
+    """
+
+    qc, build_ms = timed(build)
+
+    backend = registry.get_fake_backend() if fake else registry.get_aer_simulator(simulation_method(qc), workload=qc)
+    run_backend = backend.sim if fake else backend
+
+    isa_circuit, transpile_ms = timed(lambda: cached_transpile(grover.expand(qc, backend), backend))
+    result, simulate_ms = timed(lambda: run_backend.run(isa_circuit, shots=SHOTS, memory=True).result())
+    (_, correct), postprocess_ms = timed(postprocess, result, qc)
+
+    return {"build": build_ms, "transpile": transpile_ms, "simulate": simulate_ms, "postprocess": postprocess_ms}, correct
+
+
+def run(args):
+    """ Run every flow args.repeat times and save the median of each stage as JSON
+
+    * The transpile cache is disabled unless --with-cache: the transpile stage measures qiskit, not the disk
+    * A first run of each flow warms the imports and the simulators, it is not recorded
+    """
+
+    if not args.with_cache:
+        os.environ["FTL_QUANTUM_NO_CACHE"] = "1"
+
+    plots.MODE = "off"
+
+    import qiskit
+    import qiskit_aer
+
+    results = {}
+
+    print(f"{'flow':<24}" + "".join(f"{stage:>13}" for stage in STAGES) + "  correct", color='blue')
+
+    for name, build, postprocess in flows(args):
+        run_flow(build, postprocess, args.fake)
+
+        samples = [run_flow(build, postprocess, args.fake) for _ in range(args.repeat)]
+        medians = {stage: round(statistics.median(sample[stage] for sample, _ in samples), 3) for stage in STAGES}
+        correct = all(ok for _, ok in samples)
+
+        results[name] = dict(medians, correct=correct)
+
+        print(f"{name:<24}" + "".join(f"{medians[stage]:>11.2f}ms" for stage in STAGES) + "  ", end='')
+        print(correct, color='green' if correct else 'red')
+
+    meta = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "qiskit": qiskit.__version__,
+        "qiskit_aer": qiskit_aer.__version__,
+        "cores": os.cpu_count(),
+        "backend": "FakeBackend" if args.fake else "AerSimulator",
+        "repeat": args.repeat,
+        "shots": SHOTS,
+        "unit": "ms",
+    }
+
+    with open(args.output, "w") as fd:
+        json.dump({"meta": meta, "results": results}, fd, indent=4)
+
+    if not all(row["correct"] for row in results.values()):
+        sys.exit("Some flows did not give the expected result")
+
+
+def compare(args):
+    """ Compare a run with a baseline and flag the stages that got slower
+
+    * A stage regresses if it is more than --threshold slower (relative) and --min-ms slower (absolute),
+        * the absolute floor keeps the sub-millisecond stages from flagging on timer noise
+    * Exit with an error code if any stage regressed, for the CI
+    """
+
+    with open(args.baseline) as fd:
+        baseline = json.load(fd)
+    with open(args.current) as fd:
+        current = json.load(fd)
+
+    for key in ("qiskit", "qiskit_aer", "python", "cores", "backend"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"{key}: {baseline['meta'].get(key)} -> {current['meta'].get(key)}", tag='meta', tag_color='yellow', color='white')
+
+    regressions = 0
+
+    print(f"{'flow':<24} {'stage':<12} {'baseline':>11} {'current':>11} {'ratio':>7}", color='blue')
+
+    for name, row in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:<24} not in the baseline", color='yellow')
+            continue
+        for stage in STAGES:
+            before, after = baseline["results"][name][stage], row[stage]
+            ratio = after / before if before else float("inf")
+            regressed = after - before > args.min_ms and ratio > 1 + args.threshold
+            regressions += regressed
+            print(f"{name:<24} {stage:<12} {before:>9.2f}ms {after:>9.2f}ms {ratio:>6.2f}x",
+                  color='red' if regressed else ('green' if ratio < 1 - args.threshold else 'white'))
+
+    if regressions:
+        sys.exit(f"{regressions} stage(s) regressed by more than {args.threshold:.0%}")
+
+    print("No regression", tag='success', tag_color='green', color='white')
+
+
+def main():
+    """ Stage-level benchmark of the flows of the exercices
+
+    * run: time build, transpile, simulate and post-process of every flow, save the medians as JSON
+    * compare: flag the stages of a run that regressed against a baseline run
+    """
+
+    parser = argparse.ArgumentParser(description="Stage-level benchmark of the exercices")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="time every stage of every flow")
+    run_parser.add_argument("--dj-sizes", type=int, nargs="+", default=DJ_SIZES, help="input qubits of the generated DJ oracles")
+    run_parser.add_argument("--grover-sizes", type=int, nargs="+", default=GROVER_SIZES, help="qubits of the Grover searches")
+    run_parser.add_argument("--repeat", type=int, default=5, help="runs per flow, the median is kept")
+    run_parser.add_argument("--fake", action="store_true", help="run on the FakeBackend instead of the AerSimulator")
+    run_parser.add_argument("--with-cache", action="store_true", help="keep the transpile cache enabled")
+    run_parser.add_argument("--output", default="stages.json", help="where to save the results")
+
+    compare_parser = commands.add_parser("compare", help="flag the regressions against a baseline")
+    compare_parser.add_argument("baseline", help="JSON of the baseline run")
+    compare_parser.add_argument("current", help="JSON of the run to check")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged, 0.2 = 20%%")
+    compare_parser.add_argument("--min-ms", type=float, default=1.0, help="absolute slowdown below which nothing is flagged")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+""" Helpers shared by the exercices
+
+The scripts of each exercice add the 'exercices' directory to their path to import them:
+    sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+"""
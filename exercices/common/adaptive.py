@@ -0,0 +1,195 @@
+import math
+from print_color import print
+
+from common.cli import pop_flag, pop_option
+
+
+# * False: the circuits are run with a fixed number of shots
+# * True: the shots are run by rounds until the result is decided with CONFIDENCE
+# * CONFIDENCE holds for the whole run: the result is tested after each round, see round_confidence()
+MODE = False
+CONFIDENCE = 0.99
+
+# * The rounds double from FIRST_ROUND shots: few submissions on a queue, few extra shots once decided
+FIRST_ROUND = 8
+
+
+def configure_from_argv():
+    """ Set the adaptive mode from the flags of the script
+
+    * '--adaptive': run the shots by rounds and stop as soon as the result is decided
+    * '--confidence 0.999': the confidence needed to stop, 0.99 by default
+    * The flags are removed from sys.argv
+    """
+
+    global MODE, CONFIDENCE
+
+    if pop_flag("--adaptive"):
+        MODE = True
+
+    confidence = pop_option("--confidence")
+    if confidence is not None:
+        CONFIDENCE = float(confidence)
+        assert 0 < CONFIDENCE < 1, "The confidence must be between 0 and 1"
+
+
+def enabled():
+    """ True if the shots must be run by rounds """
+
+    return MODE
+
+
+def wilson_interval(hits, shots, confidence=None):
+    """ Wilson score interval of a frequency
+
+    Params
+    -----
+        hits (int): the number of shots with the outcome
+        shots (int): the number of shots
+        confidence (float): the confidence of the interval, CONFIDENCE by default
+
+    * Unlike the normal approximation it stays valid when no shot or every shot has the outcome,
+        * which is the noiseless case of Deutsch-Jozsa
+
+    Return
+    -----
+        (float, float): the lower and upper bounds of the probability of the outcome
+    """
+
+    from statistics import NormalDist
+
+    if shots == 0:
+        return 0.0, 1.0
+
+    z = NormalDist().inv_cdf(1 - (1 - (confidence or CONFIDENCE)) / 2)
+    frequency = hits / shots
+
+    denominator = 1 + z ** 2 / shots
+    center = (frequency + z ** 2 / (2 * shots)) / denominator
+    margin = z * math.sqrt(frequency * (1 - frequency) / shots + z ** 2 / (4 * shots ** 2)) / denominator
+
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def rounds_nb(max_shots):
+    """ Number of rounds of run_rounds() when the result is never decided, i.e. the number of tests """
+
+    shots = min(FIRST_ROUND, max_shots)
+    rounds = 1 if shots > 0 else 0
+
+    while 0 < shots < max_shots:
+        shots += min(shots, max_shots - shots)
+        rounds += 1
+
+    return rounds
+
+
+def round_confidence(max_shots):
+    """ Confidence of the test after each round, so that the whole run is decided with CONFIDENCE
+
+    * The result is tested after each round: with the same confidence at every test,
+        * the chance of one wrong decision over the run would add up above 1 - CONFIDENCE
+    * Bonferroni correction: the error 1 - CONFIDENCE is split between the rounds_nb(max_shots) tests
+
+    Return
+    -----
+        (float): the confidence of the intervals of each test
+    """
+
+    return 1 - (1 - CONFIDENCE) / max(rounds_nb(max_shots), 1)
+
+
+def zero_state_decided(counts, shots, confidence=None):
+    """ Deutsch-Jozsa: the all-zero state is known to be above or below half of the shots
+
+    * The function is constant if the all-zero state is the majority, classify_counts() makes the same choice
+    * confidence: the one of the test, round_confidence() in run_rounds(), CONFIDENCE by default
+    """
+
+    n = len(next(iter(counts)))
+    lower, upper = wilson_interval(counts.get("0" * n, 0), shots, confidence)
+
+    return lower > 0.5 or upper < 0.5
+
+
+def top_states_decided(marked_nb=1):
+    """ Grover: the marked_nb most frequent states are known to be more probable than every other state
+
+    * The lower bound of the last of them is above the upper bound of the next state
+    * The marked states of a Grover search have the same probability, only the boundary with the others is checked
+    * The test uses two intervals, the error of the test is split between them
+
+    Return
+    -----
+        (function): the decided() function for run_rounds()
+    """
+
+    def decided(counts, shots, confidence=None):
+        confidence = 1 - (1 - (confidence or CONFIDENCE)) / 2
+        ranked = sorted(counts.values(), reverse=True) + [0] * (marked_nb + 1)
+        lower, _ = wilson_interval(ranked[marked_nb - 1], shots, confidence)
+        _, upper = wilson_interval(ranked[marked_nb], shots, confidence)
+        return lower > upper
+
+    return decided
+
+
+def run_rounds(run_round, decided, max_shots):
+    """ Run shots by rounds until the result is decided or max_shots are spent
+
+    Params
+    -----
+        run_round (function): run a number of shots and return their counts
+        decided (function): take the accumulated counts, shots and the confidence of the test, True when the result is known
+        max_shots (int): the number of shots of the fixed run, never exceeded
+
+    * The first round has FIRST_ROUND shots, each next round doubles the total
+    * Each test is done with round_confidence(max_shots), the decision of the run holds with CONFIDENCE
+
+    Return
+    -----
+        (dict, int): the accumulated counts and the number of shots spent
+    """
+
+    counts = {}
+    shots = 0
+    round_shots = min(FIRST_ROUND, max_shots)
+    confidence = round_confidence(max_shots)
+
+    while round_shots > 0:
+        for state, count in run_round(round_shots).items():
+            counts[state] = counts.get(state, 0) + count
+        shots += round_shots
+
+        if decided(counts, shots, confidence):
+            print(f"Decided after {shots} shots (confidence {CONFIDENCE})", tag='adaptive', tag_color='cyan', color='white')
+            return counts, shots
+
+        round_shots = min(shots, max_shots - shots)
+
+    print(f"Not decided after {shots} shots (confidence {CONFIDENCE})", tag='adaptive', tag_color='cyan', color='red')
+
+    return counts, shots
+
+
+def run_simulator(sim, isa_circuit, decided, max_shots):
+    """ run_rounds() on an AerSimulator """
+
+    return run_rounds(lambda shots: sim.run(isa_circuit, shots=shots).result().get_counts(), decided, max_shots)
+
+
+def run_sampler(sampler, isa_circuit, bits_name, decided, max_shots):
+    """ run_rounds() with a SamplerV2, one job per round
+
+    * The ID of each job is printed, on hardware each round goes through the queue
+        * its status is polled with jobs.result()
+    """
+
+    from common import bits, jobs
+
+    def run_round(shots):
+        job = sampler.run([isa_circuit], shots=shots)
+        print(f"Job ID: {job.job_id()} ({shots} shots)")
+        return bits.counts(getattr(jobs.result(job)[0].data, bits_name))
+
+    return run_rounds(run_round, decided, max_shots)
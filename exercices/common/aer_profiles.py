@@ -0,0 +1,110 @@
+import os
+import json
+
+from common.cache import cache_enabled, cache_path, write_atomic
+
+
+# * The options given to AerSimulator for each kind of workload, 0 means as many as the cores
+# * small_batch: many small circuits, one experiment per core, a circuit is too small to share it
+# * shots: a single small circuit, its shots are spread on the cores
+# * wide: a single wide circuit (Grover), the cores share its statevector, the gates are fused
+PROFILES = {
+    "small_batch": {
+        "max_parallel_threads": 0,
+        "max_parallel_experiments": 0,
+        "max_parallel_shots": 1,
+        "fusion_enable": False,
+    },
+    "shots": {
+        "max_parallel_threads": 0,
+        "max_parallel_experiments": 1,
+        "max_parallel_shots": 0,
+        "fusion_enable": False,
+    },
+    "wide": {
+        "max_parallel_threads": 0,
+        "max_parallel_experiments": 1,
+        "max_parallel_shots": 1,
+        "fusion_enable": True,
+        "statevector_parallel_threshold": 10,
+    },
+}
+
+# * From this number of qubits a circuit is a 'wide' workload
+WIDE_QUBITS = 14
+
+# * FTL_QUANTUM_AER_PROFILE=name: use this profile for every AerSimulator instead of choosing it
+FORCED = os.environ.get("FTL_QUANTUM_AER_PROFILE")
+
+_tuned = None
+
+
+def tuned_path():
+    """ The options found by benchmarks/aer_tuning.py on this host """
+
+    return cache_path("aer_profiles.json")
+
+
+def _load_tuned():
+    """ The tuned options of each profile, {} if the benchmark was never run or the caches are disabled """
+
+    global _tuned
+
+    if _tuned is None:
+        _tuned = {}
+        if cache_enabled() and os.path.exists(tuned_path()):
+            try:
+                with open(tuned_path()) as fd:
+                    _tuned = json.load(fd)
+            except (OSError, ValueError):
+                _tuned = {}
+
+    return _tuned
+
+
+def save_tuned(profiles):
+    """ Save the best options of each profile for the next processes
+
+    Param
+    -----
+        profiles (dict): the options of each profile name, they replace the default ones
+    """
+
+    global _tuned
+
+    _tuned = dict(_load_tuned(), **profiles)
+    write_atomic(tuned_path(), json.dumps(_tuned, indent=4).encode())
+
+
+def options(profile):
+    """ The AerSimulator options of a profile, the tuned ones if the benchmark was run """
+
+    return dict(PROFILES[profile], **_load_tuned().get(profile, {}))
+
+
+def choose(circuits):
+    """ Choose the profile of a workload
+
+    Param
+    -----
+        circuits (QuantumCircuit or list): the circuits that will be run together
+
+    * FTL_QUANTUM_AER_PROFILE forces the profile
+    * Any circuit of WIDE_QUBITS qubits or more makes the workload 'wide'
+    * Else several circuits are a 'small_batch', a single one is a 'shots' workload
+
+    Return
+    -----
+        (str): the name of the profile
+    """
+
+    if FORCED:
+        return FORCED
+
+    if not isinstance(circuits, list):
+        circuits = [circuits]
+
+    if max(circuit.num_qubits for circuit in circuits) >= WIDE_QUBITS:
+        return "wide"
+
+    return "small_batch" if len(circuits) > 1 else "shots"
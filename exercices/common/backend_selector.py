@@ -0,0 +1,144 @@
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from print_color import print
+
+from common.transpile_cache import cached_transpile, circuit_hash
+
+
+# * Runtime of a job when none of our jobs on any backend has a known usage yet
+DEFAULT_JOB_SECONDS = 10.0
+
+# * The typical runtime of a job follows the usage of our finished jobs, it is reused ESTIMATE_TTL seconds
+# * The pending jobs change quickly, they are never cached
+ESTIMATE_TTL = 60
+
+# * Number of backends whose status is probed at the same time
+MAX_WORKERS = 8
+
+_durations = {}
+_estimates = {}
+
+
+def job_seconds(backend_name):
+    """ Typical runtime of a job on a backend, from the usage of our own jobs in the job store
+
+    * The median of the jobs on this backend, else of all our jobs, else DEFAULT_JOB_SECONDS
+    * The jobs of the other users are not known, ours are taken as representative of the queue
+    """
+
+    from common import job_store
+
+    conn = job_store.connect()
+    rows = conn.execute("SELECT backend, usage_seconds FROM jobs WHERE usage_seconds IS NOT NULL").fetchall()
+    conn.close()
+
+    on_backend = [row["usage_seconds"] for row in rows if row["backend"] == backend_name]
+
+    if on_backend:
+        return statistics.median(on_backend)
+    if rows:
+        return statistics.median(row["usage_seconds"] for row in rows)
+
+    return DEFAULT_JOB_SECONDS
+
+
+def circuit_seconds(circuit, backend):
+    """ Duration of one shot of a circuit on a backend
+
+    * The circuit is transpiled for the backend with the cache, the run that follows reuses it
+    * The duration of the scheduled ISA circuit on the target, plus the delay between two shots
+    """
+
+    key = (backend.name, circuit_hash(circuit))
+
+    if key not in _durations:
+        isa_circuit = cached_transpile(circuit, backend, optimization_level=1)
+        try:
+            duration = isa_circuit.estimate_duration(backend.target, unit="s")
+        except Exception:
+            duration = 0.0
+        configuration = backend.configuration() if hasattr(backend, "configuration") else None
+        _durations[key] = duration + (getattr(configuration, "default_rep_delay", None) or 0.0)
+
+    return _durations[key]
+
+
+def estimate(backend, pending_jobs, circuits, shots):
+    """ Estimate the time until the result of the circuits on a backend
+
+    Params
+    -----
+        backend (IBMBackend): the candidate backend
+        pending_jobs (int): the jobs waiting before ours
+        circuits (list): the circuits of the job
+        shots (int): the shots of each circuit
+
+    * Queue: the pending jobs, each one taking the typical runtime of a job on this backend
+    * Execution: the shots of each circuit, each one taking the duration of the transpiled circuit
+    * The execution and the runtime of a job are cached for ESTIMATE_TTL seconds, the queue is computed on every call
+
+    Return
+    -----
+        (dict): the queue, execution and total seconds
+    """
+
+    key = (backend.name, tuple(circuit_hash(circuit) for circuit in circuits), shots)
+    cached = _estimates.get(key)
+
+    if cached is None or time.monotonic() - cached["at"] >= ESTIMATE_TTL:
+        cached = {
+            "at": time.monotonic(),
+            "job": job_seconds(backend.name),
+            "execution": shots * sum(circuit_seconds(circuit, backend) for circuit in circuits),
+        }
+        _estimates[key] = cached
+
+    queue = pending_jobs * cached["job"]
+
+    return {"queue": queue, "execution": cached["execution"], "total": queue + cached["execution"]}
+
+
+def select_backend(service, circuits, shots):
+    """ Select the backend that should give the result of the circuits the soonest
+
+    Params
+    -----
+        service (QiskitRuntimeService): the service, or its local stand-in
+        circuits (QuantumCircuit or list): the circuits that will be run
+        shots (int): the shots of each circuit
+
+    * The operational real backends with enough qubits are the candidates
+    * Their status is probed concurrently, then the time to result of each one is estimated
+        * least_busy() only counts the pending jobs, a fast backend with a longer queue can be sooner
+    * Fall back to least_busy() if no backend can be estimated
+
+    Return
+    -----
+        backend (IBMBackend): the backend with the smallest estimated time to result
+    """
+
+    if not isinstance(circuits, list):
+        circuits = [circuits]
+
+    width = max(circuit.num_qubits for circuit in circuits)
+    candidates = [bck for bck in service.backends(operational=True, simulator=False) if bck.num_qubits >= width]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        statuses = list(pool.map(lambda bck: bck.status(), candidates))
+
+    estimates = []
+
+    for bck, status in zip(candidates, statuses):
+        try:
+            estimates.append((estimate(bck, status.pending_jobs, circuits, shots)["total"], bck, status.pending_jobs))
+        except Exception as exception:
+            print(f"{bck.name} cannot be estimated: {exception}", tag='backend', tag_color='red', color='white')
+
+    if not estimates:
+        return service.least_busy(operational=True, simulator=False)
+
+    for total, bck, pending in sorted(estimates, key=lambda item: item[0]):
+        print(f"{bck.name}: {pending} pending jobs, about {total:.0f}s to result", tag='backend', tag_color='cyan', color='white')
+
+    return min(estimates, key=lambda item: item[0])[1]
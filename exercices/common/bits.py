@@ -0,0 +1,117 @@
+import numpy as np
+
+
+# * The shots are kept as a BitArray: one row of packed uint8 per shot, the last clbit first (big endian)
+# * like the results of the SamplerV2, 1 byte per 8 clbits instead of a Python string per shot
+
+
+def from_hex_memory(memory, num_bits):
+    """ Pack the memory of an Aer run, one hexadecimal string per shot
+
+    Params
+    -----
+        memory (list): the hexadecimal outcome of each shot, e.g. '0x1a'
+        num_bits (int): the number of clbits of the circuit
+
+    * The strings are padded and joined, then decoded at once by bytes.fromhex()
+        * no integer is built per shot
+
+    Return
+    -----
+        (BitArray): the packed shots
+    """
+
+    from qiskit.primitives.containers import BitArray
+
+    num_bytes = (num_bits + 7) // 8
+    data = bytes.fromhex("".join(value[2:].zfill(2 * num_bytes) for value in memory))
+
+    return BitArray(np.frombuffer(data, dtype=np.uint8).reshape(-1, num_bytes), num_bits)
+
+
+def from_aer_result(result, num_bits, experiment=0):
+    """ Packed shots of an AerSimulator run made with memory=True """
+
+    return from_hex_memory(result.results[experiment].data.memory, num_bits)
+
+
+def zero_shots(bit_array):
+    """ Mask of the shots where every clbit is 0 """
+
+    return ~bit_array.array.reshape(-1, bit_array.array.shape[-1]).any(axis=-1)
+
+
+def classify(bit_array):
+    """ Deduce the type of a Deutsch-Jozsa oracle from its packed shots
+
+    * Same rule as classify_counts(): constant if the all-zero state is the majority of the shots
+    * One pass over the bytes, the counts of the other states are not needed
+
+    Return
+    -----
+        (str, float): the type of the function and the frequency of the all-zero state
+    """
+
+    zero_frequency = np.count_nonzero(zero_shots(bit_array)) / bit_array.size / bit_array.num_shots
+
+    return ("constant" if zero_frequency >= 0.5 else "balanced"), zero_frequency
+
+
+def as_uint64(bit_array):
+    """ The shots as words of 64 clbits, the first word holds the last clbits
+
+    * The rows of bytes are padded to a multiple of 8 bytes and viewed as big endian uint64, no copy per shot
+
+    Return
+    -----
+        (np.ndarray): shape (shots, words)
+    """
+
+    rows = bit_array.array.reshape(-1, bit_array.array.shape[-1])
+    words = (rows.shape[1] + 7) // 8
+
+    padded = np.zeros((rows.shape[0], 8 * words), dtype=np.uint8)
+    padded[:, 8 * words - rows.shape[1]:] = rows
+
+    return padded.view(">u8")
+
+
+def counts(bit_array):
+    """ Count the occurences of each outcome of packed shots
+
+    * The shots are sorted as words of uint64, equal neighbours are the same outcome
+    * Only the distinct outcomes are formatted as bitstrings
+        * BitArray.get_counts() formats every shot in Python
+
+    Return
+    -----
+        (dict): the occurences of each outcome, same keys as BitArray.get_counts()
+    """
+
+    words = as_uint64(bit_array)
+
+    if words.shape[1] == 1:
+        values, occurences = np.unique(words[:, 0], return_counts=True)
+        return {format(int(value), f"0{bit_array.num_bits}b"): int(occurence) for value, occurence in zip(values, occurences)}
+
+    ordered = words[np.lexsort(words.T[::-1])]
+    starts = np.flatnonzero(np.concatenate(([True], (ordered[1:] != ordered[:-1]).any(axis=1))))
+    occurences = np.diff(np.append(starts, len(ordered)))
+
+    outcomes = {}
+    for start, occurence in zip(starts, occurences):
+        value = 0
+        for word in ordered[start]:
+            value = (value << 64) | int(word)
+        outcomes[format(value, f"0{bit_array.num_bits}b")] = int(occurence)
+
+    return outcomes
+
+
+def to_strings(bit_array, limit=None):
+    """ Format the first shots as bitstrings, to print them """
+
+    rows = bit_array.array.reshape(-1, bit_array.array.shape[-1])[:limit]
+    mask = (1 << bit_array.num_bits) - 1
+
+    return [format(int.from_bytes(row.tobytes(), "big") & mask, f"0{bit_array.num_bits}b") for row in rows]
@@ -0,0 +1,91 @@
+import os
+import tempfile
+
+
+CACHE_DIR = os.environ.get("FTL_QUANTUM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ftl_quantum"))
+
+
+def cache_enabled():
+    """ The on-disk caches can be disabled by setting FTL_QUANTUM_NO_CACHE=1 """
+
+    return os.environ.get("FTL_QUANTUM_NO_CACHE", "0") != "1"
+
+
+def cache_path(*parts):
+    """ Get a path inside the cache directory, the parent directories are created
+
+    Param
+    -----
+        parts (str): the sub-directories and file name inside the cache directory
+
+    Return
+    -----
+        path (str): the absolute path of the entry
+    """
+
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    return path
+
+
+def write_atomic(path, data):
+    """ Write the data in a temporary file then move it to its final path
+
+    Params
+    -----
+        path (str): where to write the data
+        data (bytes): the content of the file
+
+    * Several processes can write the same entry at the same time,
+        * os.replace() guarantees that a reader never sees a partially written file
+    """
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def touch(path):
+    """ Mark an entry as recently used, its modification time is the LRU order """
+
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_lru(directory, max_bytes):
+    """ Remove the least recently used entries until the directory fits in max_bytes
+
+    Params
+    -----
+        directory (str): the cache directory to bound
+        max_bytes (int): the maximum total size of the entries
+
+    * List the entries with their size and modification time
+    * Remove the oldest ones while the total size is above the limit
+    """
+
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
@@ -0,0 +1,98 @@
+import sys
+from print_color import print
+
+
+def pop_flag(flag):
+    """ Remove a flag from the arguments of the script
+
+    The exercices read their positional arguments from sys.argv,
+    the optional flags are removed before so the checks on sys.argv stay the same.
+
+    Param
+    -----
+        flag (str): the flag to look for, e.g. '--no-plots'
+
+    Return
+    -----
+        (bool): True if the flag was passed to the script
+    """
+
+    if flag in sys.argv[1:]:
+        sys.argv.remove(flag)
+        return True
+
+    return False
+
+
+def pop_option(option):
+    """ Remove an option and its value from the arguments of the script
+
+    Param
+    -----
+        option (str): the option to look for, e.g. '--marked'
+
+    Return
+    -----
+        (str): the value given after the option, None if the option was not passed
+    """
+
+    arguments = sys.argv[1:]
+
+    if option not in arguments:
+        return None
+
+    index = arguments.index(option) + 1
+    assert index + 1 <= len(arguments), f"Missing value after {option}"
+
+    value = sys.argv.pop(index + 1)
+    sys.argv.pop(index)
+
+    return value
+
+
+def pop_answer(flag):
+    """ Remove a yes/no flag and its negation from the arguments of the script
+
+    Param
+    -----
+        flag (str): the flag that answers yes, e.g. '--real', '--no-real' answers no
+
+    Return
+    -----
+        (bool): the answer given by the flags, None if none of them was passed
+    """
+
+    if pop_flag(flag):
+        return True
+    if pop_flag(f"--no-{flag[2:]}"):
+        return False
+
+    return None
+
+
+def confirm(question, answer=None, color='cyan'):
+    """ Ask a yes/no question, only when the answer was not given and there is someone to answer it
+
+    Params
+    -----
+        question (str): the question, '(y or n)' is added
+        answer (bool): the answer already given by pop_answer(), None to ask
+        color (str): the color of the question
+
+    * Without a terminal on stdin (cron, CI, pipe) the answer is no, the script never blocks
+
+    Return
+    -----
+        (bool): True if the answer is yes
+    """
+
+    if answer is None and not sys.stdin.isatty():
+        print(f"{question} no, not in a terminal", color=color, tag='prompt')
+        return False
+
+    if answer is not None:
+        return answer
+
+    print(f"{question} (y or n)", color=color, tag='prompt', end=': ')
+
+    return input().strip() == "y"
@@ -0,0 +1,207 @@
+from common import tracing
+from common.cli import pop_flag
+from common.simulation import is_clifford
+
+
+# * None: the Aer paths sample the circuit
+# * 'probabilities': the exact distribution is returned, as the expected counts for the number of shots, rounded to integers
+# * 'sample': the counts are drawn in numpy from the exact distribution
+MODE = None
+
+# * Aer can only save the probabilities of 64 qubits with the stabilizer method,
+# * above the qubits are saved by chunks: if every chunk is deterministic the outcome is too
+AER_MAX_MEASURED = 64
+
+
+def configure_from_argv():
+    """ Set the exact mode from the flags of the script
+
+    * '--exact': the Aer paths return the exact probabilities, no shot is simulated
+    * '--exact-sample': the Aer paths sample the shots in numpy from the exact probabilities
+    * The flags are removed from sys.argv
+    """
+
+    global MODE
+
+    if pop_flag("--exact"):
+        MODE = "probabilities"
+    if pop_flag("--exact-sample"):
+        MODE = "sample"
+
+
+def enabled():
+    """ True if the Aer paths must use the exact distribution instead of sampling """
+
+    return MODE is not None
+
+
+def _measured_qubits(qc):
+    """ Map each classical bit to the qubit measured in it
+
+    * The measurements must be at the end of the circuit, the state before them is the one computed
+
+    Return
+    -----
+        (list): the qubit index of each clbit, in the order of the clbits, None if it is not measured
+    """
+
+    measured = [None] * qc.num_clbits
+
+    for instruction in qc.data:
+        if instruction.operation.name == "measure":
+            clbit = qc.find_bit(instruction.clbits[0]).index
+            measured[clbit] = qc.find_bit(instruction.qubits[0]).index
+
+    return measured
+
+
+def _format_key(qc, bits):
+    """ Format the outcome of the clbits like the keys of get_counts(): one word per register, q_0 on the right """
+
+    if len(qc.cregs) <= 1:
+        return "".join(reversed(bits))
+
+    words = []
+    for creg in reversed(qc.cregs):
+        words.append("".join(bits[qc.find_bit(clbit).index] for clbit in reversed(creg)))
+
+    return " ".join(words)
+
+
+def probabilities(qc):
+    """ Exact distribution of the measurements of a circuit, without any shot
+
+    Param
+    -----
+        qc (QuantumCircuit): the circuit with its final measurements
+
+    * Remove the final measurements and keep which qubit is measured in which clbit
+    * A Clifford circuit is computed with the stabilizer tableau, polynomial in the number of qubits
+        * above AER_MAX_MEASURED measured qubits Aer saves them by chunks,
+            * when a chunk is not deterministic the joint distribution is computed by qiskit.quantum_info, slower
+    * Otherwise with the statevector of Aer, 2^n amplitudes
+    * Only the outcomes with a non-zero probability are kept
+
+    Return
+    -----
+        (dict, str): the probability of each outcome formatted like the counts, the method used
+    """
+
+    from common import registry
+    from common.transpile_cache import cached_transpile
+
+    measured = _measured_qubits(qc)
+    qubits = [qubit for qubit in measured if qubit is not None]
+
+    state = qc.remove_final_measurements(inplace=False)
+    if any(instruction.operation.name == "measure" for instruction in state.data):
+        raise ValueError("The exact mode needs the measurements at the end of the circuit")
+
+    method = "stabilizer" if is_clifford(state) else "statevector"
+
+    sim = registry.get_aer_simulator(method, workload=state)
+    isa_state = cached_transpile(state, sim)
+
+    chunks = [qubits[start:start + AER_MAX_MEASURED] for start in range(0, len(qubits), AER_MAX_MEASURED)] or [[]]
+    for index, chunk in enumerate(chunks):
+        isa_state.save_probabilities_dict(chunk, label=f"probabilities_{index}")
+
+    with tracing.span("exact run", method=method, qubits=state.num_qubits):
+        data = sim.run(isa_state, shots=1).result().data(0)
+    saved = [data[f"probabilities_{index}"] for index in range(len(chunks))]
+
+    if len(saved) == 1:
+        values = saved[0]
+    elif all(len(chunk) == 1 for chunk in saved):
+        values = {sum(next(iter(chunk)) << (AER_MAX_MEASURED * index) for index, chunk in enumerate(saved)): 1.0}
+    else:
+        from qiskit.quantum_info import StabilizerState
+
+        outcomes = StabilizerState(state).probabilities_dict(qubits)
+        values = {int(outcome, 2): probability for outcome, probability in outcomes.items()}
+
+    distribution = {}
+
+    for value, probability in values.items():
+        bits = ["0"] * qc.num_clbits
+        for position, clbit in enumerate(clbit for clbit, qubit in enumerate(measured) if qubit is not None):
+            bits[clbit] = "1" if (value >> position) & 1 else "0"
+        distribution[_format_key(qc, bits)] = probability
+
+    return distribution, f"exact {method}"
+
+
+def sample_counts(distribution, shots, seed=None):
+    """ Draw the counts of a number of shots from an exact distribution
+
+    Params
+    -----
+        distribution (dict): the probability of each outcome
+        shots (int): the number of shots
+        seed (int): seed of the numpy generator
+
+    * One multinomial draw in numpy, no simulation is done per shot
+
+    Return
+    -----
+        counts (dict): the occurences of each outcome, only the ones drawn
+    """
+
+    import numpy as np
+
+    outcomes = list(distribution)
+    weights = np.array([distribution[outcome] for outcome in outcomes], dtype=float)
+
+    drawn = np.random.default_rng(seed).multinomial(shots, weights / weights.sum())
+
+    return {outcome: int(count) for outcome, count in zip(outcomes, drawn) if count}
+
+
+def expected_counts(distribution, shots):
+    """ Round the expected counts of an exact distribution to integers
+
+    Params
+    -----
+        distribution (dict): the probability of each outcome
+        shots (int): the number of shots
+
+    * probability * shots is floored, the shots left go to the largest remainders (largest remainder method)
+        * the counts are integers and sum to shots, like the counts of a real run
+
+    Return
+    -----
+        counts (dict): the expected occurences of each outcome, only the ones above 0
+    """
+
+    exact = {outcome: probability * shots for outcome, probability in distribution.items()}
+    counts = {outcome: int(value) for outcome, value in exact.items()}
+
+    left = shots - sum(counts.values())
+    for outcome in sorted(exact, key=lambda outcome: counts[outcome] - exact[outcome])[:max(left, 0)]:
+        counts[outcome] += 1
+
+    return {outcome: count for outcome, count in counts.items() if count}
+
+
+def run(qc, shots):
+    """ Replace the run of a circuit on an AerSimulator
+
+    Params
+    -----
+        qc (QuantumCircuit): the circuit with its final measurements
+        shots (int): the number of shots of the sampled run
+
+    * 'probabilities' mode: the expected counts, probability * shots rounded to integers, the reports stay the same
+    * 'sample' mode: counts drawn from the exact distribution
+
+    Return
+    -----
+        (dict, str): the counts and the method used
+    """
+
+    distribution, method = probabilities(qc)
+
+    if MODE == "sample":
+        return sample_counts(distribution, shots), f"{method} (sampled)"
+
+    return expected_counts(distribution, shots), method
@@ -0,0 +1,159 @@
+import io
+import os
+import hashlib
+
+from common import tracing
+from common.cache import cache_enabled, cache_path, evict_lru, touch, write_atomic
+from common.transpile_cache import MAX_CACHE_BYTES, circuit_hash
+
+
+# * The name of the gate of a GroverOperator once it is composed in a circuit
+GATE_NAME = "Q"
+
+# * The basis of the decomposition for a device: the layout and routing of the whole circuit
+# * are faster from cx than from the native 2-qubit gate of the device (ecr for the Eagle processors)
+DEVICE_BASIS = ("cx", "u")
+
+# * One instance per process of each Grover operator and of each of its decompositions
+_operators = {}
+_decompositions = {}
+
+
+def operator(oracle, n):
+    """ Get the Grover operator of an oracle, built once per process
+
+    Params
+    -----
+        oracle (QuantumCircuit): the circuit of the oracle, with its ancillas if any
+        n (int): the number of searched qubits, the amplification is only on them
+
+    Return
+    -----
+        (GroverOperator): the operator, with barriers between the oracle and the amplification
+    """
+
+    key = (circuit_hash(oracle), n)
+
+    if key not in _operators:
+        from qiskit.circuit.library import GroverOperator
+
+        _operators[key] = GroverOperator(oracle, reflection_qubits=list(range(n)), insert_barriers=True)
+
+    return _operators[key]
+
+
+def _is_simulator(backend):
+    """ A simulator has no coupling map, its target accepts any pair of qubits """
+
+    return backend.target.build_coupling_map() is None
+
+
+def basis_of(backend):
+    """ The gates the Grover operator is decomposed into for a backend
+
+    * A simulator keeps its own gates, its multi-controlled gates included
+    * A device gets DEVICE_BASIS, its own transpilation translates it
+    """
+
+    if not _is_simulator(backend):
+        return DEVICE_BASIS
+
+    from qiskit.circuit import Gate
+
+    target = backend.target
+
+    return tuple(sorted(name for name in target.operation_names if isinstance(target.operation_from_name(name), Gate)))
+
+
+def decomposition(definition, backend):
+    """ Get the decomposition of a Grover operator for a backend, from the process, the disk or synthesized
+
+    Params
+    -----
+        definition (QuantumCircuit): the circuit of the operator, its oracle and the amplification
+        backend (BackendV2): the backend the circuit will be transpiled for, it sets the basis (basis_of())
+
+    * The key is the structural hash of the operator (its oracle and its number of qubits), the basis and the qiskit version
+    * The multi-controlled gates of the amplification are synthesized once, without layout nor routing,
+        * every power of the operator and every run for the same basis reuse it
+    * Saved as QPY next to the transpile cache, within its size limit
+
+    Return
+    -----
+        (QuantumCircuit): the operator with only gates of the basis
+    """
+
+    import qiskit
+
+    basis = basis_of(backend)
+    key = hashlib.sha256(f"{circuit_hash(definition)}/{','.join(basis)}/{qiskit.__version__}".encode()).hexdigest()
+
+    if key in _decompositions:
+        return _decompositions[key]
+
+    from qiskit import qpy
+
+    path = cache_path("grover", f"{key}.qpy") if cache_enabled() else None
+    decomposed = None
+
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path, "rb") as fd:
+                decomposed = qpy.load(fd)[0]
+            touch(path)
+        except Exception:
+            decomposed = None
+
+    if decomposed is None:
+        from qiskit import transpile
+
+        with tracing.span("decompose grover operator", qubits=definition.num_qubits, basis=len(basis)):
+            if _is_simulator(backend):
+                decomposed = transpile(definition, target=backend.target, optimization_level=1)
+            else:
+                decomposed = transpile(definition, basis_gates=list(basis), optimization_level=1)
+
+        if path is not None:
+            buffer = io.BytesIO()
+            qpy.dump(decomposed, buffer)
+            write_atomic(path, buffer.getvalue())
+            evict_lru(os.path.dirname(path), MAX_CACHE_BYTES)
+
+    _decompositions[key] = decomposed
+
+    return decomposed
+
+
+def expand(circuit, backend):
+    """ Replace the Grover operators of a circuit by their decomposition for a backend
+
+    Params
+    -----
+        circuit (QuantumCircuit): a circuit with GroverOperator composed into it, e.g. the one of diffuser()
+        backend (BackendV2): the backend the circuit will be transpiled for
+
+    * Each power of the operator is a gate Q in the circuit: they all share the same decomposition
+    * The transpilation that follows only has to map the circuit to the device
+    * A circuit without Grover operator is returned as it is
+
+    Return
+    -----
+        (QuantumCircuit): the circuit with the operators decomposed
+    """
+
+    if not any(instruction.operation.name == GATE_NAME for instruction in circuit.data):
+        return circuit
+
+    expanded = circuit.copy_empty_like()
+    decomposed = {}
+
+    for instruction in circuit.data:
+        operation = instruction.operation
+        if operation.name == GATE_NAME and operation.definition is not None:
+            if id(operation) not in decomposed:
+                decomposed[id(operation)] = decomposition(operation.definition, backend)
+            expanded.compose(decomposed[id(operation)], qubits=instruction.qubits, inplace=True)
+        else:
+            expanded.append(instruction)
+
+    return expanded
@@ -0,0 +1,199 @@
+import zlib
+import sqlite3
+
+from common.cache import cache_path
+
+
+# * Final statuses: the job does not change anymore, its metadata is not fetched again
+FINAL_STATUSES = {"DONE", "ERROR", "CANCELLED"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    backend TEXT,
+    creation_date TEXT,
+    status TEXT,
+    shots INTEGER,
+    usage_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_creation_date ON jobs (creation_date);
+CREATE INDEX IF NOT EXISTS jobs_backend ON jobs (backend);
+CREATE TABLE IF NOT EXISTS sync (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT,
+    pub_index INTEGER,
+    register TEXT,
+    num_bits INTEGER,
+    shape TEXT,
+    data BLOB,
+    PRIMARY KEY (job_id, pub_index, register)
+);
+"""
+
+
+def connect(path=None):
+    """ Open the job store, a SQLite database in the cache directory
+
+    Param
+    -----
+        path (str): the database file, 'jobs.sqlite' in the cache directory by default
+
+    * 'jobs': one row per job, indexed by ID, creation date and backend
+        * the dates are stored in UTC, their text order is their chronological order
+    * 'sync': the date until which all the jobs of the account are stored
+    * 'results': the raw BitArray of each register of each PUB, compressed with zlib
+
+    Return
+    -----
+        conn (sqlite3.Connection): the connection, the rows can be read by column name
+    """
+
+    conn = sqlite3.connect(path or cache_path("jobs.sqlite"))
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+
+    return conn
+
+
+def _utc(date):
+    """ A date in UTC as text, a date without timezone is a local one """
+
+    from datetime import timezone
+
+    return date.astimezone(timezone.utc).isoformat()
+
+
+def save_job(conn, job_id, backend, creation_date, status):
+    """ Insert or update the metadata of a job, the shots and usage already stored are kept """
+
+    conn.execute(
+        "INSERT INTO jobs (job_id, backend, creation_date, status) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (job_id) DO UPDATE SET backend = excluded.backend, status = excluded.status",
+        (job_id, backend, _utc(creation_date), status),
+    )
+    conn.commit()
+
+
+def get_watermark(conn):
+    """ Date until which all the jobs of the account are stored, None if they were never listed
+
+    * The jobs listed with filters are stored but do not move it, some jobs may be missing before them
+    """
+
+    from datetime import datetime
+
+    row = conn.execute("SELECT value FROM sync WHERE name = 'jobs'").fetchone()
+
+    return datetime.fromisoformat(row["value"]) if row else None
+
+
+def set_watermark(conn, date):
+    """ All the jobs created until this date are stored """
+
+    conn.execute("INSERT OR REPLACE INTO sync VALUES ('jobs', ?)", (_utc(date),))
+    conn.commit()
+
+
+def pending_jobs(conn):
+    """ IDs of the jobs stored with a status that can still change """
+
+    placeholders = ", ".join("?" * len(FINAL_STATUSES))
+    rows = conn.execute(f"SELECT job_id FROM jobs WHERE status NOT IN ({placeholders})", tuple(FINAL_STATUSES))
+
+    return [row["job_id"] for row in rows]
+
+
+def list_jobs(conn, backend=None, created_after=None, created_before=None, status=None):
+    """ The jobs stored, the most recent first
+
+    Params
+    -----
+        backend (str): only the jobs of this backend
+        created_after (datetime): only the jobs created after this date
+        created_before (datetime): only the jobs created before this date
+        status (str): only the jobs with this status
+
+    Return
+    -----
+        (list): the rows of the jobs table
+    """
+
+    conditions = []
+    values = []
+
+    for condition, value in (("backend = ?", backend), ("status = ?", status),
+                             ("creation_date >= ?", created_after and _utc(created_after)),
+                             ("creation_date <= ?", created_before and _utc(created_before))):
+        if value is not None:
+            conditions.append(condition)
+            values.append(value)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    return conn.execute(f"SELECT * FROM jobs {where} ORDER BY creation_date DESC", values).fetchall()
+
+
+def save_result(conn, job_id, result, usage_seconds=None):
+    """ Store the raw measurements of a job
+
+    Params
+    -----
+        result (PrimitiveResult): the result of the job
+        usage_seconds (float): the quantum time used by the job, kept to estimate the runtime of the next ones
+
+    * The packed bytes of each BitArray are compressed with zlib, with its number of bits and its shape
+    * The shots of the job are the ones of its first PUB
+    """
+
+    from qiskit.primitives.containers import BitArray
+
+    shots = None
+
+    for pub_index, pub_result in enumerate(result):
+        for register, bit_array in pub_result.data.items():
+            if not isinstance(bit_array, BitArray):
+                continue
+            shots = shots or bit_array.num_shots
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, pub_index, register, bit_array.num_bits,
+                 ",".join(map(str, bit_array.array.shape)), zlib.compress(bit_array.array.tobytes())),
+            )
+
+    conn.execute("UPDATE jobs SET shots = ?, usage_seconds = ? WHERE job_id = ?", (shots, usage_seconds, job_id))
+    conn.commit()
+
+
+def load_result(conn, job_id, pub_index=0):
+    """ The measurements of a PUB of a job stored
+
+    Return
+    -----
+        (dict): the BitArray of each register, None if the result of the job was never fetched
+    """
+
+    import numpy as np
+    from qiskit.primitives.containers import BitArray
+
+    rows = conn.execute("SELECT * FROM results WHERE job_id = ? AND pub_index = ?", (job_id, pub_index)).fetchall()
+
+    if not rows:
+        return None
+
+    registers = {}
+
+    for row in rows:
+        shape = tuple(int(size) for size in row["shape"].split(","))
+        array = np.frombuffer(zlib.decompress(row["data"]), dtype=np.uint8).reshape(shape)
+        registers[row["register"]] = BitArray(array, row["num_bits"])
+
+    return registers
+
+
+def get_job(conn, job_id):
+    """ The row of a job, None if it is not stored """
+
+    return conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
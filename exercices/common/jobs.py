@@ -0,0 +1,101 @@
+import asyncio
+from print_color import print
+
+from common import tracing
+
+
+FINAL_STATUSES = {"DONE", "ERROR", "CANCELLED"}
+
+# * The status of a job is polled after POLL_FIRST seconds, then the delay grows up to POLL_MAX:
+# * a job that waits hours in a queue is not polled every second
+POLL_FIRST = 1.0
+POLL_MAX = 30.0
+POLL_FACTOR = 1.5
+
+# * Number of jobs submitted and not finished at the same time
+MAX_IN_FLIGHT = 8
+
+
+def status_name(job):
+    """ Name of the status of a job, the runtime jobs return a str and the local ones a JobStatus """
+
+    status = job.status()
+
+    return getattr(status, "name", str(status)).upper()
+
+
+async def wait_job(job, label=None):
+    """ Wait for a job without blocking the other ones
+
+    Params
+    -----
+        job (RuntimeJobV2 or PrimitiveJob): the job submitted
+        label (str): printed with the changes of status, the job ID by default
+
+    * Poll the status in a thread with a growing delay, print it when it changes
+    * Get the result once the status is final, result() raises if the job failed
+
+    Return
+    -----
+        (PrimitiveResult): the result of the job
+    """
+
+    label = label or job.job_id()
+    delay = POLL_FIRST
+    previous = None
+
+    with tracing.span("job wait", category="jobs", label=label):
+        while True:
+            status = await asyncio.to_thread(status_name, job)
+            if status != previous:
+                print(f"{label}: {status}", tag='job', tag_color='cyan', color='white')
+                previous = status
+            if status in FINAL_STATUSES:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * POLL_FACTOR, POLL_MAX)
+
+        return await asyncio.to_thread(job.result)
+
+
+async def _run_all(submissions, on_result, max_in_flight):
+    """ Submit the jobs, at most max_in_flight at once, and process each one as soon as it is done """
+
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def run(label, submit):
+        async with semaphore:
+            job = await asyncio.to_thread(submit)
+            print(f"{label}: submitted, job ID {job.job_id()}", tag='job', tag_color='cyan', color='white')
+            result = await wait_job(job, label)
+        if on_result is not None:
+            on_result(label, job, result)
+        return result
+
+    return await asyncio.gather(*(run(label, submit) for label, submit in submissions))
+
+
+def run_all(submissions, on_result=None, max_in_flight=MAX_IN_FLIGHT):
+    """ Keep many jobs in flight and hand their results to the processing as they complete
+
+    Params
+    -----
+        submissions (list): tuples (label, function that submits a job and returns it)
+        on_result (function): called with (label, job, result) as soon as a job is done
+        max_in_flight (int): the number of jobs waiting at the same time
+
+    * The queue waits overlap instead of being one after the other
+    * The submissions and the polls run in threads, on_result is called from the main thread
+
+    Return
+    -----
+        (list): the results, in the order of the submissions
+    """
+
+    return asyncio.run(_run_all(submissions, on_result, max_in_flight))
+
+
+def result(job, label=None):
+    """ Wait for one job with the polling of wait_job(), instead of blocking in job.result() """
+
+    return asyncio.run(wait_job(job, label))
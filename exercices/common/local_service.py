@@ -0,0 +1,99 @@
+import os
+import time
+import random
+
+from common import registry
+
+
+# * FTL_QUANTUM_LOCAL_QUEUE="min,max": the real runs go to a local stand-in of the service,
+# * each job waits between min and max seconds in a simulated queue before running on a fake backend
+QUEUE_LATENCY = os.environ.get("FTL_QUANTUM_LOCAL_QUEUE")
+
+# * Not the fake backend of the FakeBackend runs, so only the stand-in jobs have a queue
+LOCAL_BACKEND = "FakeBrisbane"
+
+_service = None
+_backends = set()
+
+
+def enabled():
+    """ True if the real runs must use the local stand-in of the service """
+
+    return bool(QUEUE_LATENCY)
+
+
+def queue_latency():
+    """ The range of the simulated queue wait in seconds, from FTL_QUANTUM_LOCAL_QUEUE """
+
+    values = [float(value) for value in QUEUE_LATENCY.split(",")]
+
+    return values[0], values[-1]
+
+
+def is_local(backend):
+    """ True if the backend was given by the stand-in service """
+
+    return id(backend) in _backends
+
+
+class LocalJob:
+    """ A job of the stand-in service, same status(), job_id() and result() as a RuntimeJobV2
+
+    * The circuits are simulated as soon as they are submitted
+    * The status stays 'QUEUED' until the simulated wait is over, result() blocks until then
+    """
+
+    def __init__(self, job, latency):
+        self._job = job
+        self._queued_until = time.monotonic() + latency
+
+    def job_id(self):
+        return self._job.job_id()
+
+    def status(self):
+        if time.monotonic() < self._queued_until:
+            return "QUEUED"
+        status = self._job.status()
+        return getattr(status, "name", str(status))
+
+    def result(self):
+        time.sleep(max(0.0, self._queued_until - time.monotonic()))
+        return self._job.result()
+
+
+class LocalSampler:
+    """ A SamplerV2 of the stand-in service, the jobs run on a fake backend after a simulated queue wait """
+
+    def __init__(self, backend):
+        from qiskit.primitives import BackendSamplerV2
+
+        self._sampler = BackendSamplerV2(backend=backend)
+
+    def run(self, pubs, shots=None):
+        return LocalJob(self._sampler.run(pubs, shots=shots), random.uniform(*queue_latency()))
+
+
+class LocalService:
+    """ The stand-in of QiskitRuntimeService used by the scripts: a single fake backend """
+
+    def backends(self, **kwargs):
+        return [self.backend()]
+
+    def backend(self, name=None):
+        backend = registry.get_fake_backend(LOCAL_BACKEND)
+        _backends.add(id(backend))
+        return backend
+
+    def least_busy(self, **kwargs):
+        return self.backend()
+
+
+def get_service():
+    """ The stand-in service, one per process """
+
+    global _service
+
+    if _service is None:
+        _service = LocalService()
+
+    return _service
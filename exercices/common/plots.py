@@ -0,0 +1,298 @@
+import os
+import atexit
+from print_color import print
+
+from common import tracing
+from common.cache import cache_enabled, cache_path, evict_lru, touch, write_atomic
+from common.cli import pop_flag
+
+
+# * 'async': the figures are rendered by a pool of processes while the run continues
+# * 'later': the figures are kept and only rendered at the end of the run
+# * 'off': no figure is rendered
+MODE = os.environ.get("FTL_QUANTUM_PLOTS", "async")
+
+# * False: the interactive drawings are saved like the other ones, for the runs without a display
+INTERACTIVE = True
+
+# * Directory of the figures, None for the current directory
+OUTPUT_DIR = None
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# * The rendered figures are kept in the cache under the hash of what they show, see _figure_key()
+MAX_CACHE_BYTES = int(os.environ.get("FTL_QUANTUM_PLOTS_CACHE_MB", "128")) * 1024 * 1024
+
+# * Part of the key of the cached figures: the entries of a previous version are never served again,
+# * e.g. the version 1 ones could have been rendered from a circuit changed after its key was computed
+CACHE_VERSION = 2
+
+_pool = None
+_futures = []
+_later = []
+
+
+def configure_from_argv():
+    """ Set the rendering mode from the flags of the script
+
+    * '--no-plots': do not render any figure
+    * '--plots-later': render all the figures at the end of the run
+    * '--headless': no window is opened, the interactive drawings are only saved
+    * The flags are removed from sys.argv
+    """
+
+    global MODE, INTERACTIVE
+
+    if pop_flag("--no-plots"):
+        MODE = "off"
+    if pop_flag("--plots-later"):
+        MODE = "later"
+    if pop_flag("--headless"):
+        INTERACTIVE = False
+
+
+def _output_path(filename):
+    """ The file written by savefig(filename): '.png' is added when the name has no extension """
+
+    return filename if os.path.splitext(filename)[1] else f"{filename}.png"
+
+
+def _drawn_names(qc, depth=0):
+    """ The names and labels of the operations of a circuit, as they appear on its drawing
+
+    * circuit_hash() is structural: two gates with the same definition and another name or label share it
+    * depth: the levels of definitions also drawn, 1 for the decomposed circuit
+    """
+
+    names = []
+
+    for instruction in qc.data:
+        operation = instruction.operation
+        names.append(f"{operation.name}:{getattr(operation, 'label', None)}")
+        definition = getattr(operation, "definition", None) if depth > 0 else None
+        if definition is not None:
+            names.append(f"[{_drawn_names(definition, depth - 1)}]")
+
+    return ",".join(names)
+
+
+def _figure_key(kind, data, kwargs):
+    """ Hash of what a figure shows, its file name apart
+
+    * A circuit is hashed by its structure (circuit_hash() of the transpile cache) and the names and labels of its gates,
+        * with the ones of their definitions for a decomposed drawing, see _drawn_names()
+    * The counts are hashed by their values
+    * The drawing options (style, title, figsize, the arguments of draw(), ...), the version of qiskit and CACHE_VERSION are part of the key
+    * It is computed from the same copy of the data as the one rendered, see _submit()
+    """
+
+    import json
+    import hashlib
+    import qiskit
+
+    if kind.startswith("circuit"):
+        from common.transpile_cache import circuit_hash
+        content = f"{circuit_hash(data)}|{_drawn_names(data, 1 if kind == 'circuit_decompose' else 0)}"
+    else:
+        content = json.dumps(data, sort_keys=True, default=str)
+
+    options = json.dumps({key: value for key, value in kwargs.items() if key != "filename"}, sort_keys=True, default=repr)
+
+    return hashlib.sha256(f"{kind}|{content}|{options}|{qiskit.__version__}|{CACHE_VERSION}".encode()).hexdigest()
+
+
+def _cache_entry(kind, data, kwargs):
+    """ Path of a figure in the cache, content-addressed by _figure_key()
+
+    * Only the figures saved to a file are cached, with the extension of that file
+
+    Return
+    -----
+        (str): the path of the figure in the cache, None if it is not cached
+    """
+
+    if not cache_enabled() or not kwargs.get("filename"):
+        return None
+
+    extension = os.path.splitext(_output_path(kwargs["filename"]))[1]
+
+    return cache_path("plots", _figure_key(kind, data, kwargs) + extension)
+
+
+def _render(kind, data, kwargs, cached=None):
+    """ Render a figure, run inside a worker process
+
+    Params
+    -----
+        kind (str): 'histogram', 'distribution', 'circuit' or 'circuit_decompose'
+        data (dict or QuantumCircuit): the counts to plot or the circuit to draw
+        kwargs (dict): the arguments of the qiskit function (title, filename, figsize, ...)
+        cached (str): where to keep a copy of the file in the cache, None to not keep it
+
+    * The non-interactive Agg backend is used, the figures are only saved to files
+    * With tracing, the rendering is a span of the worker, its events are returned to the main process
+
+    Return
+    -----
+        (list): the trace events recorded by the worker, empty if tracing is disabled
+    """
+
+    with tracing.span(f"render {kind}", category="plots", filename=kwargs.get("filename")):
+        import matplotlib
+        matplotlib.use("Agg")
+
+        if kind == "histogram":
+            from qiskit.visualization import plot_histogram
+            plot_histogram(data, **kwargs)
+        elif kind == "distribution":
+            from qiskit.visualization import plot_distribution
+            plot_distribution(data, **kwargs)
+        elif kind == "circuit":
+            data.draw(output="mpl", **kwargs)
+        elif kind == "circuit_decompose":
+            data.decompose().draw(output="mpl", **kwargs)
+
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+        if cached is not None:
+            with open(_output_path(kwargs["filename"]), "rb") as fd:
+                write_atomic(cached, fd.read())
+
+    return tracing.drain()
+
+
+def _get_pool():
+    """ Create the pool of processes on the first figure, 'spawn' to not fork the state of the simulators """
+
+    global _pool
+
+    if _pool is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+    return _pool
+
+
+def _in_output_dir(kwargs):
+    """ A copy of the arguments of a figure, its filename in OUTPUT_DIR if one is set """
+
+    kwargs = dict(kwargs)
+
+    if OUTPUT_DIR is not None and kwargs.get("filename"):
+        kwargs["filename"] = os.path.join(OUTPUT_DIR, kwargs["filename"])
+
+    return kwargs
+
+
+def _snapshot(data):
+    """ A copy of the circuit or the counts of a figure, the caller may change them after the call
+
+    * A figure kept for later, or pickled for the pool by its feeder thread, would show the changes otherwise
+        * e.g. diffuser() composes the Grover operator and the measurements into the circuit just drawn
+    """
+
+    return data.copy() if hasattr(data, "copy_empty_like") else dict(data)
+
+
+def _submit(kind, data, kwargs):
+    """ Send a figure to the pool or keep it for later depending on the mode
+
+    * The circuit or the counts are copied first, the figure is rendered from what they are at the call
+        * the key of the cache is computed from the same copy, the file cached is the figure of this key
+    * If the same figure was already rendered, the file of the cache is copied and nothing is rendered
+    """
+
+    if MODE == "off":
+        return
+
+    data, kwargs = _snapshot(data), _in_output_dir(kwargs)
+
+    cached = _cache_entry(kind, data, kwargs)
+
+    if cached is not None and os.path.exists(cached):
+        import shutil
+        with tracing.span(f"cached {kind}", category="plots", filename=kwargs["filename"]):
+            shutil.copyfile(cached, _output_path(kwargs["filename"]))
+        touch(cached)
+        return
+
+    if MODE == "later":
+        _later.append((kind, data, kwargs, cached))
+        return
+
+    _futures.append(_get_pool().submit(_render, kind, data, kwargs, cached))
+
+
+def histogram(counts, **kwargs):
+    """ Render qiskit.visualization.plot_histogram(counts, **kwargs) in the background """
+
+    _submit("histogram", counts, kwargs)
+
+
+def distribution(counts, **kwargs):
+    """ Render qiskit.visualization.plot_distribution(counts, **kwargs) in the background """
+
+    _submit("distribution", counts, kwargs)
+
+
+def circuit(qc, decompose=False, interactive=False, **kwargs):
+    """ Render qc.draw(output="mpl", **kwargs) in the background
+
+    Params
+    -----
+        qc (QuantumCircuit): the circuit to draw
+        decompose (bool): draw qc.decompose(), the decomposition is also done in the background
+        interactive (bool): the drawing opens a window, it can only be done by the main process,
+            ignored if INTERACTIVE is False
+        kwargs: the arguments of QuantumCircuit.draw() (filename, idle_wires, ...)
+    """
+
+    if interactive and INTERACTIVE and MODE != "off":
+        with tracing.span("draw interactive", category="plots", filename=kwargs.get("filename")):
+            (qc.decompose() if decompose else qc).draw(output="mpl", interactive=True, **_in_output_dir(kwargs))
+        return
+
+    _submit("circuit_decompose" if decompose else "circuit", qc, kwargs)
+
+
+def wait():
+    """ Join the rendering: render the figures kept for later and wait for all of them
+
+    * The errors of the workers are printed, they do not stop the run
+    """
+
+    global _pool
+
+    if not _later and not _futures:
+        return
+
+    with tracing.span("plots.wait", category="plots", figures=len(_later) + len(_futures)):
+        if _later:
+            try:
+                pool = _get_pool()
+                _futures.extend(pool.submit(_render, *task) for task in _later)
+            except RuntimeError:
+                # * the interpreter is shutting down, no new process can be started
+                for task in _later:
+                    tracing.extend(_render(*task))
+            _later.clear()
+
+        for future in _futures:
+            try:
+                tracing.extend(future.result())
+            except Exception as e:
+                print(f"A figure could not be rendered: {e}", tag='exception', tag_color='red')
+        _futures.clear()
+
+        if cache_enabled():
+            evict_lru(os.path.dirname(cache_path("plots", "figure")), MAX_CACHE_BYTES)
+
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+atexit.register(wait)
@@ -0,0 +1,115 @@
+from common import registry
+from common.cli import pop_flag
+
+
+# * False: the FakeBackend runs simulate the noise model of the whole device
+# * True: the noise model and the circuits are reduced to the physical qubits used after the layout
+MODE = False
+
+_samplers = {}
+
+
+def configure_from_argv():
+    """ Set the reduced noise mode from the flags of the script
+
+    * '--reduced-noise': the FakeBackend runs only simulate the noise of the qubits used by the circuits
+    * The flag is removed from sys.argv
+    """
+
+    global MODE
+
+    if pop_flag("--reduced-noise"):
+        MODE = True
+
+
+def enabled():
+    """ True if the FakeBackend runs must use the reduced noise model """
+
+    return MODE
+
+
+def active_qubits(isa_circuits):
+    """ The physical qubits on which the ISA circuits apply an instruction, sorted
+
+    * The barriers are ignored, the delays are kept: an idle qubit can relax
+    """
+
+    qubits = set()
+
+    for isa_circuit in isa_circuits:
+        for instruction in isa_circuit.data:
+            if instruction.operation.name != "barrier":
+                qubits.update(isa_circuit.find_bit(qubit).index for qubit in instruction.qubits)
+
+    return tuple(sorted(qubits))
+
+
+def reduce_circuit(isa_circuit, qubits):
+    """ Copy an ISA circuit on the active qubits only
+
+    Params
+    -----
+        isa_circuit (QuantumCircuit): the circuit transpiled for the whole device
+        qubits (tuple): the physical qubits kept, the qubit i of the copy is the physical qubit qubits[i]
+
+    * The classical registers are the same, the results are read with the same names
+    * The barriers on the idle qubits are dropped, they have no effect on the simulation
+
+    Return
+    -----
+        (QuantumCircuit): the circuit on len(qubits) qubits
+    """
+
+    from qiskit import QuantumCircuit, QuantumRegister
+
+    index = {qubit: position for position, qubit in enumerate(qubits)}
+
+    reduced = QuantumCircuit(QuantumRegister(len(qubits), "q"), *isa_circuit.cregs,
+                             name=isa_circuit.name, global_phase=isa_circuit.global_phase,
+                             metadata=isa_circuit.metadata)
+
+    for instruction in isa_circuit.data:
+        positions = [index.get(isa_circuit.find_bit(qubit).index) for qubit in instruction.qubits]
+        if None in positions:
+            continue
+        reduced.append(instruction.operation, [reduced.qubits[position] for position in positions], instruction.clbits)
+
+    return reduced
+
+
+def prepare(backend, isa_circuits, method=None):
+    """ Get the sampler and the circuits to run a FakeBackend with the reduced noise model
+
+    Params
+    -----
+        backend (FakeBackendV2): the fake backend the circuits were transpiled for
+        isa_circuits (QuantumCircuit or list): the transpiled circuits
+        method (str): the method of the Aer simulation, None lets Aer choose
+
+    * The active qubits of all the circuits are kept, so they can still be run in one job
+    * The noise model of these qubits is serialized on disk by the registry, one per layout
+    * The sampler is a BackendSamplerV2 on an AerSimulator with this noise model, one per layout and method
+        * the simulation time and memory depend on the width of the circuits, not on the device
+
+    Return
+    -----
+        (BackendSamplerV2, QuantumCircuit or list): the sampler and the reduced circuits, in the same form as given
+    """
+
+    single = not isinstance(isa_circuits, list)
+    circuits = [isa_circuits] if single else isa_circuits
+
+    qubits = active_qubits(circuits)
+    key = (backend.name, qubits, method)
+
+    if key not in _samplers:
+        from qiskit.primitives import BackendSamplerV2
+        from qiskit_aer import AerSimulator
+
+        options = {"method": method} if method else {}
+        sim = AerSimulator(noise_model=registry.get_noise_model(backend, qubits), **options)
+        _samplers[key] = BackendSamplerV2(backend=sim)
+
+    reduced = [reduce_circuit(circuit, qubits) for circuit in circuits]
+
+    return _samplers[key], reduced[0] if single else reduced
@@ -0,0 +1,255 @@
+import os
+import sys
+import pickle
+import hashlib
+
+from common import tracing
+from common.cache import cache_enabled, cache_path, write_atomic
+
+
+# * One instance per process of each backend, simulator and sampler
+_fake_backends = {}
+_simulators = {}
+_samplers = {}
+_noise_models = {}
+
+
+def _noise_model_path(backend, qubits=None):
+    """ Path of the serialized noise model of a backend
+
+    * The key contains the name and version of the backend, the date of its properties snapshot
+        * and the version of qiskit_aer used to pickle the noise model
+    * qubits: the physical qubits of a noise model reduced to them, None for the whole device
+    """
+
+    import qiskit_aer
+
+    properties = backend.properties() if hasattr(backend, "properties") else None
+    last_update = properties.last_update_date if properties is not None else None
+    key = f"{backend.name}/{getattr(backend, 'backend_version', None)}/{last_update}/{qiskit_aer.__version__}"
+
+    if qubits is not None:
+        key += f"/{','.join(map(str, qubits))}"
+
+    return cache_path("noise_models", f"{hashlib.sha256(key.encode()).hexdigest()}.pkl")
+
+
+def _build_noise_model(backend):
+    """ Derive the Aer noise model of a backend
+
+    * The fake backends build it from their properties snapshot,
+        * it is the same model as the one they use in their own simulator
+    * The other backends use NoiseModel.from_backend()
+    """
+
+    if hasattr(backend, "_get_noise_model_from_backend_v2"):
+        return backend._get_noise_model_from_backend_v2()
+
+    from qiskit_aer.noise import NoiseModel
+
+    return NoiseModel.from_backend(backend)
+
+
+def _reduce_noise_model(noise_model, qubits):
+    """ Restrict a noise model to some physical qubits, renumbered from 0 in their order
+
+    * Keep the gate and readout errors acting only on these qubits
+    * The relaxation of the delays is a pass with the T1 and T2 of every qubit, it is rebuilt with theirs
+    """
+
+    from qiskit.circuit import Delay
+    from qiskit_aer.noise import NoiseModel
+    from qiskit_aer.noise.passes import RelaxationNoisePass
+
+    index = {qubit: position for position, qubit in enumerate(qubits)}
+    reduced = NoiseModel(basis_gates=noise_model.basis_gates)
+
+    for name, errors in noise_model._local_quantum_errors.items():
+        for error_qubits, error in errors.items():
+            if all(qubit in index for qubit in error_qubits):
+                reduced.add_quantum_error(error, name, [index[qubit] for qubit in error_qubits])
+
+    for error_qubits, error in noise_model._local_readout_errors.items():
+        if all(qubit in index for qubit in error_qubits):
+            reduced.add_readout_error(error, [index[qubit] for qubit in error_qubits])
+
+    for noise_pass in noise_model._custom_noise_passes:
+        if isinstance(noise_pass, RelaxationNoisePass):
+            reduced._custom_noise_passes.append(RelaxationNoisePass(
+                t1s=noise_pass._t1s[list(qubits)].tolist(),
+                t2s=noise_pass._t2s[list(qubits)].tolist(),
+                dt=noise_pass._dt,
+                op_types=Delay,
+                excited_state_populations=noise_pass._p1s[list(qubits)].tolist(),
+            ))
+
+    return reduced
+
+
+def get_noise_model(backend, qubits=None):
+    """ Get the noise model derived from a backend, built once and serialized on disk
+
+    Params
+    -----
+        backend (BackendV2): the backend whose properties give the noise model
+        qubits (tuple): only the errors of these physical qubits, None for the whole device
+
+    * Reuse the noise model already derived in this process
+    * Else load it from the disk cache
+    * Else build it (seconds for the 127 qubits of Sherbrooke) and save it for the next processes
+        * a reduced one is built from the noise model of the whole device, one file per set of qubits
+
+    Return
+    -----
+        noise_model (NoiseModel): the noise model of the backend
+    """
+
+    key = (backend.name, qubits)
+
+    if key in _noise_models:
+        return _noise_models[key]
+
+    path = _noise_model_path(backend, qubits) if cache_enabled() else None
+    noise_model = None
+
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path, "rb") as fd:
+                noise_model = pickle.load(fd)
+        except Exception:
+            noise_model = None
+
+    if noise_model is None:
+        if qubits is None:
+            with tracing.span("build noise model", category="setup", backend=backend.name):
+                noise_model = _build_noise_model(backend)
+        else:
+            full = get_noise_model(backend)
+            with tracing.span("reduce noise model", category="setup", backend=backend.name, qubits=len(qubits)):
+                noise_model = _reduce_noise_model(full, qubits)
+        if path is not None:
+            write_atomic(path, pickle.dumps(noise_model, protocol=pickle.HIGHEST_PROTOCOL))
+
+    _noise_models[key] = noise_model
+
+    return noise_model
+
+
+def get_fake_backend(name="FakeSherbrooke"):
+    """ Get a fake backend, constructed once per process with its noise model
+
+    Param
+    -----
+        name (str): the class name of the fake backend in qiskit_ibm_runtime.fake_provider
+
+    * Construct the fake backend
+    * Give it the noise model from get_noise_model() and the simulator that uses it
+        * without it, the fake backend derives the noise model again on its first run
+
+    Return
+    -----
+        backend (FakeBackendV2): the fake backend
+    """
+
+    if name in _fake_backends:
+        return _fake_backends[name]
+
+    from qiskit_aer import AerSimulator
+    from qiskit_ibm_runtime import fake_provider
+
+    with tracing.span("load fake backend", category="setup", backend=name):
+        backend = getattr(fake_provider, name)()
+
+    noise_model = get_noise_model(backend)
+    backend.sim = AerSimulator(noise_model=noise_model)
+    backend.set_options(noise_model=noise_model)
+
+    _fake_backends[name] = backend
+
+    return backend
+
+
+def get_aer_simulator(method="automatic", workload=None, profile=None):
+    """ Get an ideal AerSimulator, one per simulation method and execution profile
+
+    Params
+    -----
+        method (str): the simulation method, 'automatic' selects it based on the circuit and noise model
+        workload (QuantumCircuit or list): the circuits that will be run, they select the execution profile
+        profile (str): the execution profile, see common/aer_profiles.py, Aer defaults if no workload is given
+
+    * The profile sets the parallelism (experiments, shots, threads) and the gate fusion
+
+    Return
+    -----
+        sim (AerSimulator): the simulator
+    """
+
+    from common import aer_profiles
+
+    if profile is None and workload is not None:
+        profile = aer_profiles.choose(workload)
+
+    key = (method, profile)
+
+    if key not in _simulators:
+        from qiskit_aer import AerSimulator
+
+        _simulators[key] = AerSimulator(method=method, **(aer_profiles.options(profile) if profile else {}))
+
+    return _simulators[key]
+
+
+def _is_ibm_backend(backend):
+    """ True for a backend of the IBM Quantum service, a real quantum computer
+
+    * qiskit_ibm_runtime is not imported by the simulator paths,
+        * if it was never imported the backend cannot be an IBMBackend
+    """
+
+    if "qiskit_ibm_runtime" not in sys.modules:
+        return False
+
+    from qiskit_ibm_runtime import IBMBackend
+
+    return isinstance(backend, IBMBackend)
+
+
+def get_sampler(backend, method=None):
+    """ Get the Primitive SamplerV2 of a backend, one per backend and simulation method
+
+    Params
+    -----
+        backend (BackendV2): a simulator, a fake backend or an IBMBackend
+        method (str): the method of the Aer simulation of a local backend, e.g. from simulation.plan_noisy(), None lets Aer choose
+
+    * The SamplerV2 of qiskit_ibm_runtime is used for the IBM backends
+    * The local backends (AerSimulator, fake backends) use BackendSamplerV2 directly
+        * it is what the runtime SamplerV2 uses in local mode,
+        * but the runtime one deep copies the whole backend (target, noise model) on every run()
+    * The backend of the local stand-in service (FTL_QUANTUM_LOCAL_QUEUE) has a sampler with a simulated queue
+
+    Return
+    -----
+        sampler (SamplerV2, BackendSamplerV2 or LocalSampler): the sampler for this backend, same run() and results
+    """
+
+    key = (id(backend), method)
+
+    if key not in _samplers:
+        from common import local_service
+
+        if _is_ibm_backend(backend):
+            from qiskit_ibm_runtime import SamplerV2 as Sampler
+            sampler = Sampler(backend)
+        elif local_service.is_local(backend):
+            sampler = local_service.LocalSampler(backend)
+        else:
+            from qiskit.primitives import BackendSamplerV2
+            options = {"run_options": {"method": method}} if method else None
+            sampler = BackendSamplerV2(backend=backend, options=options)
+
+        # * the backend is kept alive so its id is not reused
+        _samplers[key] = (backend, sampler)
+
+    return _samplers[key][1]
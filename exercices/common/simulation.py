@@ -0,0 +1,276 @@
+import os
+
+
+# * Gates that map stabilizer states to stabilizer states,
+# * a circuit made only of them (and measurements) can be simulated with a tableau in polynomial time
+CLIFFORD_GATES = {
+    "id", "x", "y", "z", "h", "s", "sdg", "sx", "sxdg",
+    "cx", "cy", "cz", "swap", "iswap", "dcx", "ecr",
+}
+
+NON_UNITARY = {"measure", "barrier", "reset", "delay"}
+
+
+def is_clifford(qc):
+    """ Check if a circuit only contains Clifford gates
+
+    Param
+    -----
+        qc (QuantumCircuit): the circuit to check
+
+    * The instructions of the circuit are checked by name, a custom gate is decomposed to check its content
+    * Measurements, barriers and resets are accepted, the stabilizer method supports them
+
+    Return
+    -----
+        (bool): True if the circuit can be run with the stabilizer method
+    """
+
+    for instruction in qc.data:
+        operation = instruction.operation
+        if operation.name in CLIFFORD_GATES or operation.name in NON_UNITARY:
+            continue
+        definition = getattr(operation, "definition", None)
+        if definition is None or not is_clifford(definition):
+            return False
+
+    return True
+
+
+def simulation_method(qc):
+    """ Choose the AerSimulator method for a circuit
+
+    * 'stabilizer' for a Clifford circuit: it scales to thousands of qubits
+        * Aer 'automatic' makes the same choice at run time, here it is known before running
+    * 'automatic' otherwise
+
+    Return
+    -----
+        method (str): the method to give to AerSimulator
+    """
+
+    return "stabilizer" if is_clifford(qc) else "automatic"
+
+
+def max_qubits(backend):
+    """ Number of qubits of the circuits a backend can run
+
+    * The number of qubits of the device
+    * The fake backends run a noisy simulation: it is also bounded by the memory limit of their simulator
+        * the noisy circuits are not Clifford, the stabilizer method cannot be used
+
+    Return
+    -----
+        (int): the maximum number of qubits
+    """
+
+    simulator = getattr(backend, "sim", None)
+
+    if simulator is None:
+        return backend.num_qubits
+
+    return min(backend.num_qubits, simulator.num_qubits)
+
+
+# * Rough cost of the simulation methods, in seconds per amplitude (or tensor element) touched by a gate,
+# * measured on a laptop core: the plan compares the methods, the absolute time is only an order of magnitude
+SECONDS_PER_ELEMENT = 2e-9
+
+# * Part of the available memory a simulation may use, or a fixed budget with FTL_QUANTUM_MAX_MEMORY_MB
+MEMORY_FRACTION = 0.8
+
+# * A simulation estimated above this time is refused
+MAX_SECONDS = float(os.environ.get("FTL_QUANTUM_MAX_SIM_SECONDS", "3600"))
+
+
+def memory_budget():
+    """ Bytes a simulation can use: FTL_QUANTUM_MAX_MEMORY_MB, else MEMORY_FRACTION of the available memory """
+
+    if "FTL_QUANTUM_MAX_MEMORY_MB" in os.environ:
+        return int(os.environ["FTL_QUANTUM_MAX_MEMORY_MB"]) * 1024 * 1024
+
+    import psutil
+
+    return int(psutil.virtual_memory().available * MEMORY_FRACTION)
+
+
+def statevector_bytes(num_qubits):
+    """ Memory of the statevector of num_qubits qubits, 2^n complex doubles """
+
+    return 16 * 2 ** num_qubits
+
+
+def _circuit_stats(qc, repetitions):
+    """ Number of qubits, of gates, of multi-qubit gates and the entanglement bound of each cut of the circuit
+
+    * Each multi-qubit gate across a cut between qubits k and k+1 can double the bond dimension twice,
+        * the bond is also bounded by the smallest side of the cut, 2^min(k+1, n-k-1)
+    """
+
+    n = qc.num_qubits
+    gates = multi = 0
+    cut_bits = [0] * max(n - 1, 0)
+
+    for instruction in qc.data:
+        if instruction.operation.name in NON_UNITARY:
+            continue
+        gates += 1
+        if len(instruction.qubits) < 2:
+            continue
+        multi += 1
+        indices = [qc.find_bit(qubit).index for qubit in instruction.qubits]
+        for cut in range(min(indices), max(indices)):
+            cut_bits[cut] += 2
+
+    cut_bits = [min(bits * repetitions, cut + 1, n - cut - 1) for cut, bits in enumerate(cut_bits)]
+
+    return n, gates * repetitions, multi * repetitions, cut_bits
+
+
+def estimate(qc, repetitions=1):
+    """ Memory and time of each simulation method for a circuit
+
+    Params
+    -----
+        qc (QuantumCircuit): the circuit, preferably transpiled for the AerSimulator to count its real gates
+        repetitions (int): the circuit is applied this many times, e.g. the iterations of a Grover operator
+
+    * stabilizer: a tableau of 2n x 2n bits, only for Clifford circuits
+    * statevector: 2^n complex amplitudes of 16 bytes, each gate touches all of them
+    * density_matrix: 4^n complex elements, each gate touches all of them
+    * matrix_product_state: a tensor per qubit, bounded by the bond dimension of the cuts around it,
+        * each multi-qubit gate costs the cube of the largest bond
+
+    Return
+    -----
+        (dict): {method: (bytes, seconds)}
+    """
+
+    n, gates, multi, cut_bits = _circuit_stats(qc, repetitions)
+
+    estimates = {
+        "statevector": (statevector_bytes(n), gates * 2 ** n * SECONDS_PER_ELEMENT),
+        "density_matrix": (16 * 4 ** n, gates * 4 ** n * SECONDS_PER_ELEMENT),
+    }
+
+    bonds = [1] + [2 ** bits for bits in cut_bits] + [1]
+    estimates["matrix_product_state"] = (
+        sum(16 * 2 * left * right for left, right in zip(bonds, bonds[1:])),
+        (gates * 2 * max(bonds) ** 2 + multi * max(bonds) ** 3) * SECONDS_PER_ELEMENT,
+    )
+
+    if is_clifford(qc):
+        estimates["stabilizer"] = (n * n // 2 + 1, gates * n * SECONDS_PER_ELEMENT)
+
+    return estimates
+
+
+def _choose(estimates, budget):
+    """ The fastest method under the memory budget and MAX_SECONDS, as the decision returned by plan() """
+
+    viable = {method: cost for method, cost in estimates.items() if cost[0] <= budget and cost[1] <= MAX_SECONDS}
+    method = min(viable, key=lambda name: viable[name][::-1]) if viable else None
+    memory, seconds = estimates[method] if method else (None, None)
+
+    return {"method": method, "memory": memory, "seconds": seconds, "budget": budget, "estimates": estimates}
+
+
+def plan(qc, repetitions=1, budget=None):
+    """ Choose the cheapest simulation method that fits in memory, before running anything
+
+    Params
+    -----
+        qc (QuantumCircuit): the circuit to simulate
+        repetitions (int): the circuit is applied this many times
+        budget (int): the bytes available, memory_budget() by default
+
+    * Estimate the memory and the time of each method, see estimate()
+    * Keep the ones under the memory budget and MAX_SECONDS, choose the fastest one
+        * Aer 'automatic' does not know the memory: above it, the run fails deep inside Aer
+
+    Return
+    -----
+        (dict): "method" (None if no method is viable), "memory" and "seconds" of the method, "budget" and all the "estimates"
+    """
+
+    budget = memory_budget() if budget is None else budget
+    estimates = estimate(qc, repetitions)
+
+    return _choose(estimates, budget)
+
+
+def estimate_noisy(isa_circuit, shots, noise_model=None):
+    """ Memory and time of the noisy simulation of a circuit transpiled for a device
+
+    Params
+    -----
+        isa_circuit (QuantumCircuit): the circuit transpiled for the device, e.g. for a FakeBackend
+        shots (int): the number of shots of the run
+        noise_model (NoiseModel): the noise model of the device, None counts only the gates
+
+    * The width is the number of active qubits: Aer drops the idle qubits of the device before simulating
+    * Each gate with an error in the noise model is followed by its error channel, one more operation on the state
+    * density_matrix: 4^n complex elements, the noise channels are applied exactly, the state is evolved once for all the shots
+    * statevector: 2^n complex amplitudes, the noise is sampled, the circuit is run again for each shot (one trajectory)
+
+    Return
+    -----
+        (dict): {method: (bytes, seconds)}
+    """
+
+    from common.reduced_noise import active_qubits
+
+    n = len(active_qubits([isa_circuit]))
+    noisy = set(noise_model.noise_instructions) if noise_model is not None else set()
+
+    operations = 0
+    for instruction in isa_circuit.data:
+        name = instruction.operation.name
+        if name == "barrier":
+            continue
+        operations += 2 if name in noisy else 1
+
+    return {
+        "statevector": (statevector_bytes(n), shots * operations * 2 ** n * SECONDS_PER_ELEMENT),
+        "density_matrix": (16 * 4 ** n, operations * 4 ** n * SECONDS_PER_ELEMENT),
+    }
+
+
+def plan_noisy(isa_circuit, shots, noise_model=None, budget=None):
+    """ Choose the method of a noisy simulation, like plan() for an ideal one
+
+    * The estimates come from estimate_noisy(), the same memory budget and MAX_SECONDS apply
+    * Given the circuit before the layout and the routing, the estimate is a lower bound:
+        * routing only adds gates, a circuit refused before the transpilation is refused after it
+
+    Return
+    -----
+        (dict): the same keys as plan()
+    """
+
+    budget = memory_budget() if budget is None else budget
+    estimates = estimate_noisy(isa_circuit, shots, noise_model)
+
+    return _choose(estimates, budget)
+
+
+def format_bytes(num_bytes):
+    """ Bytes in a readable unit, e.g. '512 MiB' """
+
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}"
+        num_bytes /= 1024
+
+    return f"{num_bytes:.3g} PiB"
+
+
+def describe(decision):
+    """ One line of the decision of plan(): the method chosen and its cost, or why none was """
+
+    if decision["method"] is not None:
+        return f"{decision['method']}, ~{format_bytes(decision['memory'])} and ~{decision['seconds']:.2g}s (budget {format_bytes(decision['budget'])})"
+
+    costs = ", ".join(f"{method} ~{format_bytes(memory)} ~{seconds:.2g}s" for method, (memory, seconds) in sorted(decision["estimates"].items()))
+
+    return f"no method fits in {format_bytes(decision['budget'])} and {MAX_SECONDS:g}s: {costs}"
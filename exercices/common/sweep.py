@@ -0,0 +1,170 @@
+import math
+import numpy as np
+from print_color import print
+
+from common import bits, reduced_noise, registry, tracing
+from common.cli import pop_option
+from common.transpile_cache import cached_transpile
+
+
+# * None: the exercices run their fixed circuit
+# * n: the parameterized variant of the circuit is run for n values of θ between 0 and 2π
+POINTS = None
+
+# * Number of sweep points printed, evenly spaced, the other ones are only in the result tensor
+PRINT_POINTS = 9
+
+
+def configure_from_argv():
+    """ Set the sweep mode from the flags of the script
+
+    * '--sweep 1000': run the parameterized circuit for 1000 values of θ
+    * The flag is removed from sys.argv
+    """
+
+    global POINTS
+
+    points = pop_option("--sweep")
+    if points is not None:
+        POINTS = int(points)
+        assert POINTS > 0, "The number of sweep points must be positive"
+
+
+def enabled():
+    """ True if the exercices must run a parameter sweep """
+
+    return POINTS is not None
+
+
+def plus_state_circuit():
+    """ RY(θ) variant of the plus state: θ = π/2 gives ∣+⟩, the probability of ∣1⟩ is sin²(θ/2) """
+
+    from qiskit import QuantumCircuit
+    from qiskit.circuit import Parameter
+
+    qc = QuantumCircuit(1)
+    qc.ry(Parameter("θ"), 0)
+    qc.measure_all()
+
+    return qc
+
+
+def rotated_bell_circuit():
+    """ Rotated Bell state cos(θ/2)∣00⟩ + sin(θ/2)∣11⟩: θ = π/2 gives Φ^+ """
+
+    from qiskit import QuantumCircuit
+    from qiskit.circuit import Parameter
+
+    qc = QuantumCircuit(2)
+    qc.ry(Parameter("θ"), 0)
+    qc.cx(0, 1)
+    qc.measure_all()
+
+    return qc
+
+
+def thetas(points=None):
+    """ The values of θ of the sweep, from 0 to 2π included """
+
+    return np.linspace(0, 2 * math.pi, points or POINTS)
+
+
+def probabilities(bit_array):
+    """ Frequencies of each outcome at each sweep point
+
+    * One bincount over all the shots: the outcome of a shot is offset by its sweep point
+
+    Return
+    -----
+        (np.ndarray): shape (points, 2^num_bits), the outcome is the integer value of the clbits
+    """
+
+    outcomes = 1 << bit_array.num_bits
+    points = bit_array.size
+
+    values = bits.as_uint64(bit_array)[:, -1].astype(np.int64).reshape(points, -1)
+    offsets = np.arange(points)[:, None] * outcomes
+
+    counts = np.bincount((values + offsets).ravel(), minlength=points * outcomes).reshape(points, outcomes)
+
+    return counts / bit_array.num_shots
+
+
+def run(circuit, values, backend, shots):
+    """ Run a parameterized circuit for every set of values in a single submission
+
+    Params
+    -----
+        circuit (QuantumCircuit): the parameterized circuit, with its measurements
+        values (np.ndarray): the values of the parameters, shape (points,) or (points, parameters)
+        backend (BackendV2): the backend to run on
+        shots (int): the shots of each sweep point
+
+    * The circuit is transpiled once with its parameters unbound, from the cache if already done
+    * It is submitted as one PUB (circuit, values): the sampler binds every point itself
+    * With --reduced-noise, a fake backend simulates only the qubits used after the layout
+
+    Return
+    -----
+        (np.ndarray): the frequencies of each outcome, shape (points, 2^num_bits), see probabilities()
+    """
+
+    isa_circuit = cached_transpile(circuit, backend)
+    sampler = registry.get_sampler(backend)
+    if reduced_noise.enabled() and getattr(backend, "sim", None) is not None:
+        sampler, isa_circuit = reduced_noise.prepare(backend, isa_circuit)
+
+    values = np.asarray(values, dtype=float).reshape(len(values), circuit.num_parameters)
+
+    with tracing.span("sweep run", points=len(values), backend=backend.name):
+        result = sampler.run([(isa_circuit, values)], shots=shots).result()[0]
+
+    return probabilities(getattr(result.data, circuit.cregs[0].name))
+
+
+def report(name, values, frequencies, expected):
+    """ Print some sweep points and the largest gap with the theoretical probability of the all-ones state
+
+    Params
+    -----
+        name (str): the backend, printed in the tag
+        values (np.ndarray): the values of θ
+        frequencies (np.ndarray): the result tensor of run()
+        expected (np.ndarray): the theoretical probability of the all-ones state at each point
+    """
+
+    observed = frequencies[:, -1]
+
+    for index in np.linspace(0, len(values) - 1, min(PRINT_POINTS, len(values))).astype(int):
+        print(f"θ = {values[index]:.3f}: ", tag=f'SWEEP - {name}', tag_color='red', color='white', end='')
+        print(f"{observed[index]:.3f}", color='purple', end=' ')
+        print(f"(theoretical {expected[index]:.3f})")
+
+    print(f"Largest gap with the theory on {len(values)} points: ", tag=f'SWEEP - {name}', tag_color='red', color='white', end='')
+    print(f"{np.abs(observed - expected).max():.3f}\n", color='yellow')
+
+
+def run_sweep(circuit, shots):
+    """ Sweep θ on an AerSimulator and on a FakeBackend simulator
+
+    * Each backend gets one transpile and one submission for all the points
+    * The all-ones state has a probability sin²(θ/2) for both circuits of this module
+
+    Return
+    -----
+        (dict): the result tensor of each backend
+    """
+
+    values = thetas()
+    expected = np.sin(values / 2) ** 2
+
+    tensors = {}
+
+    for name, backend in (("AerSimulator", registry.get_aer_simulator(profile="small_batch")), ("FakeBackend", registry.get_fake_backend())):
+        print("\n=============================\n", color='yellow')
+        print(f"Sweeping θ on {len(values)} points with {name}", tag='info', tag_color='cyan')
+
+        tensors[name] = run(circuit, values, backend, shots)
+        report(name, values, tensors[name], expected)
+
+    return tensors
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+
+
+# * FTL_QUANTUM_TRACE=trace.json: the stages of the run are written as a Chrome trace,
+# * open it in https://ui.perfetto.dev or chrome://tracing
+# * Unset: span() returns a shared empty context and traced() returns the function itself
+TRACE_PATH = os.environ.get("FTL_QUANTUM_TRACE")
+
+_NULL = nullcontext()
+_events = []
+_lock = threading.Lock()
+_process = None
+
+
+def enabled():
+    """ True if the spans are recorded """
+
+    return TRACE_PATH is not None
+
+
+def _memory():
+    """ Resident memory of the process and its peak since the start, in MB
+
+    * The peak is ru_maxrss of the process where it exists (Linux, macOS), else the peak working set of psutil
+    """
+
+    global _process
+
+    if _process is None:
+        import psutil
+        _process = psutil.Process()
+
+    info = _process.memory_info()
+    peak = getattr(info, "peak_wset", None)
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        pass
+
+    return info.rss / 2 ** 20, max(peak or 0, info.rss) / 2 ** 20
+
+
+@contextmanager
+def _span(name, category, args):
+    """ Record a complete event: wall time, CPU time of the process and memory at the end """
+
+    start_wall = time.time()
+    start_cpu = time.process_time()
+
+    try:
+        yield
+    finally:
+        duration = time.time() - start_wall
+        rss, peak = _memory()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_wall * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": dict(args, cpu_ms=round((time.process_time() - start_cpu) * 1000, 3),
+                         rss_mb=round(rss, 1), peak_rss_mb=round(peak, 1)),
+        }
+        with _lock:
+            _events.append(event)
+
+
+def span(name, category="stage", **args):
+    """ Time a block of code
+
+    Params
+    -----
+        name (str): the name of the span in the timeline
+        category (str): the category of the span, to filter them in the viewer
+        args: values shown with the span, e.g. the number of circuits
+
+    * with tracing.span("transpile", circuits=3): ...
+    * The CPU time is the one of the whole process, the threads of Aer included
+
+    Return
+    -----
+        (context manager): records the span when tracing is enabled, does nothing otherwise
+    """
+
+    if TRACE_PATH is None:
+        return _NULL
+
+    return _span(name, category, args)
+
+
+def traced(name=None, category="stage"):
+    """ Decorator that records each call of a function as a span, named after the function by default
+
+    * When tracing is disabled the function is returned as it is, the calls cost nothing more
+    """
+
+    def decorator(function):
+        if TRACE_PATH is None:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _span(name or function.__name__, category, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def drain():
+    """ Take the events recorded by this process, for a worker to return them to the main process """
+
+    with _lock:
+        events = list(_events)
+        _events.clear()
+
+    return events
+
+
+def extend(events):
+    """ Add the events recorded by a worker process """
+
+    with _lock:
+        _events.extend(events)
+
+
+def write(path=None):
+    """ Write the events as a Chrome trace, with the name of each process
+
+    * Only the main process writes, the workers return their events to it
+    * Called at exit, the file is replaced at each run
+    """
+
+    import multiprocessing
+
+    if multiprocessing.parent_process() is not None:
+        return
+
+    events = drain()
+
+    if not events:
+        return
+
+    script = os.path.basename(sys.argv[0]) or "main"
+    names = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": script if pid == os.getpid() else "worker"}}
+             for pid in sorted({event["pid"] for event in events})]
+
+    with open(path or TRACE_PATH, "w") as fd:
+        json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, fd)
+
+
+if TRACE_PATH is not None:
+    atexit.register(write)
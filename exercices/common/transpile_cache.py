@@ -0,0 +1,240 @@
+import io
+import os
+import hashlib
+import weakref
+
+import qiskit
+from qiskit import QuantumCircuit, qpy
+from qiskit.circuit import ControlFlowOp, ControlledGate, Delay, ParameterExpression
+from qiskit.circuit.library import get_standard_gate_name_mapping
+
+from common import tracing
+from common.cache import cache_enabled, cache_path, write_atomic, touch, evict_lru
+
+
+MAX_CACHE_BYTES = int(os.environ.get("FTL_QUANTUM_TRANSPILE_CACHE_MB", "256")) * 1024 * 1024
+
+STANDARD_GATES = get_standard_gate_name_mapping()
+
+_target_fingerprints = weakref.WeakKeyDictionary()
+
+
+def _hash_param(param):
+    """ Stable representation of an instruction parameter """
+
+    if isinstance(param, ParameterExpression):
+        return f"expr:{param}"
+    if isinstance(param, float):
+        return f"f:{param!r}"
+    if isinstance(param, QuantumCircuit):
+        return f"circ:{circuit_hash(param)}"
+
+    return f"{type(param).__name__}:{param!r}"
+
+
+def _hash_operation(operation):
+    """ Stable representation of an operation, independent of the generated names
+
+    * A standard gate is represented by its name and parameters, a delay also by its unit
+    * A controlled gate by its number of controls, control state and base gate
+    * Any other operation (custom gate, composed circuit, ...) by the hash of its definition
+        * their names contain a counter (e.g. 'circuit-165') that changes from one run to another
+    """
+
+    params = ",".join(_hash_param(param) for param in getattr(operation, "params", []))
+    if isinstance(operation, Delay):
+        params += f",unit:{operation.unit}"
+    standard = STANDARD_GATES.get(operation.name)
+
+    if standard is not None and type(standard) is type(operation):
+        return f"{operation.name}({params})"
+
+    if isinstance(operation, ControlledGate):
+        return f"ctrl{operation.num_ctrl_qubits}:{operation.ctrl_state}[{_hash_operation(operation.base_gate)}]"
+
+    definition = getattr(operation, "definition", None)
+    if definition is not None:
+        return f"def({params})[{circuit_hash(definition)}]"
+
+    return f"{operation.name}/{operation.num_qubits}/{operation.num_clbits}({params})"
+
+
+def _hash_condition(qc, operation):
+    """ Stable representation of the classical condition of an operation, '' if it has none
+
+    * The condition of a control flow operation (if_else, while_loop), or of a gate with c_if()
+        * Instruction.condition is deprecated for the other operations, the value set by c_if() is read directly
+    * A clbit is represented by its index, a register by its name, an expression by its repr
+    """
+
+    condition = operation.condition if isinstance(operation, ControlFlowOp) else getattr(operation, "_condition", None)
+
+    if condition is None:
+        return ""
+    if not isinstance(condition, tuple):
+        return f"expr:{condition!r}"
+
+    target, value = condition
+    target = f"reg:{target.name}" if hasattr(target, "size") else f"bit:{qc.find_bit(target).index}"
+
+    return f"{target}=={value}"
+
+
+def circuit_hash(qc):
+    """ Structural hash of a circuit
+
+    Param
+    -----
+        qc (QuantumCircuit): the circuit to hash
+
+    * Hash the registers (their names are used as keys of the results)
+    * Hash the global phase
+    * Hash each instruction with its operation, its classical condition and the index of the bits it acts on
+
+    Return
+    -----
+        digest (str): the sha256 hex digest of the structure of the circuit
+    """
+
+    sha = hashlib.sha256()
+
+    sha.update(f"{qc.num_qubits}/{qc.num_clbits}/{_hash_param(qc.global_phase)}\n".encode())
+    for register in qc.qregs + qc.cregs:
+        sha.update(f"{type(register).__name__}:{register.name}:{register.size}\n".encode())
+
+    for instruction in qc.data:
+        qubits = [qc.find_bit(qubit).index for qubit in instruction.qubits]
+        clbits = [qc.find_bit(clbit).index for clbit in instruction.clbits]
+        sha.update(f"{_hash_operation(instruction.operation)}|{_hash_condition(qc, instruction.operation)}|{qubits}|{clbits}\n".encode())
+
+    return sha.hexdigest()
+
+
+def target_fingerprint(backend):
+    """ Fingerprint of the target of a backend, computed once per backend instance
+
+    Param
+    -----
+        backend (BackendV2): the backend the circuits are transpiled for
+
+    * Hash the name, the number of qubits and the dt of the backend
+    * Hash every instruction supported with its qubits, duration and error
+        * the layout and routing passes use the errors, a new calibration gives a new fingerprint
+
+    Return
+    -----
+        digest (str): the sha256 hex digest of the target
+    """
+
+    try:
+        return _target_fingerprints[backend]
+    except (KeyError, TypeError):
+        pass
+
+    target = backend.target
+    sha = hashlib.sha256()
+    sha.update(f"{backend.name}/{target.num_qubits}/{target.dt}\n".encode())
+
+    for name in sorted(target.operation_names):
+        sha.update(f"{name}\n".encode())
+        properties = target[name] or {}
+        for qargs in sorted(properties, key=lambda qargs: qargs or ()):
+            props = properties[qargs]
+            if props is None:
+                sha.update(f"{qargs}\n".encode())
+            else:
+                sha.update(f"{qargs}:{props.duration}:{props.error}\n".encode())
+
+    digest = sha.hexdigest()
+
+    try:
+        _target_fingerprints[backend] = digest
+    except TypeError:
+        pass
+
+    return digest
+
+
+def _cache_key(qc, fingerprint, optimization_level):
+    """ Key of a transpiled circuit: circuit structure + target + optimization level + qiskit version """
+
+    key = f"{circuit_hash(qc)}/{fingerprint}/{optimization_level}/{qiskit.__version__}"
+
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _load(path):
+    """ Load a cached ISA circuit, None if the entry is missing or unreadable """
+
+    try:
+        with open(path, "rb") as fd:
+            circuit = qpy.load(fd)[0]
+    except Exception:
+        return None
+
+    touch(path)
+
+    return circuit
+
+
+def _store(path, circuit):
+    """ Save an ISA circuit as QPY in the cache """
+
+    buffer = io.BytesIO()
+    qpy.dump(circuit, buffer)
+    write_atomic(path, buffer.getvalue())
+
+
+def _transpile(circuits, backend, optimization_level):
+    """ Transpile with a preset pass manager, its import is only paid when the cache misses """
+
+    from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+    with tracing.span("transpile", circuits=len(circuits), backend=backend.name, optimization_level=optimization_level):
+        pm = generate_preset_pass_manager(backend=backend, optimization_level=optimization_level)
+        return pm.run(circuits)
+
+
+def cached_transpile(circuits, backend, optimization_level=2):
+    """ Transpile circuits for a backend, reusing the ISA circuits already in the on-disk cache
+
+    Params
+    -----
+        circuits (QuantumCircuit or list): the circuit(s) to transpile
+        backend (BackendV2): the backend to transpile for
+        optimization_level (int): the optimization level of the preset pass manager,
+            2 is the default of transpile()
+
+    * Compute the key of each circuit from its structure, the target of the backend and the optimization level
+    * Load the circuits already in the cache
+    * Transpile the missing ones together with a preset pass manager and store them as QPY
+    * Evict the least recently used entries if the cache is above its size limit
+
+    Return
+    -----
+        isa_circuits (QuantumCircuit or list): the transpiled circuit(s), same shape as the input
+    """
+
+    single = isinstance(circuits, QuantumCircuit)
+    circuits = [circuits] if single else list(circuits)
+
+    if not cache_enabled():
+        isa_circuits = _transpile(circuits, backend, optimization_level)
+        return isa_circuits[0] if single else isa_circuits
+
+    fingerprint = target_fingerprint(backend)
+    paths = [cache_path("transpile", f"{_cache_key(qc, fingerprint, optimization_level)}.qpy") for qc in circuits]
+
+    isa_circuits = [_load(path) for path in paths]
+    missing = [index for index, isa_circuit in enumerate(isa_circuits) if isa_circuit is None]
+
+    if missing:
+        transpiled = _transpile([circuits[index] for index in missing], backend, optimization_level)
+
+        for index, isa_circuit in zip(missing, transpiled):
+            isa_circuits[index] = isa_circuit
+            _store(paths[index], isa_circuit)
+
+        evict_lru(os.path.dirname(paths[0]), MAX_CACHE_BYTES)
+
+    return isa_circuits[0] if single else isa_circuits
@@ -1,8 +1,27 @@
 import os
-from dotenv import load_dotenv
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from print_color import print
 
-from qiskit_ibm_runtime import QiskitRuntimeService
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.cache import cache_enabled, cache_path, write_atomic
+from common.cli import pop_flag, pop_option
+
+
+# * The static properties of the backends (type, qubits, online date, processor) are kept STATIC_TTL seconds,
+# * only the status is probed at each listing
+STATIC_TTL = 24 * 3600
+
+# * Number of backends probed at the same time
+MAX_WORKERS = 16
+
+# * Seconds between two refreshes of the pending jobs with '--watch'
+WATCH_INTERVAL = 30
+
+_static_cache = None
 
 
 def load_account():
@@ -15,6 +34,9 @@ def load_account():
     * 'overwrite' to 'True' so that the existing account is overwritten
     """
 
+    from dotenv import load_dotenv
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
     load_dotenv()
     token = os.getenv("TOKEN")
 
@@ -22,52 +44,163 @@ def load_account():
     print("Account loaded !\n", tag='success', tag_color='green', color='white')
 
 
-def process_data(service):
+def _load_static_cache():
+    """ The static properties of the backends stored on disk, {} if the caches are disabled """
+
+    global _static_cache
+
+    if _static_cache is None:
+        _static_cache = {}
+        if not cache_enabled():
+            return _static_cache
+        path = cache_path("backends.json")
+        if os.path.exists(path):
+            try:
+                with open(path) as fd:
+                    _static_cache = json.load(fd)
+            except (OSError, ValueError):
+                _static_cache = {}
+
+    return _static_cache
+
+
+def fetch_static(bck):
+    """ Read the properties of a backend that do not change between two listings
+
+    Return
+    -----
+        (dict): the entry of the TTL cache, with the time it was fetched
+    """
+
+    return {
+        "fetched_at": time.time(),
+        "simulator": bool(bck.simulator),
+        "num_qubits": bck.num_qubits,
+        "online_date": bck.online_date.strftime("%d %b %Y, %I:%M%p %Z"),
+        "processor_type": bck.processor_type["family"],
+    }
+
+
+def static_properties(backends, pool):
+    """ Get the static properties of the backends, from the TTL cache when they are fresh enough
+
+    Params
+    -----
+        backends (list): the backends of the service
+        pool (ThreadPoolExecutor): fetches the expired entries concurrently
+
+    * The entries older than STATIC_TTL are fetched again, the cache is written back if any changed
+
+    Return
+    -----
+        (dict): the properties of each backend, by name
+    """
+
+    cache = _load_static_cache()
+    now = time.time()
+
+    expired = [bck for bck in backends if now - cache.get(bck.name, {}).get("fetched_at", 0) > STATIC_TTL]
+
+    for bck, properties in zip(expired, pool.map(fetch_static, expired)):
+        cache[bck.name] = properties
+
+    if expired and cache_enabled():
+        write_atomic(cache_path("backends.json"), json.dumps(cache).encode())
+
+    return {bck.name: cache[bck.name] for bck in backends}
+
+
+def probe_pending_jobs(backends, pool):
+    """ Probe the status of every backend concurrently
+
+    * Each bck.status() is a request to the service, they wait on the network at the same time
+
+    Return
+    -----
+        (dict): the number of pending jobs of each backend, by name
+    """
+
+    return dict(zip((bck.name for bck in backends), pool.map(lambda bck: bck.status().pending_jobs, backends)))
+
+
+def process_data(service, pool):
     """ Print data from the service available
 
     * Get all backends accessible via this account
+    * Probe their status on the pool, take their static properties from the TTL cache
 
     * Print relevent information for each backend obtained
     """
 
     backends = service.backends()
 
+    properties = static_properties(backends, pool)
+    pending_jobs = probe_pending_jobs(backends, pool)
+
     print("Backends accessible with this account:", color='blue')
     for bck in backends:
-        if bck.simulator:
+        static = properties[bck.name]
+        if static["simulator"]:
             bck_type = "simulated"
         else:
             bck_type = "real"
-        status = bck.status()
-        date = bck.online_date.strftime("%d %b %Y, %I:%M%p %Z")
-        processor_type = bck.processor_type["family"]
 
         print(f"\t{bck.name}", color='purple', end=' | ')
         print(bck_type, format='underline', end=' ')
         print("quantum computer | pending jobs: ", end=' ')
-        print(status.pending_jobs, color='cyan', end=' | ')
+        print(pending_jobs[bck.name], color='cyan', end=' | ')
         print("total number of qubits: ", end=' ')
-        print(bck.num_qubits, color='cyan', end=' | ')
-        print(f"went online on {date} | type of processor: {processor_type}")
+        print(static["num_qubits"], color='cyan', end=' | ')
+        print(f"went online on {static['online_date']} | type of processor: {static['processor_type']}")
+
+    return backends
+
+
+def watch(backends, pool, interval):
+    """ Refresh the pending jobs of the backends until interrupted
+
+    * Only the status is probed again, the list of backends and their properties are the ones printed before
+    """
+
+    try:
+        while True:
+            time.sleep(interval)
+            pending_jobs = probe_pending_jobs(backends, pool)
+            print(f"Pending jobs at {datetime.now().strftime('%I:%M:%S%p')}:", color='blue')
+            for name, pending in sorted(pending_jobs.items(), key=lambda item: item[1]):
+                print(f"\t{name}", color='purple', end=' | ')
+                print(pending, color='cyan')
+    except KeyboardInterrupt:
+        print("Stopped watching", tag='watch', tag_color='cyan', color='white')
 
 
 def main():
     """
     * Try to get a service instance, need to have the IBMQ account loaded
-    * If not loaded, call load_account()
+    * If no account is saved, call load_account(), the other errors are raised
 
     * process_data(service) will print the information about the services available
+    * '--watch': then refresh the pending jobs every WATCH_INTERVAL seconds, or '--interval' seconds
     """
 
+    watch_mode = pop_flag("--watch")
+    interval = float(pop_option("--interval") or WATCH_INTERVAL)
+
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    from qiskit_ibm_runtime.accounts import AccountNotFoundError
+
     try:
         service = QiskitRuntimeService(instance="ibm-q/open/main")
         print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
-    except Exception:
+    except AccountNotFoundError:
         print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
         load_account()
         service = QiskitRuntimeService(instance="ibm-q/open/main")
 
-    process_data(service)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        backends = process_data(service, pool)
+        if watch_mode:
+            watch(backends, pool, interval)
 
 
 if __name__ == "__main__":
@@ -1,15 +1,18 @@
+import os
+import sys
 from print_color import print
 
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
-from qiskit_ibm_runtime import SamplerV2 as Sampler
-from qiskit_ibm_runtime.fake_provider import FakeSherbrooke
-from qiskit.visualization import plot_histogram, plot_distribution
+from qiskit import QuantumCircuit
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import exact, plots, reduced_noise, registry, sweep, tracing
+from common.transpile_cache import cached_transpile
 
 
 SHOTS = 500
 
 
+@tracing.traced()
 def circuit_creation():
     """ Create a circuit to illustrate the principle of superposition
 
@@ -31,11 +34,12 @@ def circuit_creation():
 
     print("ASCII representation of the circuit:")
     print(qc)
-    qc.draw(output='mpl', filename="circuit_plus_state", interactive=True)
+    plots.circuit(qc, filename="circuit_plus_state", interactive=True)
 
     return qc
 
 
+@tracing.traced()
 def aer_simulation(qc):
     """ Run the plus state circuit with an AerSimulator
 
@@ -43,6 +47,7 @@ def aer_simulation(qc):
     -----
         qc (QuantumCircuit): the circuit to run
 
+    * With --exact or --exact-sample, get the exact distribution instead, no shot is simulated
     * Get the Aer simulator,
     *   the method used is automatically selected based on the circuit and noise model
     * Transpile (i.e. adapt) the circuit for the simulator obtained
@@ -56,15 +61,19 @@ def aer_simulation(qc):
 
     print("Running the circuit with an AerSimulator", color='green')
 
-    sim = AerSimulator(method='automatic')
+    if exact.enabled():
+        counts, sim_type = exact.run(qc, SHOTS)
+    else:
+        sim = registry.get_aer_simulator(workload=qc)
 
-    qc_transpile = transpile(qc, backend=sim)
+        qc_transpile = cached_transpile(qc, sim)
 
-    result = sim.run(qc_transpile, shots=SHOTS).result()
+        with tracing.span("simulate", backend=sim.name, shots=SHOTS):
+            result = sim.run(qc_transpile, shots=SHOTS).result()
 
-    sim_type = result.results[0].metadata['method']
+        sim_type = result.results[0].metadata['method']
 
-    counts = result.get_counts()
+        counts = result.get_counts()
 
     counts = dict(sorted(counts.items()))
 
@@ -76,12 +85,13 @@ def aer_simulation(qc):
         print(result / SHOTS, color='purple', end=')\n')
 
     title = f"Count result for the plus state $|+\\rangle$ with {SHOTS} shots on AerSimulator (method {sim_type})"
-    plot_histogram(counts, title=title, filename="histogram_aer_plus_state", figsize=(12, 8))
+    plots.histogram(counts, title=title, filename="histogram_aer_plus_state", figsize=(12, 8))
 
     title = f"Percentage result for the plus state $|+\\rangle$ with {SHOTS} shots on AerSimulator (method {sim_type})"
-    plot_distribution(counts, title=title, filename="distribution_aer_plus_state", figsize=(12, 8))
+    plots.distribution(counts, title=title, filename="distribution_aer_plus_state", figsize=(12, 8))
 
 
+@tracing.traced()
 def fake_backend_simulation(qc):
     """ Run the plus state circuit with a FakeBackend simulator
 
@@ -90,7 +100,9 @@ def fake_backend_simulation(qc):
         qc (QuantumCircuit): the circuit to run
 
     * Get the FakeBackend simulator, mimics behaviors of real systems
-    * Transpile (i.e. adapt) the circuit for the simulator obtained
+        * built once per process, its noise model is loaded from the disk cache
+    * Transpile (i.e. adapt) the circuit for the simulator obtained, reused from the cache if already done
+        * with --reduced-noise, the circuit and the noise model are reduced to the qubits used after the layout
     * Get a Primitive, here SamplerV2, for the particular backend obtained
         * https://docs.quantum.ibm.com/api/qiskit/primitives
     * Run the circuit on the simulator with a precise number of shots
@@ -103,13 +115,17 @@ def fake_backend_simulation(qc):
 
     print("Running the circuit with a FakeBackend simulator", color='cyan')
 
-    backend = FakeSherbrooke()
+    backend = registry.get_fake_backend()
+
+    qc_transpile = cached_transpile(qc, backend)
 
-    qc_transpile = transpile(qc, backend)
+    sampler = registry.get_sampler(backend)
+    if reduced_noise.enabled():
+        sampler, qc_transpile = reduced_noise.prepare(backend, qc_transpile)
 
-    sampler = Sampler(backend)
-    job = sampler.run([qc_transpile], shots=SHOTS)
-    result = job.result()[0]
+    with tracing.span("simulate", backend=backend.name, shots=SHOTS):
+        job = sampler.run([qc_transpile], shots=SHOTS)
+        result = job.result()[0]
     bits_name = qc.cregs[0].name
     counts = getattr(result.data, bits_name).get_counts()
 
@@ -123,14 +139,22 @@ def fake_backend_simulation(qc):
         print(result / SHOTS, color='purple', end=')\n')
 
     title = f"Count result for the plus state $|+\\rangle$ with the FakeBackend simulation and {SHOTS} shots"
-    plot_histogram(counts, title=title, filename="histogram_fake_plus_state", figsize=(12, 8))
+    plots.histogram(counts, title=title, filename="histogram_fake_plus_state", figsize=(12, 8))
 
     title = f"Percentage result for the plus state $|+\\rangle$ with the FakeBackend simulation and {SHOTS} shots"
-    plot_distribution(counts, title=title, filename="distribution_fake_plus_state", figsize=(12, 8))
+    plots.distribution(counts, title=title, filename="distribution_fake_plus_state", figsize=(12, 8))
 
 
 def main():
-    """ main function to create the circuit and do the simulation with different types """
+    """ main function to create the circuit and do the simulation with different types
+
+    * With --sweep n, run the RY(θ) variant of the plus state for n values of θ instead,
+        * one transpile and one submission per simulator for all the points
+    """
+
+    if sweep.enabled():
+        sweep.run_sweep(sweep.plus_state_circuit(), SHOTS)
+        return
 
     qc = circuit_creation()
 
@@ -140,4 +164,9 @@ def main():
 
 
 if __name__ == "__main__":
+    plots.configure_from_argv()
+    exact.configure_from_argv()
+    reduced_noise.configure_from_argv()
+    sweep.configure_from_argv()
     main()
+    plots.wait()
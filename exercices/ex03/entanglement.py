@@ -1,15 +1,18 @@
+import os
+import sys
 from print_color import print
 
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
-from qiskit_ibm_runtime import SamplerV2 as Sampler
-from qiskit_ibm_runtime.fake_provider import FakeSherbrooke
-from qiskit.visualization import plot_histogram, plot_distribution
+from qiskit import QuantumCircuit
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import exact, plots, reduced_noise, registry, sweep, tracing
+from common.transpile_cache import cached_transpile
 
 
 SHOTS = 500
 
 
+@tracing.traced()
 def circuit_creation():
     """ Create a circuit that implement the principle of entanglement
 
@@ -34,11 +37,12 @@ def circuit_creation():
 
     print("\nASCII representation of the circuit:")
     print(qc)
-    qc.draw(output='mpl', filename="circuit_Phi_plus", interactive=True)
+    plots.circuit(qc, filename="circuit_Phi_plus", interactive=True)
 
     return qc
 
 
+@tracing.traced()
 def aer_simulation(qc):
     """ Run the Phi^+ state circuit with an AerSimulator
 
@@ -46,6 +50,7 @@ def aer_simulation(qc):
     -----
         qc (QuantumCircuit): the circuit to run
 
+    * With --exact or --exact-sample, get the exact distribution instead, no shot is simulated
     * Get the Aer simulator,
     *   the method used is automatically selected based on the circuit and noise model
     * Transpile (i.e. adapt) the circuit for the simulator obtained
@@ -59,15 +64,19 @@ def aer_simulation(qc):
 
     print("Running the circuit with an AerSimulator", color='green')
 
-    sim = AerSimulator(method='automatic')
+    if exact.enabled():
+        counts, sim_type = exact.run(qc, SHOTS)
+    else:
+        sim = registry.get_aer_simulator(workload=qc)
 
-    qc_transpile = transpile(qc, backend=sim)
+        qc_transpile = cached_transpile(qc, sim)
 
-    result = sim.run(qc_transpile, shots=SHOTS).result()
+        with tracing.span("simulate", backend=sim.name, shots=SHOTS):
+            result = sim.run(qc_transpile, shots=SHOTS).result()
 
-    sim_type = result.results[0].metadata['method']
+        sim_type = result.results[0].metadata['method']
 
-    counts = result.get_counts()
+        counts = result.get_counts()
 
     counts = dict(sorted(counts.items()))
 
@@ -79,12 +88,13 @@ def aer_simulation(qc):
         print(result / SHOTS, color='purple', end=')\n')
 
     title = f"Count result for the $\Phi^+$ Bell state with {SHOTS} shots on AerSimulator with method {sim_type}"
-    plot_histogram(counts, title=title, filename="histogram_aer_Phi_plus", figsize=(12, 8))
+    plots.histogram(counts, title=title, filename="histogram_aer_Phi_plus", figsize=(12, 8))
 
     title = f"Percentage result for the $\Phi^+$ Bell state with {SHOTS} shots on AerSimulator with method {sim_type}"
-    plot_distribution(counts, title=title, filename="distribution_aer_Phi_plus", figsize=(12, 8))
+    plots.distribution(counts, title=title, filename="distribution_aer_Phi_plus", figsize=(12, 8))
 
 
+@tracing.traced()
 def fake_backend_simulation(qc):
     """ Run the Phi^+ state circuit with a FakeBackend simulator
 
@@ -96,7 +106,9 @@ def fake_backend_simulation(qc):
         qc (QuantumCircuit): the circuit to run
 
     * Get the FakeBackend simulator, mimics behaviors of real systems
-    * Transpile (i.e. adapt) the circuit for the simulator obtained
+        * built once per process, its noise model is loaded from the disk cache
+    * Transpile (i.e. adapt) the circuit for the simulator obtained, reused from the cache if already done
+        * with --reduced-noise, the circuit and the noise model are reduced to the qubits used after the layout
     * Get a Primitive, here SamplerV2, for the particular backend obtained
         * https://docs.quantum.ibm.com/api/qiskit/primitives
     * Run the circuit on the simulator with a precise number of shots
@@ -109,13 +121,17 @@ def fake_backend_simulation(qc):
 
     print("Running the circuit with a FakeBackend simulator", color='cyan')
 
-    backend = FakeSherbrooke()
+    backend = registry.get_fake_backend()
+
+    qc_transpile = cached_transpile(qc, backend)
 
-    qc_transpile = transpile(qc, backend)
+    sampler = registry.get_sampler(backend)
+    if reduced_noise.enabled():
+        sampler, qc_transpile = reduced_noise.prepare(backend, qc_transpile)
 
-    sampler = Sampler(backend)
-    job = sampler.run([qc_transpile], shots=SHOTS)
-    result = job.result()[0]
+    with tracing.span("simulate", backend=backend.name, shots=SHOTS):
+        job = sampler.run([qc_transpile], shots=SHOTS)
+        result = job.result()[0]
     bits_name = qc.cregs[0].name
     counts = getattr(result.data, bits_name).get_counts()
 
@@ -129,14 +145,22 @@ def fake_backend_simulation(qc):
         print(result / SHOTS, color='purple', end=')\n')
 
     title = f"Count result for the $\Phi^+$ Bell state with the FakeBackend simulation and {SHOTS} shots"
-    plot_histogram(counts, title=title, filename="histogram_fake_Phi_plus", figsize=(12, 8))
+    plots.histogram(counts, title=title, filename="histogram_fake_Phi_plus", figsize=(12, 8))
 
     title = f"Percentage result for the $\Phi^+$ Bell state with the FakeBackend simulation and {SHOTS} shots"
-    plot_distribution(counts, title=title, filename="distribution_fake_Phi_plus", figsize=(12, 8))
+    plots.distribution(counts, title=title, filename="distribution_fake_Phi_plus", figsize=(12, 8))
 
 
 def main():
-    """ main function to create the circuit and do the simulation with different types """
+    """ main function to create the circuit and do the simulation with different types
+
+    * With --sweep n, run the rotated Bell state for n values of θ instead,
+        * one transpile and one submission per simulator for all the points
+    """
+
+    if sweep.enabled():
+        sweep.run_sweep(sweep.rotated_bell_circuit(), SHOTS)
+        return
 
     qc = circuit_creation()
 
@@ -146,4 +170,9 @@ def main():
 
 
 if __name__ == "__main__":
+    plots.configure_from_argv()
+    exact.configure_from_argv()
+    reduced_noise.configure_from_argv()
+    sweep.configure_from_argv()
     main()
+    plots.wait()
@@ -1,12 +1,13 @@
 import os
-from dotenv import load_dotenv
+import sys
 from print_color import print
 
 from qiskit import QuantumCircuit
-from qiskit.visualization import plot_histogram, plot_distribution
 from qiskit.quantum_info import Statevector
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import backend_selector, jobs, local_service, plots, registry, tracing
+from common.transpile_cache import cached_transpile
 
 
 SHOTS = 500
@@ -22,6 +23,9 @@ def load_account():
     * 'overwrite' to 'True' so that the existing account is overwritten
     """
 
+    from dotenv import load_dotenv
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
     load_dotenv()
     token = os.getenv("TOKEN")
 
@@ -29,6 +33,7 @@ def load_account():
     print("Account loaded !\n", tag='success', tag_color='green', color='white')
 
 
+@tracing.traced()
 def create_circuit():
     """ Create the circuit for the Phi Bell state to be used on real quantum hardware
 
@@ -53,23 +58,30 @@ def create_circuit():
 
     ideal_distribution = Statevector.from_instruction(qc).probabilities_dict()
     title = "Ideal distribution of this circuit"
-    plot_histogram(ideal_distribution, title=title, filename="ideal_dist_Phi_plus", figsize=(12, 8))
+    plots.histogram(ideal_distribution, title=title, filename="ideal_dist_Phi_plus", figsize=(12, 8))
 
     qc.measure_all()
 
     print("\nASCII representation of the circuit:")
     print(qc, "\n")
-    qc.draw(output='mpl', filename="circuit_Phi_plus", interactive=True)
+    plots.circuit(qc, filename="circuit_Phi_plus", interactive=True)
 
     return qc
 
 
-def get_backend_computer():
+@tracing.traced()
+def get_backend_computer(circuits):
     """ Get a Service Backend to run the circuit on
 
+    Param
+    -----
+        circuits (QuantumCircuit or list): the circuits that will be run, the choice depends on their duration
+
+    * With FTL_QUANTUM_LOCAL_QUEUE, use the local stand-in of the service, no account is needed
     * Try to get a service instance, need to have the IBMQ account loaded
-    * If not loaded, call load_account()
-    * Get the least busy and operational backend quantum computer
+    * If no account is saved, call load_account(), the other errors are raised
+    * Get the operational quantum computer with the smallest estimated time to result,
+        * from its pending jobs, the runtime of our previous jobs and the duration of the transpiled circuits
 
     Return
     -----
@@ -78,16 +90,23 @@ def get_backend_computer():
 
     print("=============================\n", color='yellow')
 
-    try:
-        service = QiskitRuntimeService(instance="ibm-q/open/main")
-        print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
-    except Exception:
-        print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
-        load_account()
-        service = QiskitRuntimeService(instance="ibm-q/open/main")
-
-    print("Get the least busy and operational quantum computer ...")
-    backend = service.least_busy(operational=True, simulator=False)
+    if local_service.enabled():
+        service = local_service.get_service()
+        print("Using the local stand-in of the service\n", tag='info', tag_color='cyan', color='white')
+    else:
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        from qiskit_ibm_runtime.accounts import AccountNotFoundError
+
+        try:
+            service = QiskitRuntimeService(instance="ibm-q/open/main")
+            print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
+        except AccountNotFoundError:
+            print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
+            load_account()
+            service = QiskitRuntimeService(instance="ibm-q/open/main")
+
+    print("Get the operational quantum computer with the soonest result ...")
+    backend = backend_selector.select_backend(service, circuits, SHOTS)
     backend_status = backend.status()
     print("This will run on ", end='')
     print(backend.name, color='cyan', end=' (')
@@ -97,6 +116,7 @@ def get_backend_computer():
     return backend
 
 
+@tracing.traced()
 def run_circuit(qc, bck):
     """ Run the circuit on the backend obtained
 
@@ -106,7 +126,7 @@ def run_circuit(qc, bck):
         bck (IBMBackend): backend instance of the hardware used to execute
 
     * Optimize the circuit created for the particular backend obtained
-    * Convert to an Instruction Set Architecture (ISA) circuit
+    * Convert to an Instruction Set Architecture (ISA) circuit, reused from the cache if already done
         * ISA = the set of instructions the device can understand and execute
     * Draw the circuit after being converted
     * Get a Primitive, here SamplerV2, for the particular backend obtained
@@ -119,12 +139,11 @@ def run_circuit(qc, bck):
         job (RuntimeJobV2): representation of the runtime of the V2 Primitive execution
     """
 
-    pm = generate_preset_pass_manager(backend=bck, optimization_level=1)
-    isa_circuit = pm.run(qc)
+    isa_circuit = cached_transpile(qc, bck, optimization_level=1)
 
-    isa_circuit.draw('mpl', idle_wires=False, filename="circuit_optimized_Phi_plus")
+    plots.circuit(isa_circuit, idle_wires=False, filename="circuit_optimized_Phi_plus")
 
-    sampler = Sampler(bck)
+    sampler = registry.get_sampler(bck)
 
     job = sampler.run([isa_circuit], shots=SHOTS)
 
@@ -134,6 +153,7 @@ def run_circuit(qc, bck):
     return job
 
 
+@tracing.traced()
 def process_result(job, bck, qc):
     """ Print, plot and process the result of the execution (job)
 
@@ -143,6 +163,7 @@ def process_result(job, bck, qc):
         bck (IBMBackend): backend instance where the execution was run
         qc (QuantumCircuit): the QuantumCircuit for the classical bits name
 
+    * Wait for the job, its status is polled with a growing delay instead of blocking in job.result()
     * Get the result of the first PUB (Primitive Unified Bloc), this gives a PubResult object
     * Get the job_id of the execution
     * Get the name of the classical bits register
@@ -157,7 +178,7 @@ def process_result(job, bck, qc):
     * Plot a distribution for the percentage results of the job
     """
 
-    result = job.result()[0]
+    result = jobs.result(job)[0]
 
     job_id = job.job_id()
 
@@ -175,10 +196,10 @@ def process_result(job, bck, qc):
         print(result / SHOTS, color='purple', end=')\n')
 
     title = rf"Count result for the $\Phi^+$ Bell state with {SHOTS} shots runned on {bck.name}"
-    plot_histogram(pub_result, title=title, filename=f"histogram_Phi_plus_{job_id}", figsize=(12, 8))
+    plots.histogram(pub_result, title=title, filename=f"histogram_Phi_plus_{job_id}", figsize=(12, 8))
 
     title = rf"Percentage result for the $\Phi^+$ Bell state with {SHOTS} shots runned on {bck.name}"
-    plot_distribution(pub_result, title=title, filename=f"distribution_Phi_plus_{job_id}", figsize=(12, 8))
+    plots.distribution(pub_result, title=title, filename=f"distribution_Phi_plus_{job_id}", figsize=(12, 8))
 
 
 def main():
@@ -196,7 +217,7 @@ def main():
 
     qc = create_circuit()
 
-    bck = get_backend_computer()
+    bck = get_backend_computer(qc)
 
     job = run_circuit(qc, bck)
 
@@ -204,4 +225,6 @@ def main():
 
 
 if __name__ == "__main__":
+    plots.configure_from_argv()
     main()
+    plots.wait()
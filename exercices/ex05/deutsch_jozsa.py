@@ -1,19 +1,26 @@
 import os
 import sys
-from dotenv import load_dotenv
+from functools import partial
 from print_color import print
 
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
-from qiskit_ibm_runtime.fake_provider import FakeSherbrooke
-from qiskit.visualization import plot_histogram, plot_distribution
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from qiskit import QuantumCircuit
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import adaptive, backend_selector, bits, exact, jobs, local_service, plots, reduced_noise, registry, tracing
+from common.cli import confirm, pop_answer
+from common.simulation import simulation_method, max_qubits
+from common.transpile_cache import cached_transpile
 
 
 NB_QUBITS = 4
 SHOTS = 500
 
+# * Above this number of qubits the circuits are not drawn nor printed shot by shot
+DRAW_MAX_QUBITS = 16
+
+# * Number of shots printed one by one, the other ones are only counted
+MEMORY_PRINT_MAX = 500
+
 RESET = '\033[0m'
 RED = '\033[31m'
 
@@ -28,6 +35,9 @@ def load_account():
     * 'overwrite' to 'True' so that the existing account is overwritten
     """
 
+    from dotenv import load_dotenv
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
     load_dotenv()
     token = os.getenv("TOKEN")
 
@@ -35,9 +45,13 @@ def load_account():
     print("Account loaded !\n", tag='success', tag_color='green', color='white')
 
 
-def constant_oracle_subject():
+def constant_oracle_subject(draw=True):
     """ Create the constant oracle from the subject exemple
 
+    Param
+    -----
+        draw (bool): save the circuit as a .png, disabled for the batch mode
+
     * Create the QuantumCircuit with 4 qubits
     * Apply an X gate on the last qubit: q_3
     * Draw in the terminal and save as constant_oracle_subject.png the circuit
@@ -51,16 +65,23 @@ def constant_oracle_subject():
 
     qc.x(NB_QUBITS - 1)
 
-    qc.draw(output="mpl", filename="constant_oracle_subject")
+    if not draw:
+        return qc
+
+    plots.circuit(qc, filename="constant_oracle_subject")
 
     print("Created the constant oracle function from the subject\n", color='green', tag='info', tag_color='cyan')
 
     return qc
 
 
-def balanced_oracle_subject():
+def balanced_oracle_subject(draw=True):
     """ Create the balanced oracle from the subject exemple
 
+    Param
+    -----
+        draw (bool): save the circuit as a .png, disabled for the batch mode
+
     * Create the QuantumCircuit with 4 qubits
     * Apply an X gate on the first 3 qubits: q_0, q_1 and q_2
     * Apply three CNOT control gate with q_3 as the target and q_0, q_1 and q_2 as the controller
@@ -82,7 +103,10 @@ def balanced_oracle_subject():
 
     qc.x([0, 1, 2])
 
-    qc.draw(output="mpl", filename="balanced_oracle_subject")
+    if not draw:
+        return qc
+
+    plots.circuit(qc, filename="balanced_oracle_subject")
 
     print("Created the constant balanced function from the subject\n", color='green', tag='info', tag_color='cyan')
 
@@ -94,18 +118,91 @@ def oracle_eval():
     return 0
 
 
-def compile_circuit(oracle_function):
+def generate_constant_oracle(n, value=1):
+    """ Create a constant oracle for any number of input qubits
+
+    Params
+    -----
+        n (int): the number of input qubits
+        value (int): the constant output of the function, 0 or 1
+
+    * Create the QuantumCircuit with n input qubits and 1 output qubit
+    * f(x) = 1 for every x: apply an X gate on the output qubit, f(x) = 0: nothing to apply
+
+    Return
+    -----
+        qc (QuantumCircuit): representation of the constant oracle quantum circuit
+    """
+
+    qc = QuantumCircuit(n + 1, name=f"constant_{n}_{value}")
+
+    if value:
+        qc.x(n)
+
+    return qc
+
+
+def generate_balanced_oracle(n, mask=None, flips=None, seed=None):
+    """ Create a balanced oracle for any number of input qubits
+
+    Params
+    -----
+        n (int): the number of input qubits
+        mask (list): the input qubits of the parity f(x) = x_i ^ x_j ^ ..., at least one, random if None
+        flips (list): the input qubits wrapped by X gates like in the subject oracle, random if None
+        seed (int): the seed of the random choices
+
+    * Create the QuantumCircuit with n input qubits and 1 output qubit
+    * Apply an X gate on the flipped input qubits
+    * Apply a CNOT gate from each input qubit of the mask to the output qubit
+        * the parity of a non-empty set of bits is 1 for exactly half of the inputs
+    * Apply again an X gate on the flipped input qubits
+
+    Return
+    -----
+        qc (QuantumCircuit): representation of the balanced oracle quantum circuit
+    """
+
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+
+    if mask is None:
+        mask = [i for i in range(n) if rng.integers(2)] or [int(rng.integers(n))]
+    if flips is None:
+        flips = [i for i in range(n) if rng.integers(2)]
+
+    assert mask, "The mask of a balanced oracle needs at least one input qubit"
+
+    qc = QuantumCircuit(n + 1, name=f"balanced_{n}")
+
+    if flips:
+        qc.x(flips)
+
+    for i in mask:
+        qc.cx(i, n)
+
+    if flips:
+        qc.x(flips)
+
+    return qc
+
+
+@tracing.traced()
+def compile_circuit(oracle_function, draw=True):
     """ Compiles a circuit for use in the Deutsch-Jozsa algorithm
 
-    Param
+    Params
     -----
         oracle_function (QuantumCircuit): the circuit of the oracle function
+        draw (bool): save the composed circuit as a .png, disabled for the batch mode
 
     * n represent the number of input qubits
-    * The oracle has n input qubits and 1 output qubits
+    * The oracle has n input qubits and 1 output qubits, the last one
 
-    * Create a temporary circuit with 4 qubits (3 input and 1 output) and 3 classical bits (measurements)
-    * Apply an X gate to the output qubit q_3, his state is ∣1⟩
+    * Create a temporary circuit with n + 1 qubits and n classical bits (measurements)
+        * with the oracles of the subject: 4 qubits (3 input and 1 output) and 3 classical bits
+    * Apply an X gate to the output qubit q_n, his state is ∣1⟩
     * Apply Hadamard gates to all qubits, each qubits are put in equal superposition state
     * Add a barrier for visualization to separate from the beginning of the oracle
     * Take the oracle function and apply it to the current circuit
@@ -121,7 +218,7 @@ def compile_circuit(oracle_function):
     -----
         qc (QuantumCircuit): representation of the composed oracle function
     """
-    n = NB_QUBITS - 1
+    n = oracle_function.num_qubits - 1
 
     qc = QuantumCircuit(n + 1, n)
 
@@ -139,13 +236,17 @@ def compile_circuit(oracle_function):
 
     qc.measure(range(n), range(n))
 
-    qc.draw(output="mpl", filename="composed_circuit")
+    if not draw:
+        return qc
+
+    plots.circuit(qc, filename="composed_circuit")
 
     print("Composed the instructions of the oracle on a circuit to use it in the Deutsch-Jozsa algorithm", tag='info', tag_color='cyan')
 
     return qc
 
 
+@tracing.traced()
 def aer_run_oracle(oracle):
     """ Run the Oracle with an AerSimulator
 
@@ -153,12 +254,17 @@ def aer_run_oracle(oracle):
     -----
         oracle (QuantumCircuit): the circuit of the oracle function
 
-    * Get an AerSimulator, the method used is automatically selected based on the circuit and noise model
+    * Get an AerSimulator, with the stabilizer method if the circuit is Clifford
+        * the oracles made of X and CNOT gates are, DJ then runs with hundreds of input qubits
+        * otherwise the method is automatically selected based on the circuit and noise model
     * Run the composed circuit on a AerSimulator SHOTS times
-        * with the memory parameter to true in order to have the outcome of the shot as a list
+        * with the memory parameter to true in order to have the outcome of each shot
+        * the shots are packed in a BitArray, one uint8 per 8 qubits instead of a string per shot
+        * with --exact or --exact-sample, get the exact distribution instead, its most probable outcome is used
+        * with --adaptive, the shots are run by rounds until the type is decided, its most frequent outcome is used
     * Get the type of AerSimulator that was used
-    * Get the outcome of the shots
-    * Deduce the type of the oracle function
+    * Get the outcome of the shots, the first MEMORY_PRINT_MAX are printed
+    * Deduce the type of the oracle function, counted on the packed shots
     *   if one of the state is in ∣1⟩ then balanced or if they are none ∣0⟩ = constant)
     * Plot the counts result
     """
@@ -167,21 +273,40 @@ def aer_run_oracle(oracle):
 
     print("Running the circuit with an AerSimulator", tag='info', tag_color='cyan')
 
-    sim = AerSimulator(method='automatic')
+    shots = SHOTS
+
+    if exact.enabled():
+        counts, sim_type = exact.run(oracle, SHOTS)
+        measurements = sorted(counts, key=counts.get, reverse=True)
+        oracle_type, _ = classify_counts(counts, shots)
+    elif adaptive.enabled():
+        sim_type = simulation_method(oracle)
+        sim = registry.get_aer_simulator(sim_type, workload=oracle)
+        with tracing.span("simulate", backend=sim.name, shots=SHOTS, adaptive=True):
+            counts, shots = adaptive.run_simulator(sim, oracle, adaptive.zero_state_decided, SHOTS)
+        measurements = sorted(counts, key=counts.get, reverse=True)
+        oracle_type, _ = classify_counts(counts, shots)
+    else:
+        sim = registry.get_aer_simulator(simulation_method(oracle), workload=oracle)
+
+        with tracing.span("simulate", backend=sim.name, shots=SHOTS):
+            result = sim.run(oracle, shots=SHOTS, memory=True).result()
 
-    result = sim.run(oracle, shots=SHOTS, memory=True).result()
+        sim_type = result.results[0].metadata['method']
+
+        shots_bits = bits.from_aer_result(result, oracle.num_clbits)
+        measurements = bits.to_strings(shots_bits, MEMORY_PRINT_MAX)
+        counts = bits.counts(shots_bits)
+        oracle_type, _ = bits.classify(shots_bits)
 
-    sim_type = result.results[0].metadata['method']
     print("The type of AerSimulator used is ", end='')
     print(f"{sim_type}\n", color='purple')
 
-    measurements = result.get_memory()
-    counts = result.get_counts()
-
-    print("The measurements for the q_0, q_1 and q_2 are: ", tag='RESULT - AerSimulator', tag_color='red', color='white')
-    print(f"{measurements}\n", color='yellow')
+    if oracle.num_clbits <= DRAW_MAX_QUBITS:
+        print("The measurements for the input qubits are: ", tag='RESULT - AerSimulator', tag_color='red', color='white')
+        print(f"{measurements}\n", color='yellow')
 
-    if "1" in measurements[0]:
+    if oracle_type == "balanced":
         print("The function is", tag='RESULT - AerSimulator', tag_color='red', color='white', end=' ')
         print("balanced", color='yellow', end=' , ')
         print("all qubits at 1 !")
@@ -190,10 +315,14 @@ def aer_run_oracle(oracle):
         print("constant", color='yellow', end=' , ')
         print("all qubits at 0 !")
 
-    title = f"Count result with AerSimulator using method {sim_type} on {SHOTS} shots"
-    plot_histogram(counts, title=title, filename="histogram_aer", figsize=(12, 8))
+    if oracle.num_clbits > DRAW_MAX_QUBITS:
+        return
 
+    title = f"Count result with AerSimulator using method {sim_type} on {shots} shots"
+    plots.histogram(counts, title=title, filename="histogram_aer", figsize=(12, 8))
 
+
+@tracing.traced()
 def fake_run_oracle(oracle):
     """ Run the circuit with a FakeBackend simulator
 
@@ -202,44 +331,299 @@ def fake_run_oracle(oracle):
         oracle (QuantumCircuit): the circuit to run
 
     * Get the FakeBackend simulator, mimics behaviors of real systems
-    * Transpile (i.e. adapt) the circuit for the simulator obtained
+        * built once per process, its noise model is loaded from the disk cache
+    * Transpile (i.e. adapt) the circuit for the simulator obtained, reused from the cache if already done
+        * with --reduced-noise, the circuit and the noise model are reduced to the qubits used after the layout
     * Get a Primitive, here SamplerV2, for the particular backend obtained
         * https://docs.quantum.ibm.com/api/qiskit/primitives
     * Run the circuit on the simulator with a precise number of shots
+        * with --adaptive, by rounds until the type is decided
     * Get the name of the ClassicalRegister from the circuit
     * Sort the dict of the results by keys
-    * Process (print and plot) the result
+    * Process (print and plot) the result, only the classification for the large circuits
     """
 
     print("\n=============================\n", color='yellow')
 
     print("Running the circuit with a FakeBackend simulator", tag='info', tag_color='cyan')
 
-    backend = FakeSherbrooke()
+    backend = registry.get_fake_backend()
+
+    if oracle.num_qubits > max_qubits(backend):
+        print(f"The circuit has {oracle.num_qubits} qubits, {backend.name} can only run {max_qubits(backend)}", color='red')
+        return
 
-    qc_transpile = transpile(oracle, backend)
+    qc_transpile = cached_transpile(oracle, backend)
+
+    sampler = registry.get_sampler(backend)
+    if reduced_noise.enabled():
+        sampler, qc_transpile = reduced_noise.prepare(backend, qc_transpile)
 
-    sampler = Sampler(backend)
-    job = sampler.run([qc_transpile], shots=SHOTS)
-    result = job.result()[0]
     bits_name = oracle.cregs[0].name
-    counts = getattr(result.data, bits_name).get_counts()
+
+    with tracing.span("simulate", backend=backend.name, shots=SHOTS, adaptive=adaptive.enabled()):
+        if adaptive.enabled():
+            counts, shots = adaptive.run_sampler(sampler, qc_transpile, bits_name, adaptive.zero_state_decided, SHOTS)
+        else:
+            job = sampler.run([qc_transpile], shots=SHOTS)
+            result = job.result()[0]
+            counts = bits.counts(getattr(result.data, bits_name))
+            shots = SHOTS
 
     counts = dict(sorted(counts.items()))
 
-    print(f"The measurements for the q_0, q_1 and q_2 are: ", tag='RESULT - FakeBackend', tag_color='red', color='white', end='')
+    if oracle.num_clbits > DRAW_MAX_QUBITS:
+        oracle_type, zero_frequency = classify_counts(counts, shots)
+        print("The function is", tag='RESULT - FakeBackend', tag_color='red', color='white', end=' ')
+        print(oracle_type, color='yellow', end=f' (all-zero state: {zero_frequency:.3f})\n')
+        return
+
+    print(f"The measurements for the input qubits are: ", tag='RESULT - FakeBackend', tag_color='red', color='white', end='')
     print(f"{counts}\n", color='purple')
 
-    title = f"Count result with the FakeBackend simulation on {SHOTS} shots"
-    plot_histogram(counts, title=title, filename="histogram_fake", figsize=(12, 8))
+    title = f"Count result with the FakeBackend simulation on {shots} shots"
+    plots.histogram(counts, title=title, filename="histogram_fake", figsize=(12, 8))
+
+
+def load_oracles_file(path):
+    """ Load a set of oracle functions saved in a QPY file
+
+    Param
+    -----
+        path (str): path to the .qpy file containing one or several oracle circuits
+
+    * Load all the circuits stored in the file with qpy
+    * The label of each oracle is the name of its circuit
+    * The expected type can be stored in the metadata of the circuit as 'expected'
+
+    Return
+    -----
+        oracles (list): tuples (label, expected type or None, QuantumCircuit of the oracle)
+    """
+
+    from qiskit import qpy
+
+    with open(path, "rb") as fd:
+        circuits = qpy.load(fd)
+
+    return [(f"{path}:{qc.name}", (qc.metadata or {}).get("expected"), qc) for qc in circuits]
 
 
-def get_backend_computer():
+def batch_oracles(choices):
+    """ Get all the oracle functions requested for a batch run
+
+    Param
+    -----
+        choices (list): 'constant', 'balanced', 'eval', 'constant:n', 'balanced:n' or a path to a .qpy file
+
+    * The subject oracles are created without drawing them
+    * 'constant:n' and 'balanced:n' generate an oracle with n input qubits
+    * 'eval' is skipped if oracle_eval() is still a placeholder
+    * Any other choice is considered as a file of oracles to load
+
+    Return
+    -----
+        oracles (list): tuples (label, expected type or None, QuantumCircuit of the oracle)
+    """
+
+    oracles = []
+
+    for choice in choices:
+        if choice == "constant":
+            oracles.append((choice, "constant", constant_oracle_subject(draw=False)))
+        elif choice == "balanced":
+            oracles.append((choice, "balanced", balanced_oracle_subject(draw=False)))
+        elif choice == "eval":
+            oracle_function = oracle_eval()
+            if oracle_function == 0:
+                print("There is no oracle function in oracle_eval(), skipped", color='red')
+                continue
+            oracles.append((choice, None, oracle_function))
+        elif choice.startswith("constant:"):
+            oracles.append((choice, "constant", generate_constant_oracle(int(choice.split(":")[1]))))
+        elif choice.startswith("balanced:"):
+            oracles.append((choice, "balanced", generate_balanced_oracle(int(choice.split(":")[1]))))
+        else:
+            oracles.extend(load_oracles_file(choice))
+
+    return oracles
+
+
+def classify_counts(counts, shots):
+    """ Deduce the type of the oracle function from the counts of a run
+
+    Params
+    -----
+        counts (dict): the occurences of each measured state
+        shots (int): the number of shots of the run
+
+    * The function is constant if the all-zero state is the majority of the shots
+        * with a noiseless simulation it is either all the shots or none of them
+    * Otherwise the function is balanced
+
+    Return
+    -----
+        (str, float): the type of the function and the frequency of the all-zero state
+    """
+
+    n = len(next(iter(counts)))
+    zero_frequency = counts.get("0" * n, 0) / shots
+
+    return ("constant" if zero_frequency >= 0.5 else "balanced"), zero_frequency
+
+
+def batch_prepare(oracles, circuits, backend, backend_name):
+    """ Prepare all the oracles to be run in a single submission to a backend
+
+    Params
+    -----
+        oracles (list): tuples (label, expected type or None, QuantumCircuit of the oracle)
+        circuits (list): the Deutsch-Jozsa circuit of each oracle, compiled once for all the backends
+        backend (AerSimulator, FakeBackend or IBMBackend): the backend to run the circuits on
+        backend_name (str): name used when printing the results
+
+    * Skip the oracles with more qubits than the backend
+
+    Return
+    -----
+        (list, list): the oracles kept and their compiled circuits
+    """
+
+    kept = []
+
+    for (label, expected, oracle), circuit in zip(oracles, circuits):
+        if oracle.num_qubits > max_qubits(backend):
+            print(f"{label} has {oracle.num_qubits} qubits, {backend_name} can only run {max_qubits(backend)}: skipped", color='red')
+        else:
+            kept.append(((label, expected, oracle), circuit))
+
+    print(f"Running {len(kept)} oracles in one job with {backend_name}", tag='info', tag_color='cyan')
+
+    return [item for item, _ in kept], [circuit for _, circuit in kept]
+
+
+def batch_report(oracles, all_outcomes, backend_name):
+    """ Classify the outcomes of each oracle and compare it with the expected type if it is known
+
+    Params
+    -----
+        oracles (list): tuples (label, expected type or None, QuantumCircuit of the oracle)
+        all_outcomes (list): the packed shots (BitArray) or the counts of each oracle, in the same order
+        backend_name (str): name used when printing the results
+
+    Return
+    -----
+        mismatch (int): the number of oracles whose classification differ from the expected one
+    """
+
+    print("\n=============================\n", color='yellow')
+
+    mismatch = 0
+
+    for (label, expected, _), outcomes in zip(oracles, all_outcomes):
+        if isinstance(outcomes, dict):
+            oracle_type, zero_frequency = classify_counts(outcomes, SHOTS)
+        else:
+            oracle_type, zero_frequency = bits.classify(outcomes)
+
+        print(f"{label}: ", tag=f'RESULT - {backend_name}', tag_color='red', color='white', end='')
+        print(oracle_type, color='yellow', end=f' (all-zero state: {zero_frequency:.3f})')
+
+        if expected is None:
+            print("")
+        elif expected == oracle_type:
+            print(" as expected", color='green')
+        else:
+            print(f" expected {expected}", color='red')
+            mismatch += 1
+
+    return mismatch
+
+
+@tracing.traced()
+def batch_main(choices, real=False):
+    """ Batch mode: classify many oracles without drawing or prompting
+
+    Params
+    -----
+        choices (list): 'constant', 'balanced', 'eval', 'constant:n', 'balanced:n' or paths to .qpy files
+        real (bool): also run them on a real quantum computer, without prompt
+
+    * Get all the oracles requested
+    * Compile every oracle for the Deutsch-Jozsa algorithm once (without drawing),
+        * the same circuits select the real backend and are run on every backend
+    * Prepare them for an AerSimulator, a FakeBackend simulator and the real quantum computer
+        * the AerSimulator uses the stabilizer method if all the oracles are Clifford
+        * and the execution profile of a batch: one oracle per core, see common/aer_profiles.py
+        * with --exact or --exact-sample the exact distributions replace the AerSimulator run
+    * Transpile the circuits for each backend, the ones already in the cache are reused
+    * Submit one job per backend with all the circuits as a list of PUBs, the jobs are in flight at the same time
+        * each job is reported as soon as it is done, the simulations do not wait for the queue of the real one
+    * Exit with an error code if one of the classification is not the expected one
+    """
+
+    oracles = batch_oracles(choices)
+
+    if not oracles:
+        print("No oracle function to run", color='red')
+        return
+
+    workload = [oracle for _, _, oracle in oracles]
+    compiled = [compile_circuit(oracle, draw=False) for oracle in workload]
+
+    if all(simulation_method(oracle) == "stabilizer" for oracle in workload):
+        sim = registry.get_aer_simulator("stabilizer", workload=workload)
+    else:
+        sim = registry.get_aer_simulator(workload=workload)
+
+    backends = [("AerSimulator", sim), ("FakeBackend", registry.get_fake_backend())]
+    if real:
+        backends.append(("Real", get_backend_computer(compiled)))
+
+    mismatch = 0
+    prepared = {}
+    submissions = []
+
+    for backend_name, backend in backends:
+        kept, circuits = batch_prepare(oracles, compiled, backend, backend_name)
+
+        if backend_name == "AerSimulator" and exact.enabled():
+            mismatch += batch_report(kept, [exact.run(circuit, SHOTS)[0] for circuit in circuits], backend_name)
+            continue
+
+        isa_circuits = cached_transpile(circuits, backend)
+        sampler = registry.get_sampler(backend)
+        if backend_name == "FakeBackend" and reduced_noise.enabled():
+            sampler, isa_circuits = reduced_noise.prepare(backend, isa_circuits)
+
+        prepared[backend_name] = (kept, circuits)
+        submissions.append((backend_name, partial(sampler.run, isa_circuits, shots=SHOTS)))
+
+    def on_result(backend_name, job, results):
+        nonlocal mismatch
+        kept, circuits = prepared[backend_name]
+        all_shots = [getattr(result.data, circuit.cregs[0].name) for circuit, result in zip(circuits, results)]
+        mismatch += batch_report(kept, all_shots, backend_name)
+
+    jobs.run_all(submissions, on_result)
+
+    if mismatch:
+        sys.exit(f"{RED}{mismatch} oracle(s) were not classified as expected{RESET}")
+
+
+@tracing.traced()
+def get_backend_computer(circuits):
     """ Get a Service Backend to run the circuit on
 
+    Param
+    -----
+        circuits (QuantumCircuit or list): the circuits that will be run, the choice depends on their duration
+
+    * With FTL_QUANTUM_LOCAL_QUEUE, use the local stand-in of the service, no account is needed
     * Try to get a service instance, need to have the IBMQ account loaded
-    * If not loaded, call load_account()
-    * Get the least busy and operational backend quantum computer
+    * If no account is saved, call load_account(), the other errors are raised
+    * Get the operational quantum computer with the smallest estimated time to result,
+        * from its pending jobs, the runtime of our previous jobs and the duration of the transpiled circuits
 
     Return
     -----
@@ -248,16 +632,23 @@ def get_backend_computer():
 
     print("=============================\n", color='yellow')
 
-    try:
-        service = QiskitRuntimeService(instance="ibm-q/open/main")
-        print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
-    except Exception:
-        print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
-        load_account()
-        service = QiskitRuntimeService(instance="ibm-q/open/main")
-
-    print("Get the least busy and operational quantum computer ...")
-    backend = service.least_busy(operational=True, simulator=False)
+    if local_service.enabled():
+        service = local_service.get_service()
+        print("Using the local stand-in of the service\n", tag='info', tag_color='cyan', color='white')
+    else:
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        from qiskit_ibm_runtime.accounts import AccountNotFoundError
+
+        try:
+            service = QiskitRuntimeService(instance="ibm-q/open/main")
+            print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
+        except AccountNotFoundError:
+            print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
+            load_account()
+            service = QiskitRuntimeService(instance="ibm-q/open/main")
+
+    print("Get the operational quantum computer with the soonest result ...")
+    backend = backend_selector.select_backend(service, circuits, SHOTS)
     backend_status = backend.status()
     print("This will run on ", end='')
     print(backend.name, color='cyan', end=' (')
@@ -267,6 +658,7 @@ def get_backend_computer():
     return backend
 
 
+@tracing.traced()
 def real_run_oracle(oracle_function):
     """ Run the oracle on a real quantum hardware
 
@@ -275,13 +667,15 @@ def real_run_oracle(oracle_function):
         oracle_function (QuantumCircuit): the circuit of the oracle function
 
     * Optimize the circuit created for the particular backend obtained
-    * Convert to an Instruction Set Architecture (ISA) circuit
+    * Convert to an Instruction Set Architecture (ISA) circuit, reused from the cache if already done
         * ISA = the set of instructions the device can understand and execute
     * Draw the circuit after being converted, saved as 'circuit_optimized'
     * Get a Primitive, here SamplerV2, for the particular backend obtained
         * https://docs.quantum.ibm.com/api/qiskit/primitives
     * Run the circuit using the Primitive instantiated with the backend shots times
         * Here 'isa_circuit' is considered a Primitive Unified Bloc (PUB)
+        * with --adaptive, one job per round until the type is decided: fewer shots paid on the hardware
+    * Wait for the job, its status is polled with a growing delay instead of blocking in job.result()
     * Get the result of the first PUB, this gives a PubResult object
     * In the PubResult, get the data attribute, inside it there are the classical bits
         * The way I instantiate the QuantumCircuit, the ClassicalRegister get the name 'c'
@@ -294,55 +688,78 @@ def real_run_oracle(oracle_function):
 
     print("Running the circuit on a real quantum computer ...", tag='info', tag_color='cyan')
 
-    bck = get_backend_computer()
+    bck = get_backend_computer(oracle_function)
 
-    pm = generate_preset_pass_manager(backend=bck, optimization_level=1)
-    isa_circuit = pm.run(oracle_function)
+    isa_circuit = cached_transpile(oracle_function, bck, optimization_level=1)
 
-    isa_circuit.draw('mpl', idle_wires=False, filename="circuit_optimized_for_back")
+    plots.circuit(isa_circuit, idle_wires=False, filename="circuit_optimized_for_back")
 
-    sampler = Sampler(bck)
+    sampler = registry.get_sampler(bck)
 
-    job = sampler.run([isa_circuit], shots=SHOTS)
+    classical_bits_name = oracle_function.cregs[0].name
 
-    job_id = job.job_id()
+    if adaptive.enabled():
+        counts, shots = adaptive.run_sampler(sampler, isa_circuit, classical_bits_name, adaptive.zero_state_decided, SHOTS)
+        job_id = "adaptive"
+    else:
+        job = sampler.run([isa_circuit], shots=SHOTS)
 
-    print(f"Job ID: {job_id}\n")
-    print(f"Job Status: {job.status()}\n")
+        job_id = job.job_id()
 
-    result = job.result()[0]
+        print(f"Job ID: {job_id}\n")
+        print(f"Job Status: {job.status()}\n")
 
-    classical_bits_name = oracle_function.cregs[0].name
+        result = jobs.result(job)[0]
 
-    counts = getattr(result.data, classical_bits_name).get_counts()
+        counts = bits.counts(getattr(result.data, classical_bits_name))
+        shots = SHOTS
 
     counts = dict(sorted(counts.items()))
 
-    print(f"on {SHOTS}, the qubits are at: ", tag='RESULT - Real', tag_color='red', color='white', end='')
+    print(f"on {shots}, the qubits are at: ", tag='RESULT - Real', tag_color='red', color='white', end='')
     print(f"{counts}\n", color='purple')
 
     title = f"Count result of {job_id} runned on {bck.name} real quantum computer"
-    plot_histogram(counts, title=title, filename=f"histogram_real_counts_{job_id}", figsize=(12, 8))
+    plots.histogram(counts, title=title, filename=f"histogram_real_counts_{job_id}", figsize=(12, 8))
 
 
 def main():
     """ main function to build the circuit for the oracle
 
     * Assert the arguments, need 1: 'constant', 'balanced' or 'eval'
+        * 'constant' and 'balanced' can be followed by a number of input qubits to generate the oracle
+        * or 'batch' followed by the oracles to run: 'constant', 'balanced', 'eval', 'constant:n', 'balanced:n' or .qpy files
+            * and optionally '--real' to also run them on a real quantum computer
     * Get the oracle function depending on the choice
     * Compile the oracle function to use it in the algorithm
     * Run the circuit on a simulator
-    * Gives the choice to run the circuit on a real computer
+    * Gives the choice to run the circuit on a real computer, answered by '--real' or '--no-real' if given
+        * without a terminal and without these flags, it is not run
     """
 
-    assert len(sys.argv) == 2, f"{RED}Expect one argument: 'constant', 'balanced' or 'eval' if it's implemented{RESET}"
+    real_answer = pop_answer("--real")
+
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        assert len(sys.argv) > 2, f"{RED}Expect the oracles to run: 'constant', 'balanced', 'eval' or .qpy files{RESET}"
+        batch_main(sys.argv[2:], bool(real_answer))
+        return
+
+    assert len(sys.argv) == 2 or (len(sys.argv) == 3 and sys.argv[2].isdigit() and int(sys.argv[2]) >= 1), \
+            f"{RED}Expect one argument: 'constant', 'balanced' or 'eval' if it's implemented, and optionally a number of input qubits{RESET}"
 
     assert sys.argv[1] == "constant" or sys.argv[1] == "balanced" or sys.argv[1] == "eval", \
             f"{RED}Expect a valid argument: 'constant', 'balanced' or 'eval' if it's implemented{RESET}"
 
     choice = sys.argv[1]
 
-    if choice == "constant":
+    if len(sys.argv) == 3 and choice != "eval":
+        n = int(sys.argv[2])
+        if choice == "constant":
+            oracle_function = generate_constant_oracle(n)
+        else:
+            oracle_function = generate_balanced_oracle(n)
+        print(f"Generated a {choice} oracle function with {n} input qubits\n", color='green', tag='info', tag_color='cyan')
+    elif choice == "constant":
         oracle_function = constant_oracle_subject()
     elif choice == "balanced":
         oracle_function = balanced_oracle_subject()
@@ -351,23 +768,25 @@ def main():
         if oracle_function == 0:
             print("There is no oracle function in oracle_eval()", color='red')
             return
-        oracle_function.draw(output="mpl", filename="correction_oracle_function")
+        plots.circuit(oracle_function, filename="correction_oracle_function")
         print("Created the oracle from the correction\n", color='green', tag='info', tag_color='cyan')
 
-    circuit_compiled = compile_circuit(oracle_function)
+    circuit_compiled = compile_circuit(oracle_function, draw=oracle_function.num_qubits <= DRAW_MAX_QUBITS)
 
     aer_run_oracle(circuit_compiled)
 
     fake_run_oracle(circuit_compiled)
 
-    print("Do you want to run this circuit on a real quantum computer ? (y or n)", color='cyan', tag='prompt', end=': ')
-    real_run = input()
-
-    if real_run == "y":
+    if confirm("Do you want to run this circuit on a real quantum computer ?", real_answer):
         real_run_oracle(circuit_compiled)
     else:
         print("\nFine, this is the end of this run of the Deutsch-Jozsa algorithm\n")
 
 
 if __name__ == "__main__":
+    plots.configure_from_argv()
+    exact.configure_from_argv()
+    reduced_noise.configure_from_argv()
+    adaptive.configure_from_argv()
     main()
+    plots.wait()
@@ -0,0 +1,332 @@
+import ast
+import math
+from print_color import print
+
+from qiskit import QuantumCircuit, AncillaRegister
+
+
+def merge_cubes(marked):
+    """ Merge the marked states into a disjoint set of cubes
+
+    Param
+    -----
+        marked (list): the marked states as bitstrings, q_0 is the rightmost bit
+
+    * A cube is a bitstring where '-' means any value for this qubit
+    * Two cubes with the same '-' positions that differ on one bit cover exactly their union:
+        * '101' and '111' become '1-1', the phase of both states is flipped by one gate on q_0 and q_2
+    * Like Quine-McCluskey, the cubes are grouped by their number of '1' and merged one generation per pass:
+        * the neighbour of a cube differs on one bit, it is in the next group, found by flipping each '0' of the cube
+        * a pass merges the cubes with k '-' into cubes with k + 1 '-', the ones left alone are final
+    * Each cube is merged at most once per pass, the cubes stay disjoint
+        * each state is marked exactly once, a phase flipped twice would be unmarked
+
+    Return
+    -----
+        cubes (list): the disjoint cubes covering exactly the marked states
+    """
+
+    cubes = set(marked)
+    final = []
+
+    while cubes:
+        groups = {}
+        for cube in cubes:
+            groups.setdefault(cube.count("1"), set()).add(cube)
+
+        used = set()
+        merged = set()
+
+        for ones in sorted(groups):
+            upper = groups.get(ones + 1, set())
+            for cube in sorted(groups[ones]):
+                if cube in used:
+                    continue
+                for position, bit in enumerate(cube):
+                    if bit != "0":
+                        continue
+                    neighbour = cube[:position] + "1" + cube[position + 1:]
+                    if neighbour in upper and neighbour not in used:
+                        used |= {cube, neighbour}
+                        merged.add(cube[:position] + "-" + cube[position + 1:])
+                        break
+
+        final.extend(cubes - used)
+        cubes = merged
+
+    return sorted(final)
+
+
+def order_cubes(cubes):
+    """ Order the cubes so that consecutive ones share their X gates
+
+    * The X gates around a multi-controlled Z select the qubits at 0 of the cube
+    * Between two cubes only the qubits whose value changes need an X gate
+    * Greedy nearest neighbour: always go to the cube with the fewest X gates to apply
+    """
+
+    def cost(current, cube):
+        return sum(1 for a, b in zip(current, cube) if b != "-" and (a == "0") != (b == "0"))
+
+    remaining = list(cubes)
+    ordered = []
+    current = "1" * len(cubes[0]) if cubes else ""
+
+    while remaining:
+        cube = min(remaining, key=lambda candidate: cost(current, candidate))
+        remaining.remove(cube)
+        ordered.append(cube)
+        current = "".join(b if b != "-" else a for a, b in zip(current, cube))
+
+    return ordered
+
+
+def _multi_controlled_z(qc, qubits, ancillas):
+    """ Flip the phase of the state where all the qubits are at ∣1⟩
+
+    * 1 qubit: Z gate, 2 qubits: CZ gate
+    * More: an Hadamard gate and a multi-controlled X gate on the last qubit, like the subject oracle
+        * with ancillas the v-chain decomposition is used, it needs len(controls) - 2 clean ancillas
+    """
+
+    if len(qubits) == 1:
+        qc.z(qubits[0])
+    elif len(qubits) == 2:
+        qc.cz(qubits[0], qubits[1])
+    else:
+        controls, target = qubits[:-1], qubits[-1]
+        qc.h(target)
+        if ancillas is not None and len(controls) > 2:
+            qc.mcx(controls, target, ancillas[:len(controls) - 2], mode="v-chain")
+        else:
+            qc.mcx(controls, target)
+        qc.h(target)
+
+
+def compile_marked_states(n, marked, use_ancillas=False):
+    """ Compile a phase oracle that marks a list of states
+
+    Params
+    -----
+        n (int): the number of qubits
+        marked (list): the marked states as bitstrings, q_0 is the rightmost bit
+        use_ancillas (bool): add clean ancilla qubits for the v-chain decomposition of the multi-controlled gates
+
+    * Merge the marked states in disjoint cubes: fewer gates with fewer controls
+    * Order the cubes so the X gates are shared between consecutive cubes
+    * For each cube apply the X gates that changed, then a multi-controlled Z on its fixed qubits
+    * Undo the X gates still applied at the end
+    * If every state is marked the oracle is a global phase of -1
+    * The number of phase flips, one per cube, is stored in the metadata of the circuit as 'phase_flips'
+        * counting the gates after would miss some: the mcx with 2 controls is a ccx
+
+    Return
+    -----
+        qc (QuantumCircuit): the oracle, the ancillas are the last qubits
+    """
+
+    for state in marked:
+        assert len(state) == n and set(state) <= {"0", "1"}, f"Invalid marked state for {n} qubits: {state}"
+
+    cubes = order_cubes(merge_cubes(marked))
+    widest = max((n - cube.count("-") for cube in cubes), default=0)
+
+    qc = QuantumCircuit(n, name="oracle", metadata={"phase_flips": len(cubes)})
+    ancillas = None
+
+    if use_ancillas and widest > 3:
+        ancillas = AncillaRegister(widest - 3, name="anc")
+        qc.add_register(ancillas)
+
+    flipped = set()
+
+    for cube in cubes:
+        fixed = [qubit for qubit in range(n) if cube[n - 1 - qubit] != "-"]
+        if not fixed:
+            qc.global_phase += math.pi
+            continue
+
+        zeros = {qubit for qubit in fixed if cube[n - 1 - qubit] == "0"}
+        toggles = sorted(qubit for qubit in fixed if (qubit in zeros) != (qubit in flipped))
+        if toggles:
+            qc.x(toggles)
+        flipped ^= set(toggles)
+
+        _multi_controlled_z(qc, fixed, ancillas)
+
+    if flipped:
+        qc.x(sorted(flipped))
+
+    return qc
+
+
+class _ExpressionEvaluator(ast.NodeVisitor):
+    """ Evaluate a boolean expression on numpy arrays holding every assignment of the variables """
+
+    def __init__(self, variables):
+        self.variables = variables
+
+    def visit_Expression(self, node):
+        return self.visit(node.body)
+
+    def visit_Name(self, node):
+        if node.id not in self.variables:
+            raise ValueError(f"Unknown variable '{node.id}', expected x0 to x{len(self.variables) - 1}")
+        return self.variables[node.id]
+
+    def visit_Constant(self, node):
+        if node.value not in (0, 1, True, False):
+            raise ValueError(f"Invalid constant {node.value!r}")
+        return bool(node.value)
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, (ast.Invert, ast.Not)):
+            return ~self.visit(node.operand)
+        raise ValueError(f"Invalid operator {type(node.op).__name__}")
+
+    def visit_BinOp(self, node):
+        left, right = self.visit(node.left), self.visit(node.right)
+        if isinstance(node.op, ast.BitAnd):
+            return left & right
+        if isinstance(node.op, ast.BitOr):
+            return left | right
+        if isinstance(node.op, ast.BitXor):
+            return left ^ right
+        raise ValueError(f"Invalid operator {type(node.op).__name__}")
+
+    def visit_BoolOp(self, node):
+        values = [self.visit(value) for value in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = (result & value) if isinstance(node.op, ast.And) else (result | value)
+        return result
+
+    def generic_visit(self, node):
+        raise ValueError(f"Invalid syntax in the expression: {type(node).__name__}")
+
+
+def _assignments(n):
+    """ One boolean array per qubit: the value of q_i for each of the 2^n states """
+
+    import numpy as np
+
+    states = np.arange(2 ** n, dtype=np.uint64)
+
+    return [((states >> np.uint64(qubit)) & np.uint64(1)).astype(bool) for qubit in range(n)]
+
+
+def _satisfying_states(n, truth):
+    """ Bitstrings of the states where the truth table is True """
+
+    import numpy as np
+
+    return [format(int(index), f"0{n}b") for index in np.flatnonzero(truth)]
+
+
+def marked_from_expression(expression, n):
+    """ Marked states of a boolean expression
+
+    Params
+    -----
+        expression (str): e.g. '(x0 & ~x1) | (x2 ^ x3)', also 'and', 'or', 'not', x_i is the qubit q_i
+        n (int): the number of qubits
+
+    * Parse the expression, only boolean operators and the variables x0 to x{n-1} are allowed
+    * Evaluate it at once on the 2^n assignments with numpy
+
+    Return
+    -----
+        marked (list): the states where the expression is true
+    """
+
+    import numpy as np
+
+    variables = {f"x{qubit}": values for qubit, values in enumerate(_assignments(n))}
+    truth = _ExpressionEvaluator(variables).visit(ast.parse(expression, mode="eval"))
+
+    return _satisfying_states(n, np.broadcast_to(truth, (2 ** n,)))
+
+
+def marked_from_dimacs(text):
+    """ Marked states of a CNF formula in the DIMACS format
+
+    Param
+    -----
+        text (str): the content of the file: 'p cnf <variables> <clauses>' then clauses ending with 0
+            * the variable i is the qubit q_(i-1), -i is its negation
+
+    * Evaluate every clause on the 2^n assignments with numpy, the formula is their conjunction
+
+    Return
+    -----
+        (int, list): the number of qubits and the states that satisfy the formula
+    """
+
+    import numpy as np
+
+    n = None
+    literals = []
+    clauses = []
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("c") or line.startswith("%"):
+            continue
+        if line.startswith("p"):
+            n = int(line.split()[2])
+            continue
+        for literal in map(int, line.split()):
+            if literal == 0:
+                clauses.append(literals)
+                literals = []
+            else:
+                literals.append(literal)
+
+    if literals:
+        clauses.append(literals)
+
+    assert n is not None, "Missing 'p cnf <variables> <clauses>' line in the DIMACS file"
+
+    values = _assignments(n)
+    truth = np.ones(2 ** n, dtype=bool)
+
+    for clause in clauses:
+        satisfied = np.zeros(2 ** n, dtype=bool)
+        for literal in clause:
+            satisfied |= values[literal - 1] if literal > 0 else ~values[-literal - 1]
+        truth &= satisfied
+
+    return n, _satisfying_states(n, truth)
+
+
+def oracle_report(oracle, marked_nb):
+    """ Print the size of the oracle once decomposed in single-qubit gates and CNOTs
+
+    Params
+    -----
+        oracle (QuantumCircuit): the compiled oracle
+        marked_nb (int): the number of marked states
+
+    * The phase flips are the ones counted by compile_marked_states() in the metadata of the oracle
+    * Transpile the oracle to the basis ['u', 'cx'], the depth on hardware is bounded by it
+
+    Return
+    -----
+        (dict): number of multi-controlled Z, depth and number of two-qubit gates
+    """
+
+    from qiskit import transpile
+
+    decomposed = transpile(oracle, basis_gates=["u", "cx"], optimization_level=1)
+
+    report = {
+        "marked": marked_nb,
+        "phase_flips": (oracle.metadata or {}).get("phase_flips"),
+        "depth": decomposed.depth(),
+        "two_qubit_gates": decomposed.num_nonlocal_gates(),
+    }
+
+    print(f"{report['marked']} marked state(s) with {report['phase_flips']} phase flip(s), ", tag='oracle', tag_color='cyan', color='white', end='')
+    print(f"depth {report['depth']}, {report['two_qubit_gates']} two-qubit gates", color='purple')
+
+    return report
@@ -1,16 +1,14 @@
 import os
 import sys
-from dotenv import load_dotenv
+import math
 from print_color import print
 
 from qiskit import QuantumCircuit
-from qiskit_aer import AerSimulator
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
-from qiskit.circuit.library import GroverOperator, MCMT, ZGate
-from qiskit.visualization import plot_distribution, plot_histogram
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
-from qiskit_ibm_runtime.fake_provider import FakeSherbrooke
-from qiskit import transpile
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import adaptive, backend_selector, exact, grover, jobs, local_service, plots, reduced_noise, registry, simulation, tracing
+from common.cli import confirm, pop_answer, pop_flag, pop_option
+from common.transpile_cache import cached_transpile
 
 
 RESET = '\033[0m'
@@ -28,6 +26,9 @@ def load_account():
     * 'overwrite' to 'True' so that the existing account is overwritten
     """
 
+    from dotenv import load_dotenv
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
     load_dotenv()
     token = os.getenv("TOKEN")
 
@@ -35,12 +36,19 @@ def load_account():
     print("Account loaded !\n", tag='success', tag_color='green', color='white')
 
 
-def get_backend_computer():
+@tracing.traced()
+def get_backend_computer(circuits):
     """ Get a Service Backend to run the circuit on
 
+    Param
+    -----
+        circuits (QuantumCircuit or list): the circuits that will be run, the choice depends on their duration
+
+    * With FTL_QUANTUM_LOCAL_QUEUE, use the local stand-in of the service, no account is needed
     * Try to get a service instance, need to have the IBMQ account loaded
-    * If not loaded, call load_account()
-    * Get the least busy and operational backend quantum computer
+    * If no account is saved, call load_account(), the other errors are raised
+    * Get the operational quantum computer with the smallest estimated time to result,
+        * from its pending jobs, the runtime of our previous jobs and the duration of the transpiled circuits
 
     Return
     -----
@@ -49,16 +57,23 @@ def get_backend_computer():
 
     print("=============================\n", color='yellow')
 
-    try:
-        service = QiskitRuntimeService(instance="ibm-q/open/main")
-        print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
-    except Exception:
-        print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
-        load_account()
-        service = QiskitRuntimeService(instance="ibm-q/open/main")
-
-    print("Get the least busy and operational quantum computer ...")
-    backend = service.least_busy(operational=True, simulator=False)
+    if local_service.enabled():
+        service = local_service.get_service()
+        print("Using the local stand-in of the service\n", tag='info', tag_color='cyan', color='white')
+    else:
+        from qiskit_ibm_runtime import QiskitRuntimeService
+        from qiskit_ibm_runtime.accounts import AccountNotFoundError
+
+        try:
+            service = QiskitRuntimeService(instance="ibm-q/open/main")
+            print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
+        except AccountNotFoundError:
+            print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
+            load_account()
+            service = QiskitRuntimeService(instance="ibm-q/open/main")
+
+    print("Get the operational quantum computer with the soonest result ...")
+    backend = backend_selector.select_backend(service, circuits, SHOTS)
     backend_status = backend.status()
     print("This will run on ", end='')
     print(backend.name, color='cyan', end=' (')
@@ -68,6 +83,7 @@ def get_backend_computer():
     return backend
 
 
+@tracing.traced()
 def state_initialisation(n):
     """ Create a circuit and initialize all qubits to a superposition state
 
@@ -92,7 +108,7 @@ def state_initialisation(n):
 
     qc.barrier()
 
-    qc.draw(output="mpl", filename=f"state_initialisation_circuit_{n}")
+    plots.circuit(qc, filename=f"state_initialisation_circuit_{n}")
 
     return qc
 
@@ -120,7 +136,7 @@ def oracle_example():
 
     qc.h(2)
 
-    qc.draw(output="mpl", filename="oracle_circuit_subject")
+    plots.circuit(qc, filename="oracle_circuit_subject")
 
     return qc
 
@@ -130,6 +146,8 @@ def oracle_creation():
 
     The oracle commented is one given in IBM Learning that marks two states as solution in a 3-qubit system
     """
+    # from qiskit.circuit.library import MCMT, ZGate
+
     # oracle = QuantumCircuit(3)
 
     # oracle.x(2)
@@ -142,23 +160,197 @@ def oracle_creation():
 
     # oracle.x([0, 1])
 
-    # oracle.draw(output="mpl", filename="oracle_two_solution")
+    # plots.circuit(oracle, filename="oracle_two_solution")
 
     # return oracle
     return 0
 
 
-def diffuser(qc, oracle):
+@tracing.traced()
+def oracle_compiled(n, marked=None, expression=None, cnf=None, use_ancillas=False):
+    """ Compile an oracle from the options of the script
+
+    Params
+    -----
+        n (int): the number of qubits
+        marked (str): the marked states separated by commas, e.g. '0101,1110'
+        expression (str): a boolean expression on x0 to x{n-1}, e.g. '(x0 & ~x1) | x3'
+        cnf (str): the path of a DIMACS CNF file, its number of variables gives the number of qubits
+        use_ancillas (bool): use ancilla qubits to decompose the multi-controlled gates
+
+    * Get the marked states from the option given
+    * Compile them with oracle_compiler: shared controls, fewer X gates
+    * Print its depth and number of two-qubit gates, and draw it
+
+    Return
+    -----
+        oracle (QuantumCircuit): the circuit of the oracle, 0 if no option was given
+    """
+
+    import oracle_compiler
+
+    if cnf is not None:
+        with open(cnf) as fd:
+            n, states = oracle_compiler.marked_from_dimacs(fd.read())
+    elif expression is not None:
+        states = oracle_compiler.marked_from_expression(expression, n)
+    elif marked is not None:
+        states = [state.strip() for state in marked.split(",") if state.strip()]
+    else:
+        return 0
+
+    oracle = oracle_compiler.compile_marked_states(n, states, use_ancillas)
+    oracle_compiler.oracle_report(oracle, len(states))
+
+    plots.circuit(oracle, filename="oracle_compiled")
+
+    return oracle
+
+
+def oracle_marked_state(n, marked):
+    """ Oracle that marks a single state, for any number of qubits
+
+    Params
+    -----
+        n (int): the number of qubits
+        marked (str): the marked state, q_0 is the rightmost bit like in the counts
+
+    * Apply an X gate on the qubits at 0 in the marked state, the marked state becomes ∣1...1⟩
+    * Apply a multi-controlled Z gate: an Hadamard gate and a multi-controlled X gate on the last qubit
+        * same construction as the oracle of the subject, with n - 1 controls
+    * Apply again the X gates
+
+    Return
+    -----
+        qc (QuantumCircuit): the circuit of the oracle
+    """
+
+    qc = QuantumCircuit(n)
+
+    zeros = [qubit for qubit in range(n) if marked[n - 1 - qubit] == "0"]
+
+    if zeros:
+        qc.x(zeros)
+
+    qc.h(n - 1)
+    qc.mcx(list(range(n - 1)), n - 1)
+    qc.h(n - 1)
+
+    if zeros:
+        qc.x(zeros)
+
+    return qc
+
+
+def estimate_marked_states(oracle):
+    """ Find the states marked by a phase oracle
+
+    Param
+    -----
+        oracle (QuantumCircuit): the circuit of the oracle
+
+    * Apply the oracle on the uniform superposition and get the statevector
+    * The oracle flips the phase of the marked states: their amplitude is negative
+        * the statevector has 2^n amplitudes, only affordable for the sizes that are simulated anyway
+        * the ancillas of the oracle are the last qubits, they are back at ∣0⟩: only the first 2^n amplitudes are read
+
+    Return
+    -----
+        marked_states (list): the marked states as bitstrings, q_0 is the rightmost bit
+    """
+
+    from qiskit.quantum_info import Statevector
+
+    n = oracle.num_qubits - oracle.num_ancillas
+
+    superposition = QuantumCircuit(oracle.num_qubits)
+    superposition.h(range(n))
+    superposition.compose(oracle, inplace=True)
+
+    amplitudes = Statevector(superposition).data[:2 ** n]
+
+    return [format(index, f"0{n}b") for index, amplitude in enumerate(amplitudes) if amplitude.real < 0]
+
+
+def optimal_iterations(n, marked_nb):
+    """ Number of Grover iterations that maximizes the success probability
+
+    Params
+    -----
+        n (int): the number of qubits, N = 2^n states
+        marked_nb (int): the number of marked states M
+
+    * floor(π/4 · √(N/M)), at least one iteration
+
+    Return
+    -----
+        iterations (int): the number of applications of the Grover operator
+    """
+
+    return max(1, math.floor(math.pi / 4 * math.sqrt(2 ** n / marked_nb)))
+
+
+def success_probability(n, marked_nb, iterations):
+    """ Theoretical probability to measure a marked state
+
+    Params
+    -----
+        n (int): the number of qubits, N = 2^n states
+        marked_nb (int): the number of marked states M
+        iterations (int): the number of applications of the Grover operator k
+
+    * θ = arcsin(√(M/N)), each iteration rotates the state by 2θ
+    * P = sin²((2k + 1)θ)
+
+    Return
+    -----
+        (float): the probability
+    """
+
+    theta = math.asin(math.sqrt(marked_nb / 2 ** n))
+
+    return math.sin((2 * iterations + 1) * theta) ** 2
+
+
+def report_success(counts, shots, marked_states, theoretical, tag):
+    """ Print the observed success probability next to the theoretical one
+
+    Params
+    -----
+        counts (dict): the occurences of each measured state
+        shots (int): the number of shots of the run
+        marked_states (list): the marked states, nothing is printed if None
+        theoretical (float): the theoretical success probability
+        tag (str): the tag of the print
+    """
+
+    if marked_states is None:
+        return
+
+    observed = sum(counts.get(state, 0) for state in marked_states) / shots
+
+    print("Success probability: observed ", tag=tag, tag_color='red', color='white', end='')
+    print(f"{observed:.3f}", color='purple', end=', theoretical ')
+    print(f"{theoretical:.3f}\n", color='purple')
+
+
+@tracing.traced()
+def diffuser(qc, oracle, iterations=1):
     """ Create the amplification with the Oracle and combine it with the initialisation state circuit
 
     Params
     -----
         qc (QuantumCircuit): the circuit with all qubits set to superposition
         oracle (QuantumCircuit): the circuit of the oracle
+        iterations (int): the number of applications of the Grover operator
 
     * Use GroverOperator to get a circuit composed of the oracle and a circuit that amplifies the states
+        * it is built once per oracle and number of qubits, see common/grover.py
+    * Raise it to the number of iterations: one gate Q per iteration,
+        * the runs replace them by a decomposition synthesized once for their backend (grover.expand())
     * Compose i.e. merge the initialisation circuit with the oracle + amplification
-    * Add measurement tools on all qubits of the circuit
+        * if the oracle has ancillas they are added to the circuit, the amplification is only on the searched qubits
+    * Add measurement tools on all qubits of the circuit, except the ancillas
     * Draw the resulting composed circuit
 
     Return
@@ -166,27 +358,48 @@ def diffuser(qc, oracle):
         qc (QuantumCircuit): the composed circuit
     """
 
-    grover_op = GroverOperator(oracle, insert_barriers=True)
-    grover_op.decompose().draw(output="mpl", filename="grover_operator_decompose")
+    from qiskit import AncillaRegister, ClassicalRegister
+
+    n = qc.num_qubits
+
+    grover_op = grover.operator(oracle, n)
+    plots.circuit(grover_op, decompose=True, filename="grover_operator_decompose")
 
-    qc.compose(grover_op, inplace=True)
+    if oracle.num_ancillas:
+        qc.add_register(AncillaRegister(oracle.num_ancillas, name="anc"))
 
-    qc.measure_all()
-    qc.draw(output="mpl", filename="circuit_composed")
+    qc.compose(grover_op.power(iterations), inplace=True)
+
+    if oracle.num_ancillas:
+        meas = ClassicalRegister(n, name="meas")
+        qc.add_register(meas)
+        qc.barrier()
+        qc.measure(range(n), meas)
+    else:
+        qc.measure_all()
+    plots.circuit(qc, filename="circuit_composed")
 
     return qc
 
 
-def aer_run_search(circuit):
+@tracing.traced()
+def aer_run_search(circuit, marked_states=None, theoretical=None):
     """ Run the search algorithm on an AerSimulator
 
-    Param
+    Params
     -----
         circuit (QuantumCircuit): the circuit of the oracle function
+        marked_states (list): the states marked by the oracle, to report the success probability
+        theoretical (float): the theoretical success probability
 
-    * Get an AerSimulator, the method used is automatically selected based on the circuit and noise model
+    * With --exact or --exact-sample, get the exact distribution instead, no shot is simulated
+    * Get an AerSimulator, from WIDE_QUBITS qubits the cores share the statevector (profile 'wide' of common/aer_profiles.py)
     * Transpile/adapt the circuit for the simulator
-    * Run the circuit
+    * Plan the simulation method from the memory and the time it needs, see simulation.plan()
+        * the circuit is not run if no method fits, the estimates are printed instead
+        * matrix_product_state supports fewer gates, the circuit is transpiled again for it
+    * Run the circuit with the method planned
+        * with --adaptive, by rounds until the most frequent states are decided
     * Sort the dict of the results by keys
     * Process the results (type of simulation, results, plot)
     """
@@ -195,39 +408,72 @@ def aer_run_search(circuit):
 
     print("Running the circuit with an AerSimulator", tag='info', tag_color='cyan')
 
-    sim = AerSimulator(method='automatic')
+    shots = SHOTS
+
+    if exact.enabled():
+        counts, sim_type = exact.run(circuit, SHOTS)
+    else:
+        sim = registry.get_aer_simulator(workload=circuit)
+        qc_transpile_sim = cached_transpile(grover.expand(circuit, sim), sim)
+
+        decision = simulation.plan(qc_transpile_sim)
+        if decision["method"] is None:
+            print(f"The circuit cannot be simulated: {simulation.describe(decision)}", color='red')
+            return
 
-    qc_transpile_sim = transpile(circuit, backend=sim)
+        sim = registry.get_aer_simulator(decision["method"], workload=circuit)
+        if decision["method"] == "matrix_product_state":
+            qc_transpile_sim = cached_transpile(grover.expand(circuit, sim), sim)
 
-    result_sim = sim.run(qc_transpile_sim, shots=SHOTS).result()
+        if adaptive.enabled():
+            sim_type = decision["method"]
+            with tracing.span("simulate", backend=sim.name, shots=SHOTS, method=sim_type, adaptive=True):
+                counts, shots = adaptive.run_simulator(sim, qc_transpile_sim, adaptive.top_states_decided(len(marked_states) if marked_states else 1), SHOTS)
+        else:
+            with tracing.span("simulate", backend=sim.name, shots=SHOTS, method=decision["method"]):
+                result_sim = sim.run(qc_transpile_sim, shots=SHOTS).result()
 
-    sim_type = result_sim.results[0].metadata['method']
-    counts = result_sim.get_counts()
+            sim_type = result_sim.results[0].metadata['method']
+            counts = result_sim.get_counts()
+
+        print(f"Simulation method {sim_type}, planned: {simulation.describe(decision)}", tag='planner', tag_color='cyan', color='white')
 
     counts = dict(sorted(counts.items()))
 
-    print(f"on {SHOTS}, the qubits are at: ", tag='RESULT - AerSimulator', tag_color='red', color='white', end='')
+    print(f"on {shots}, the qubits are at: ", tag='RESULT - AerSimulator', tag_color='red', color='white', end='')
     print(f"{counts}\n", color='yellow')
 
+    report_success(counts, shots, marked_states, theoretical, 'RESULT - AerSimulator')
+
     title_sim = f"Count result with the AerSimulator of type {sim_type}"
-    plot_histogram(counts, title=title_sim, filename="histogram_aer", figsize=(12, 8))
+    plots.histogram(counts, title=title_sim, filename="histogram_aer", figsize=(12, 8))
 
     title_sim = f"Percentage result with the AerSimulator of type {sim_type}"
-    plot_distribution(counts, title=title_sim, filename="distribution_aer", figsize=(12, 8))
+    plots.distribution(counts, title=title_sim, filename="distribution_aer", figsize=(12, 8))
 
 
-def fake_run_search(circuit):
+@tracing.traced()
+def fake_run_search(circuit, marked_states=None, theoretical=None):
     """ Run the circuit with a FakeBackend simulator
 
-    Param
+    Params
     -----
-        oracle (QuantumCircuit): the circuit to run
+        circuit (QuantumCircuit): the circuit to run
+        marked_states (list): the states marked by the oracle, to report the success probability
+        theoretical (float): the theoretical success probability
 
     * Get the FakeBackend simulator, mimics behaviors of real systems
-    * Transpile (i.e. adapt) the circuit for the simulator obtained
-    * Get a Primitive, here SamplerV2, for the particular backend obtained
+        * built once per process, its noise model is loaded from the disk cache
+    * Plan the noisy simulation from the circuit before the layout, see simulation.plan_noisy()
+        * it is a lower bound of the cost after the routing: if no method fits, the transpilation is not even done
+    * Transpile (i.e. adapt) the circuit for the simulator obtained, reused from the cache if already done
+    * Plan the noisy simulation again from the transpiled circuit, its active qubits, its gates and the noise model
+        * the circuit is not run if no method fits, the estimates are printed instead
+        * with --reduced-noise, the circuit and the noise model are reduced to the qubits used after the layout
+    * Get a Primitive, here SamplerV2, for the particular backend obtained and the method planned
         * https://docs.quantum.ibm.com/api/qiskit/primitives
     * Run the circuit on the simulator with a precise number of shots
+        * with --adaptive, by rounds until the most frequent states are decided
     * Get the name of the ClassicalRegister from the circuit
     * Sort the dict of the results by keys
     * Process (print and plot) the result
@@ -237,43 +483,74 @@ def fake_run_search(circuit):
 
     print("Running the circuit with a FakeBackend simulator", tag='info', tag_color='cyan')
 
-    backend = FakeSherbrooke()
+    backend = registry.get_fake_backend()
+    noise_model = registry.get_noise_model(backend)
+
+    qc_expanded = grover.expand(circuit, backend)
+
+    decision = simulation.plan_noisy(qc_expanded, SHOTS, noise_model)
+    if decision["method"] is None:
+        print(f"The noisy simulation cannot be run, even before the routing: {simulation.describe(decision)}", color='red')
+        return
+
+    qc_transpile = cached_transpile(qc_expanded, backend)
+
+    decision = simulation.plan_noisy(qc_transpile, SHOTS, noise_model)
+    if decision["method"] is None:
+        print(f"The noisy simulation cannot be run: {simulation.describe(decision)}", color='red')
+        return
+
+    print(f"Noisy simulation planned: {simulation.describe(decision)}", tag='planner', tag_color='cyan', color='white')
 
-    qc_transpile = transpile(circuit, backend)
+    sampler = registry.get_sampler(backend, decision["method"])
+    if reduced_noise.enabled():
+        sampler, qc_transpile = reduced_noise.prepare(backend, qc_transpile, decision["method"])
 
-    sampler = Sampler(backend)
-    job = sampler.run([qc_transpile], shots=SHOTS)
-    result = job.result()[0]
     bits_name = circuit.cregs[0].name
-    counts = getattr(result.data, bits_name).get_counts()
+
+    with tracing.span("simulate", backend=backend.name, shots=SHOTS, method=decision["method"], adaptive=adaptive.enabled()):
+        if adaptive.enabled():
+            counts, shots = adaptive.run_sampler(sampler, qc_transpile, bits_name, adaptive.top_states_decided(len(marked_states) if marked_states else 1), SHOTS)
+        else:
+            job = sampler.run([qc_transpile], shots=SHOTS)
+            result = job.result()[0]
+            counts = getattr(result.data, bits_name).get_counts()
+            shots = SHOTS
 
     counts = dict(sorted(counts.items()))
 
-    print(f"on {SHOTS}, the qubits are at: ", tag='RESULT - FakeBackend', tag_color='red', color='white', end='')
+    print(f"on {shots}, the qubits are at: ", tag='RESULT - FakeBackend', tag_color='red', color='white', end='')
     print(f"{counts}\n", color='purple')
 
-    title = f"Count result with the FakeBackend simulation and {SHOTS} shots"
-    plot_histogram(counts, title=title, filename="histogram_fake", figsize=(12, 8))
+    report_success(counts, shots, marked_states, theoretical, 'RESULT - FakeBackend')
 
-    title = f"Percentage with the FakeBackend simulation and {SHOTS} shots"
-    plot_distribution(counts, title=title, filename="distribution_fake", figsize=(12, 8))
+    title = f"Count result with the FakeBackend simulation and {shots} shots"
+    plots.histogram(counts, title=title, filename="histogram_fake", figsize=(12, 8))
 
+    title = f"Percentage with the FakeBackend simulation and {shots} shots"
+    plots.distribution(counts, title=title, filename="distribution_fake", figsize=(12, 8))
 
-def real_run_search(circuit):
+
+@tracing.traced()
+def real_run_search(circuit, marked_states=None, theoretical=None):
     """ Run the search algorithm on real quantum hardware
 
-    Param
+    Params
     -----
         circuit (QuantumCircuit): the circuit for the search
+        marked_states (list): the states marked by the oracle, to report the success probability
+        theoretical (float): the theoretical success probability
 
     * Optimize the circuit created for the particular backend obtained
-    * Convert to an Instruction Set Architecture (ISA) circuit
+    * Convert to an Instruction Set Architecture (ISA) circuit, reused from the cache if already done
         * ISA = the set of instructions the device can understand and execute
     * Draw the circuit after being converted, saved as 'circuit_optimized'
     * Get a Primitive, here SamplerV2, for the particular backend obtained
         * https://docs.quantum.ibm.com/api/qiskit/primitives
     * Run the circuit using the Primitive instantiated with the backend shots times
         * Here 'isa_circuit' is considered a Primitive Unified Bloc (PUB)
+        * with --adaptive, one job per round until the most frequent states are decided
+    * Wait for the job, its status is polled with a growing delay instead of blocking in job.result()
     * Get the result of the first PUB, this gives a PubResult object
     * In the PubResult, get the data attribute, inside it there are the classical bits
         * The way I instantiate the QuantumCircuit, the ClassicalRegister get the name 'c'
@@ -286,84 +563,176 @@ def real_run_search(circuit):
 
     print("Running the circuit on a real quantum computer ...", tag='info', tag_color='cyan')
 
-    bck = get_backend_computer()
+    bck = get_backend_computer(circuit)
 
-    pm = generate_preset_pass_manager(backend=bck, optimization_level=1)
-    isa_circuit = pm.run(circuit)
+    isa_circuit = cached_transpile(grover.expand(circuit, bck), bck, optimization_level=1)
 
-    isa_circuit.draw('mpl', idle_wires=False, filename="circuit_optimized_for_back")
+    plots.circuit(isa_circuit, idle_wires=False, filename="circuit_optimized_for_back")
 
-    sampler = Sampler(bck)
+    sampler = registry.get_sampler(bck)
 
-    job = sampler.run([isa_circuit], shots=SHOTS)
+    classical_bits_name = circuit.cregs[0].name
 
-    job_id = job.job_id()
+    if adaptive.enabled():
+        counts, shots = adaptive.run_sampler(sampler, isa_circuit, classical_bits_name, adaptive.top_states_decided(len(marked_states) if marked_states else 1), SHOTS)
+        job_id = "adaptive"
+    else:
+        job = sampler.run([isa_circuit], shots=SHOTS)
 
-    print(f"Job ID: {job_id}\n")
-    print(f"Job Status: {job.status()}\n")
+        job_id = job.job_id()
 
-    result = job.result()[0]
+        print(f"Job ID: {job_id}\n")
+        print(f"Job Status: {job.status()}\n")
 
-    classical_bits_name = circuit.cregs[0].name
+        result = jobs.result(job)[0]
 
-    counts = getattr(result.data, classical_bits_name).get_counts()
+        counts = getattr(result.data, classical_bits_name).get_counts()
+        shots = SHOTS
 
     counts = dict(sorted(counts.items()))
 
-    print(f"on {SHOTS}, the qubits are at: ", tag='RESULT - Real', tag_color='red', color='white', end='')
+    print(f"on {shots}, the qubits are at: ", tag='RESULT - Real', tag_color='red', color='white', end='')
     print(f"{counts}\n", color='purple')
 
+    report_success(counts, shots, marked_states, theoretical, 'RESULT - Real')
+
     title = f"Count result of {job_id} runned on {bck.name}"
-    plot_histogram(counts, title=title, filename=f"histogram_real_{job_id}", figsize=(12, 8))
+    plots.histogram(counts, title=title, filename=f"histogram_real_{job_id}", figsize=(12, 8))
 
     title = f"Percentage result of {job_id} runned on {bck.name}"
-    plot_distribution(counts, title=title, filename=f"distribution_real_{job_id}", figsize=(12, 8))
+    plots.distribution(counts, title=title, filename=f"distribution_real_{job_id}", figsize=(12, 8))
 
 
-def main():
-    """ main function to do the search
+def build_search(qubits_nb, marked=None, expression=None, cnf=None, use_ancillas=False, marked_nb=None):
+    """ Build the search algorithm for an oracle
 
-    * Assert the arguments, need one for the number of qubits
-    * Get the number of qubits passed as arguments, if < 2 (the minimum) take 2 by default
-    * Get the circuit based on the number of qubits passed as arguments
-    * Get the oracle, if there are 3 qubits and no function furnished it will use the one from the subject
+    Params
+    -----
+        qubits_nb (int): the number of qubits, 2 at least
+        marked (str): the marked states separated by commas, e.g. '0101,1110'
+        expression (str): a boolean expression of the qubits, the states where it is true are marked
+        cnf (str): the path of a DIMACS CNF formula, it sets the number of qubits
+        use_ancillas (bool): decompose the multi-controlled gates with ancilla qubits
+        marked_nb (int): the number of marked states, estimated from the oracle if None
+
+    * Refuse a number of qubits whose statevector does not fit in memory, before the oracle enumerates its 2^n states
+    * Get the oracle, compiled from the options if one was given,
+        * if there are 3 qubits and no function furnished it will use the one from the subject
+    * Get the circuit based on the number of qubits of the oracle
+    * Get the marked states of the oracle if their number is not passed, see estimate_marked_states()
+        * it simulates the statevector of the oracle with its ancillas: with marked_nb it is skipped,
+        * only the run itself is planned, the success probability is then not reported
+    * Compute the optimal number of iterations and the theoretical success probability
+    * Refuse a search that no simulation method can run in memory and in time, before building it
+        * the plan is made on the Grover operator repeated for the iterations, see common/simulation.py
     * Combine all the circuits to form the search algorithm
-    * Run the search algorithm on simulator and prompt for a run on a real backend
-    """
-
-    assert len(sys.argv) == 2, f"{RED}Expect arguments: an int for the number of qubits{RESET}"
 
-    qubits_nb = int(sys.argv[1]) if int(sys.argv[1]) >= 2 else 2
+    Return
+    -----
+        (QuantumCircuit, list, float): the search circuit, the marked states and the theoretical success probability,
+            None if there is no oracle or no marked state, the marked states are None if marked_nb is given
+    """
 
-    qc = state_initialisation(qubits_nb)
+    qubits_nb = max(qubits_nb, 2)
 
-    print(f"Created the circuit with {qubits_nb} qubits and initialized them", color='blue', tag='info', tag_color='cyan')
+    needed, budget = simulation.statevector_bytes(qubits_nb), simulation.memory_budget()
+    if needed > budget:
+        print(f"The statevector of {qubits_nb} qubits needs {simulation.format_bytes(needed)}, ", color='red', end='')
+        print(f"more than the {simulation.format_bytes(budget)} available", color='red')
+        return None
 
     oracle = oracle_creation()
 
+    if oracle == 0:
+        oracle = oracle_compiled(qubits_nb, marked, expression, cnf, use_ancillas)
+
     if oracle == 0 and qubits_nb == 3:
         print("The default oracle, from the subject was used\n", color='green', tag='info', tag_color='cyan')
         oracle = oracle_example()
     elif oracle == 0:
-        print("No oracle function available and not compatible with the oracle from the example", color='red')
-        return
+        print("No oracle function available and not compatible with the oracle from the example,", color='red')
+        print("give the marked states with --marked, --expr or --cnf", color='red')
+        return None
 
     print("The oracle was created !", color='purple', tag='info', tag_color='cyan')
 
-    circuit = diffuser(qc, oracle)
+    qubits_nb = oracle.num_qubits - oracle.num_ancillas
+
+    qc = state_initialisation(qubits_nb)
+
+    print(f"Created the circuit with {qubits_nb} qubits and initialized them", color='blue', tag='info', tag_color='cyan')
+
+    if marked_nb is None:
+        marked_states = estimate_marked_states(oracle)
+        marked_nb = len(marked_states)
+    else:
+        marked_states = None
+
+    if marked_nb == 0:
+        print("The oracle does not mark any state", color='red')
+        return None
+
+    iterations = optimal_iterations(qubits_nb, marked_nb)
+    theoretical = success_probability(qubits_nb, marked_nb, iterations)
+
+    print(f"{marked_nb} marked state(s): {iterations} iteration(s) of the Grover operator, ", end='')
+    print(f"theoretical success probability {theoretical:.3f}\n", color='purple')
+
+    decision = simulation.plan(grover.operator(oracle, qubits_nb), repetitions=iterations)
+
+    if decision["method"] is None:
+        print(f"The search cannot be simulated: {simulation.describe(decision)}", color='red')
+        return None
+
+    return diffuser(qc, oracle, iterations), marked_states, theoretical
+
+
+def main():
+    """ main function to do the search
+
+    * Remove the options of the oracle compiler from the arguments:
+        * --marked 0101,1110: the marked states
+        * --expr '(x0 & ~x1) | x3': the states where a boolean expression is true
+        * --cnf formula.cnf: the states that satisfy a DIMACS CNF formula, it sets the number of qubits
+        * --ancillas: decompose the multi-controlled gates with ancilla qubits
+        * --real or --no-real: answer the prompt for a run on a real backend
+    * Assert the arguments, need one for the number of qubits, optionally the number of marked states
+    * Build the search algorithm for the oracle, see build_search()
+    * Run the search algorithm on simulator and prompt for a run on a real backend
+        * without a terminal and without --real, it is not run
+    """
+
+    marked = pop_option("--marked")
+    expression = pop_option("--expr")
+    cnf = pop_option("--cnf")
+    use_ancillas = pop_flag("--ancillas")
+    real_answer = pop_answer("--real")
+
+    assert len(sys.argv) in (2, 3), \
+            f"{RED}Expect arguments: an int for the number of qubits and optionally the number of marked states{RESET}"
 
-    aer_run_search(circuit)
+    marked_nb = int(sys.argv[2]) if len(sys.argv) == 3 else None
 
-    fake_run_search(circuit)
+    search = build_search(int(sys.argv[1]), marked, expression, cnf, use_ancillas, marked_nb)
 
-    print("Do you want to run this circuit on a real quantum computer ? (y or n)", color='blue', tag='prompt', end=': ')
-    real_run = input()
+    if search is None:
+        return
+
+    circuit, marked_states, theoretical = search
+
+    aer_run_search(circuit, marked_states, theoretical)
 
-    if real_run == "y":
-        real_run_search(circuit)
+    fake_run_search(circuit, marked_states, theoretical)
+
+    if confirm("Do you want to run this circuit on a real quantum computer ?", real_answer, color='blue'):
+        real_run_search(circuit, marked_states, theoretical)
     else:
         print("\nFine, this is the end of this run of the search algorithm\n")
 
-
 if __name__ == "__main__":
+    plots.configure_from_argv()
+    exact.configure_from_argv()
+    reduced_noise.configure_from_argv()
+    adaptive.configure_from_argv()
     main()
+    plots.wait()
@@ -1,9 +1,16 @@
 import os
-from dotenv import load_dotenv
+import sys
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from print_color import print
 
-from qiskit_ibm_runtime import QiskitRuntimeService
-from qiskit.visualization import plot_histogram, plot_distribution
+from common import job_store, jobs, plots
+from common.cli import pop_flag, pop_option
+
+
+# * The jobs are listed by pages, the metadata of a page is fetched by MAX_WORKERS threads
+PAGE_SIZE = 50
+MAX_WORKERS = 8
 
 
 def load_account():
@@ -16,6 +23,9 @@ def load_account():
     * 'overwrite' to 'True' so that the existing account is overwritten
     """
 
+    from dotenv import load_dotenv
+    from qiskit_ibm_runtime import QiskitRuntimeService
+
     load_dotenv()
     token = os.getenv("TOKEN")
 
@@ -23,55 +33,210 @@ def load_account():
     print("Account loaded !\n", tag='success', tag_color='green', color='white')
 
 
-def query_job():
-    """Query all jobs of the account and propose the choice to get more info on one"""
+def get_service():
+    """ Get a service instance, the account is loaded if it was not saved """
+
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    from qiskit_ibm_runtime.accounts import AccountNotFoundError
 
     # * Try to get a service instance, need to have the IBMQ account loaded
-    # * If not loaded, call load_account()
+    # * If not saved, call load_account(), the other errors are raised
     try:
         service = QiskitRuntimeService(instance="ibm-q/open/main")
         print("No exception, the account was already saved\n", tag='success', tag_color='green', color='white')
-    except Exception:
+    except AccountNotFoundError:
         print("The account was not saved and needs to be loaded\n", tag='exception', tag_color='red', color='white')
         load_account()
         service = QiskitRuntimeService(channel='ibm_quantum', instance="ibm-q/open/main")
 
-    # * Get all jobs of this account and prints them
-    all_jobs = service.jobs(limit=None)
-    print("All jobs runned on this account:")
-    for job in all_jobs:
-        job_date = job.creation_date.strftime("%d %b %Y, %I:%M%p %Z")
-        print("job runned on ", end='')
-        print(job.backend().name, format='underline', end='')
-        print(", id: ", end='')
-        print(job.job_id(), color='yellow', end='')
-        print(", created at: ", end='')
-        print(job_date)
-
-    # * Gives the choice of which job to get more data
-    print("Which job to get results from", color="cyan", tag='prompt', end=': ')
-    job_id = input()
+    return service
+
+
+def describe_job(job):
+    """ Metadata of a job, the backend and the status need a request each: run in the thread pool """
+
+    return job.job_id(), job.backend().name, job.creation_date, jobs.status_name(job)
+
+
+def stream_jobs(service, conn, pool, backend=None, created_after=None, created_before=None, status=None):
+    """ Fetch the jobs that are not in the local store yet, page by page
+
+    Params
+    -----
+        service (QiskitRuntimeService): the service of the account
+        conn (sqlite3.Connection): the job store
+        pool (ThreadPoolExecutor): the bounded pool for the metadata of each job
+        backend, created_after, created_before, status: the filters, given to the service
+
+    * The filters are pushed down in service.jobs(), with the date until which all the jobs are already stored
+        * the upper date is fixed at the start: the pages do not shift if a job is created meanwhile
+    * The metadata of the jobs of a page is fetched concurrently, then the page is stored and given to the caller
+    * Without filter, all the jobs until the start are now stored: the watermark of the store is moved
+
+    Return
+    -----
+        (generator): the rows (job_id, backend, creation_date, status) of each page, the most recent first
+    """
+
+    watermark = job_store.get_watermark(conn)
+    lower = max((date for date in (watermark, created_after) if date is not None), default=None)
+    upper = created_before or datetime.now(timezone.utc)
+    pending = None if status is None else status not in job_store.FINAL_STATUSES
+
+    skip = 0
+
+    while True:
+        page = service.jobs(limit=PAGE_SIZE, skip=skip, backend_name=backend, pending=pending,
+                            created_after=lower, created_before=upper)
+
+        rows = list(pool.map(describe_job, page))
+        for row in rows:
+            job_store.save_job(conn, *row)
+
+        yield [row for row in rows if status is None or row[3] == status]
+
+        if len(page) < PAGE_SIZE:
+            break
+        skip += PAGE_SIZE
+
+    if backend is None and created_after is None and created_before is None and status is None:
+        job_store.set_watermark(conn, upper)
+
+
+def refresh_pending(service, conn, pool):
+    """ Update the status of the jobs stored while they were still queued or running """
+
+    for row in pool.map(lambda job_id: describe_job(service.job(job_id)), job_store.pending_jobs(conn)):
+        job_store.save_job(conn, *row)
+
+
+def print_job(job_id, backend, creation_date):
+    """ Print one row of the listing, the date in the local timezone """
+
+    job_date = creation_date.astimezone().strftime("%d %b %Y, %I:%M%p %Z")
+    print("job runned on ", end='')
+    print(backend, format='underline', end='')
+    print(", id: ", end='')
+    print(job_id, color='yellow', end='')
+    print(", created at: ", end='')
+    print(job_date)
+
+
+def pop_filters():
+    """ Remove the filters of the listing from the arguments of the script
+
+    * '--backend ibm_brisbane', '--after 2025-01-31', '--before 2025-02-28T12:00', '--status DONE'
+    * A date without timezone is a local one
+
+    Return
+    -----
+        (dict): the filters given, the others are None
+    """
+
+    after = pop_option("--after")
+    before = pop_option("--before")
+    status = pop_option("--status")
+
+    return {
+        "backend": pop_option("--backend"),
+        "created_after": datetime.fromisoformat(after).astimezone() if after else None,
+        "created_before": datetime.fromisoformat(before).astimezone() if before else None,
+        "status": status.upper() if status else None,
+    }
+
+
+def fetch_result(service, conn, job_id):
+    """ Fetch the result of a job from the service and keep it in the local store
+
+    * The quantum time used by the job is stored with it, when the service gives it
+
+    Return
+    -----
+        (dict): the BitArray of each register of the first PUB
+    """
 
     # * Get the job saved under the job_id, it should be a RuntimeJobV2 object
+    job = service.job(job_id)
+
+    result = job.result()
+
+    from qiskit_ibm_runtime.exceptions import IBMRuntimeError
+
+    # * The usage is in the metadata of the job, a failed request to get it does not lose the result
     try:
-        job = service.job(job_id)
-    except Exception as e:
-        print(e, tag='exception', tag_color='red')
+        usage_seconds = job.usage()
+    except IBMRuntimeError:
+        usage_seconds = None
+
+    job_store.save_job(conn, job_id, job.backend().name, job.creation_date, jobs.status_name(job))
+    job_store.save_result(conn, job_id, result, usage_seconds)
+
+    return job_store.load_result(conn, job_id)
+
+
+def query_job():
+    """Query all jobs of the account and propose the choice to get more info on one
+
+    * The jobs and the results already fetched are read from the local store (common/job_store.py)
+    * Only the new jobs are fetched from the service, nothing is fetched with --offline
+        * they are printed page by page as they arrive, then the ones already stored
+    * The listing can be filtered with --backend, --after, --before and --status
+    * The job to get more info on can be given with --job, it is only asked in a terminal
+    """
+
+    offline = pop_flag("--offline")
+    filters = pop_filters()
+    job_id = pop_option("--job")
+
+    service = None if offline else get_service()
+    conn = job_store.connect()
+
+    print("All jobs runned on this account:")
+
+    printed = set()
+
+    # * Fetch and print the new jobs of this account, then print the ones from the store
+    if service is not None:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            for rows in stream_jobs(service, conn, pool, **filters):
+                for row_id, backend, creation_date, _ in rows:
+                    print_job(row_id, backend, creation_date)
+                    printed.add(row_id)
+            refresh_pending(service, conn, pool)
+
+    for row in job_store.list_jobs(conn, **filters):
+        if row["job_id"] not in printed:
+            print_job(row["job_id"], row["backend"], datetime.fromisoformat(row["creation_date"]))
+
+    # * Gives the choice of which job to get more data, unless it was given or there is no terminal to answer
+    if job_id is None and not sys.stdin.isatty():
         return
 
-    # * If the job is valid, get the result of the first PUB of it
-    job_result = job.result()[0]
+    if job_id is None:
+        print("Which job to get results from", color="cyan", tag='prompt', end=': ')
+        job_id = input()
+
+    # * Get the result of the first PUB from the store, or from the service the first time
+    registers = job_store.load_result(conn, job_id)
+
+    if registers is None and service is None:
+        print(f"The result of {job_id} is not in the local store", tag='exception', tag_color='red')
+        return
+
+    if registers is None:
+        try:
+            registers = fetch_result(service, conn, job_id)
+        except Exception as e:
+            print(e, tag='exception', tag_color='red')
+            return
 
     # * Get the name of the backend that runned this job
-    bck_name = job.backend().name
+    bck_name = job_store.get_job(conn, job_id)["backend"]
 
-    # * In the PubResult, get the data attribute, inside it there are the classical bits
+    # * Get the classical bits of the result
         # * Those classical bits, depending on how the ClassicalRegister is instantiated have different names
-        # * Here I try the two names that I came across my jobs: 'meas' and 'c'
-    try:
-        c_bits_data = job_result.data.meas
-    except Exception:
-        c_bits_data = job_result.data.c
+        # * Here I try the two names that I came across my jobs: 'meas' and 'c', then any other one
+    c_bits_data = registers.get("meas", registers.get("c", next(iter(registers.values()))))
 
     # * Get the number of shots used for this specific job
     shots = c_bits_data.num_shots
@@ -91,12 +256,14 @@ def query_job():
 
     # * Plot the results with an histogram (count)
     title = rf"Count result of {job_id} with {shots} shots runned on {bck_name}"
-    plot_histogram(pub_result, title=title, filename=f"histogram_{job_id}_{bck_name}", figsize=(12, 8))
+    plots.histogram(pub_result, title=title, filename=f"histogram_{job_id}_{bck_name}", figsize=(12, 8))
 
     # * Plot the results with a distribution (percentage)
     title = rf"Percentage result of {job_id} with {shots} shots runned on {bck_name}"
-    plot_distribution(pub_result, title=title, filename=f"distribution_{job_id}_{bck_name}", figsize=(12, 8))
+    plots.distribution(pub_result, title=title, filename=f"distribution_{job_id}_{bck_name}", figsize=(12, 8))
 
 
 if __name__ == "__main__":
+    plots.configure_from_argv()
     query_job()
+    plots.wait()
@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+from print_color import print
+
+EXERCICES_DIR = os.path.dirname(os.path.abspath(__file__))
+for exercice in ("ex02", "ex03", "ex04", "ex05", "ex06"):
+    sys.path.insert(1, os.path.join(EXERCICES_DIR, exercice))
+
+from common import adaptive, exact, plots, reduced_noise
+
+
+# * The keys a run of the manifest can have, the other ones are refused before anything runs
+KEYS = {"exercise", "targets", "shots", "qubits", "oracle", "marked", "expr", "cnf", "ancillas", "marked_nb"}
+
+TARGETS = {
+    "ex02": {"aer", "fake"},
+    "ex03": {"aer", "fake"},
+    "ex04": {"real"},
+    "ex05": {"aer", "fake", "real"},
+    "ex06": {"aer", "fake", "real"},
+}
+
+DEFAULTS = {"targets": ["aer", "fake"], "shots": 500}
+
+# * The ex05 oracles that "qubits" can generate, the other ones have a fixed size
+GENERATED_ORACLES = ("constant", "balanced")
+
+# * The figures of each run are saved in their own directory, the runs write the same file names
+OUTPUT_DIR = "manifest_runs"
+
+
+def load_manifest(path):
+    """ Load and check a manifest of runs
+
+    Param
+    -----
+        path (str): a JSON file, either a list of runs or {"defaults": {...}, "runs": [...]}
+
+    * A run is a dict: {"exercise": "ex05", "oracle": "balanced", "qubits": 8, "targets": ["aer"], "shots": 1000}
+        * ex02, ex03: the subject circuit, targets aer and fake
+        * ex04: the subject circuit, target real
+        * ex05: "oracle" is 'constant', 'balanced', 'eval' or a .qpy file,
+            "qubits" generates a 'constant' or 'balanced' oracle with n input qubits
+        * ex06: "qubits" and the oracle as "marked", "expr" or "cnf", optionally "ancillas" and "marked_nb"
+    * The defaults are applied to each run, then DEFAULTS for what is still missing
+    * Every run is checked before the first one starts, a typo does not stop a schedule half way
+
+    Return
+    -----
+        (list): the runs, with their defaults applied
+    """
+
+    with open(path) as fd:
+        manifest = json.load(fd)
+
+    if isinstance(manifest, list):
+        manifest = {"runs": manifest}
+
+    defaults = dict(DEFAULTS, **manifest.get("defaults", {}))
+    runs = [dict(defaults, **run) for run in manifest["runs"]]
+
+    errors = []
+
+    for index, run in enumerate(runs):
+        exercise = run.get("exercise")
+        if exercise not in TARGETS:
+            errors.append(f"run {index}: unknown exercise {exercise!r}, expect one of {sorted(TARGETS)}")
+            continue
+        if exercise == "ex04" and "targets" not in manifest["runs"][index]:
+            run["targets"] = ["real"]
+        unknown = set(run) - KEYS
+        if unknown:
+            errors.append(f"run {index}: unknown keys {sorted(unknown)}")
+        wrong = set(run["targets"]) - TARGETS[exercise]
+        if wrong:
+            errors.append(f"run {index}: {exercise} cannot run on {sorted(wrong)}, only on {sorted(TARGETS[exercise])}")
+        if exercise == "ex05" and "oracle" not in run:
+            errors.append(f"run {index}: ex05 needs an 'oracle'")
+        elif exercise == "ex05" and "qubits" in run and run["oracle"] not in GENERATED_ORACLES:
+            errors.append(f"run {index}: 'qubits' only generates the oracles {list(GENERATED_ORACLES)}, not {run['oracle']!r}")
+        if exercise == "ex06" and "qubits" not in run and "cnf" not in run:
+            errors.append(f"run {index}: ex06 needs 'qubits' or 'cnf'")
+
+    if errors:
+        sys.exit("\n".join(["Invalid manifest:"] + errors))
+
+    return runs
+
+
+def label(run):
+    """ Short description of a run for the logs and the summary """
+
+    details = [f"{key}={run[key]}" for key in ("oracle", "qubits", "marked", "expr", "cnf") if key in run]
+
+    return " ".join([run["exercise"]] + details + ["->", ",".join(run["targets"]), f"{run['shots']} shots"])
+
+
+def run_ex02(run):
+    import superposition
+
+    qc = superposition.circuit_creation()
+    functions = {"aer": superposition.aer_simulation, "fake": superposition.fake_backend_simulation}
+
+    return superposition, [(functions[target], (qc,)) for target in run["targets"]]
+
+
+def run_ex03(run):
+    import entanglement
+
+    qc = entanglement.circuit_creation()
+    functions = {"aer": entanglement.aer_simulation, "fake": entanglement.fake_backend_simulation}
+
+    return entanglement, [(functions[target], (qc,)) for target in run["targets"]]
+
+
+def run_ex04(run):
+    import quantum_noise
+
+    def real(qc):
+        bck = quantum_noise.get_backend_computer(qc)
+        job = quantum_noise.run_circuit(qc, bck)
+        quantum_noise.process_result(job, bck, qc)
+
+    return quantum_noise, [(real, (quantum_noise.create_circuit(),))]
+
+
+def run_ex05(run):
+    import deutsch_jozsa
+
+    choice = run["oracle"] if "qubits" not in run else f"{run['oracle']}:{run['qubits']}"
+    steps = []
+
+    functions = {"aer": deutsch_jozsa.aer_run_oracle, "fake": deutsch_jozsa.fake_run_oracle, "real": deutsch_jozsa.real_run_oracle}
+
+    for _, _, oracle in deutsch_jozsa.batch_oracles([choice]):
+        circuit = deutsch_jozsa.compile_circuit(oracle, draw=oracle.num_qubits <= deutsch_jozsa.DRAW_MAX_QUBITS)
+        steps.extend((functions[target], (circuit,)) for target in run["targets"])
+
+    return deutsch_jozsa, steps
+
+
+def run_ex06(run):
+    import research_algo
+
+    search = research_algo.build_search(run.get("qubits", 2), run.get("marked"), run.get("expr"), run.get("cnf"),
+                                        run.get("ancillas", False), run.get("marked_nb"))
+    if search is None:
+        raise ValueError("no oracle or no marked state, see the messages above")
+
+    functions = {"aer": research_algo.aer_run_search, "fake": research_algo.fake_run_search, "real": research_algo.real_run_search}
+
+    return research_algo, [(functions[target], search) for target in run["targets"]]
+
+
+RUNNERS = {"ex02": run_ex02, "ex03": run_ex03, "ex04": run_ex04, "ex05": run_ex05, "ex06": run_ex06}
+
+
+def execute(run, directory):
+    """ Build the circuit of a run and execute it on each target, with the shots of the run
+
+    * The SHOTS of the exercice is set for the run and restored after, the functions read it when they run
+    * The figures of the run are saved in directory: the runs use the same file names, they are rendered concurrently
+    * The backends, noise models and samplers are loaded once by common/registry.py and reused by the next runs
+    * The figures of all the runs share the same pool of workers, they are waited for at the end
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    previous_dir, plots.OUTPUT_DIR = plots.OUTPUT_DIR, directory
+
+    try:
+        module, steps = RUNNERS[run["exercise"]](run)
+        previous, module.SHOTS = module.SHOTS, run["shots"]
+
+        try:
+            for function, args in steps:
+                function(*args)
+        finally:
+            module.SHOTS = previous
+    finally:
+        plots.OUTPUT_DIR = previous_dir
+
+
+def main():
+    """ Run a manifest of exercice runs back to back in one process, without any prompt nor window
+
+    * Usage: python run_manifest.py manifest.json [--no-plots] [--plots-later] [--exact] [--reduced-noise] [--adaptive]
+        * the flags apply to every run, like for the exercices
+    * The interactive drawings are saved as files, the real runs are only done if "real" is a target
+    * The figures of each run are in OUTPUT_DIR/<index>_<exercise>/
+    * A failed run is reported and the next one starts, the exit code is 1 if any run failed
+    """
+
+    assert len(sys.argv) == 2, "Expect one argument: the path of the manifest"
+
+    plots.INTERACTIVE = False
+
+    runs = load_manifest(sys.argv[1])
+    summary = []
+
+    for index, run in enumerate(runs):
+        print(f"\n[{index + 1}/{len(runs)}] {label(run)}", tag='manifest', tag_color='blue', color='white')
+        start = time.perf_counter()
+        try:
+            execute(run, os.path.join(OUTPUT_DIR, f"{index + 1:02d}_{run['exercise']}"))
+            ok = True
+        except Exception as e:
+            print(f"{type(e).__name__}: {e}", tag='exception', tag_color='red')
+            ok = False
+        summary.append((label(run), ok, time.perf_counter() - start))
+
+    print("\nSummary of the manifest:", color='blue')
+    for name, ok, seconds in summary:
+        print(f"\t{'ok  ' if ok else 'FAIL'} {seconds:>8.2f}s  {name}", color='green' if ok else 'red')
+
+    if not all(ok for _, ok, _ in summary):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    plots.configure_from_argv()
+    exact.configure_from_argv()
+    reduced_noise.configure_from_argv()
+    adaptive.configure_from_argv()
+    main()
+    plots.wait()